@@ -0,0 +1,220 @@
+from core.cache import bump_versions
+from core.search import index_titles
+from django.conf import settings
+from django.db import connections, transaction
+from django.utils import timezone
+from rest_framework import serializers, status
+from reviews.aggregates import rebuild_title_aggregates, touch_titles
+from reviews.models import Category, Genre, GenreTitle, Review, Title
+from reviews.similarity import mark_stale
+
+from .serializers import ReviewsSerializer, TitleWriteSerializer
+
+TITLE_FIELDS = ('name', 'year', 'description', 'category')
+REVIEW_FIELDS = ('text', 'score')
+
+
+def validate_batch(data, require_ids=False):
+    """Checks the request body is a list within the batch size limit."""
+
+    max_size = settings.BULK_API['max_batch_size']
+    if not isinstance(data, list) or not data:
+        raise serializers.ValidationError(
+            {'non_field_errors': ['Ожидается непустой список объектов']})
+    if len(data) > max_size:
+        raise serializers.ValidationError({'non_field_errors': [
+            f'Не больше {max_size} объектов за один запрос']})
+    if not all(isinstance(item, dict) for item in data):
+        raise serializers.ValidationError(
+            {'non_field_errors': ['Каждый элемент должен быть объектом']})
+    if require_ids:
+        ids = [item.get('id') for item in data]
+        if not all(isinstance(pk, int) for pk in ids):
+            raise serializers.ValidationError(
+                {'non_field_errors': ['У каждого объекта должен быть id']})
+        if len(set(ids)) != len(ids):
+            raise serializers.ValidationError(
+                {'non_field_errors': ['id в запросе повторяются']})
+
+
+def slug_lookups(data):
+    """Categories and genres named in the batch, fetched in two queries."""
+
+    category_slugs = {
+        str(item['category']) for item in data if item.get('category')}
+    genre_slugs = {
+        str(slug) for item in data
+        if isinstance(item.get('genre'), list)
+        for slug in item['genre']
+    }
+    return {
+        Category: {
+            category.slug: category
+            for category in Category.objects.filter(slug__in=category_slugs)
+        },
+        Genre: {
+            genre.slug: genre
+            for genre in Genre.objects.filter(slug__in=genre_slugs)
+        },
+    }
+
+
+def title_representation(title, genres):
+    return {
+        'id': title.pk,
+        'category': title.category.slug if title.category else None,
+        'genre': [genre.slug for genre in genres],
+        'name': title.name,
+        'year': title.year,
+        'description': title.description,
+    }
+
+
+def error_result(index, errors, code=status.HTTP_400_BAD_REQUEST):
+    return {'index': index, 'status': code, 'errors': errors}
+
+
+def _validate_titles(data, context, instances):
+    results = [None] * len(data)
+    valid = []
+    for index, item in enumerate(data):
+        instance = None
+        if instances is not None:
+            instance = instances.get(item['id'])
+            if instance is None:
+                results[index] = error_result(
+                    index, {'id': ['Не найдено']}, status.HTTP_404_NOT_FOUND)
+                continue
+        serializer = TitleWriteSerializer(
+            instance, data=item, partial=instance is not None,
+            context=context)
+        if serializer.is_valid():
+            valid.append((index, instance, serializer.validated_data))
+        else:
+            results[index] = error_result(index, serializer.errors)
+    return results, valid
+
+
+def _save_titles(valid, is_update):
+    """Writes validated titles and their genres, returns genres by pk."""
+
+    titles = []
+    now = timezone.now()
+    for _, instance, validated in valid:
+        title = instance or Title()
+        title.modified = now
+        for field in TITLE_FIELDS:
+            if field in validated:
+                setattr(title, field, validated[field])
+        titles.append(title)
+    features = connections[Title.objects.db].features
+    if is_update:
+        Title.objects.bulk_update(titles, TITLE_FIELDS + ('modified',))
+    elif features.can_return_ids_from_bulk_insert:
+        Title.objects.bulk_create(titles)
+    else:
+        # SQLite and others do not report ids of bulk inserted rows.
+        for title in titles:
+            title.save()
+
+    genres = {
+        title.pk: validated['genre']
+        for title, (_, _, validated) in zip(titles, valid)
+        if 'genre' in validated
+    }
+    if is_update:
+        GenreTitle.objects.filter(title_id__in=genres).delete()
+    GenreTitle.objects.bulk_create(
+        GenreTitle(title_id=pk, genre=genre)
+        for pk, title_genres in genres.items()
+        for genre in title_genres
+    )
+    for title in titles:
+        if title.pk not in genres:
+            genres[title.pk] = list(title.genre.all()) if is_update else []
+    index_titles(titles)
+    mark_stale([title.pk for title in titles])
+    return titles, genres
+
+
+def bulk_save_titles(data, context, instances=None):
+    """
+    Validates every title of the batch, then saves the valid ones with
+    bulk_create or, when instances are given, bulk_update in one
+    transaction. Returns results in request order, each with its status.
+    """
+
+    context = dict(context, slug_lookups=slug_lookups(data))
+    results, valid = _validate_titles(data, context, instances)
+    if not valid:
+        return results
+    is_update = instances is not None
+    with transaction.atomic():
+        titles, genres = _save_titles(valid, is_update)
+    bump_versions('titles')
+    code = status.HTTP_200_OK if is_update else status.HTTP_201_CREATED
+    for title, (index, _, _) in zip(titles, valid):
+        results[index] = {
+            'index': index,
+            'status': code,
+            'data': title_representation(title, genres[title.pk]),
+        }
+    return results
+
+
+def bulk_update_reviews(title, data, context):
+    """
+    Applies text and score changes to reviews of one title with
+    bulk_update, then recalculates the title rating once.
+    """
+
+    reviews = title.reviews.select_related('author').in_bulk(
+        [item['id'] for item in data])
+    results = [None] * len(data)
+    changed = []
+    for index, item in enumerate(data):
+        review = reviews.get(item['id'])
+        if review is None:
+            results[index] = error_result(
+                index, {'id': ['Не найдено']}, status.HTTP_404_NOT_FOUND)
+            continue
+        serializer = ReviewsSerializer(
+            review, data=item, partial=True, context=context)
+        if not serializer.is_valid():
+            results[index] = error_result(index, serializer.errors)
+            continue
+        for field in REVIEW_FIELDS:
+            if field in serializer.validated_data:
+                setattr(review, field, serializer.validated_data[field])
+        changed.append((index, review))
+
+    if changed:
+        with transaction.atomic():
+            Review.objects.bulk_update(
+                [review for _, review in changed], REVIEW_FIELDS)
+            rebuild_title_aggregates([title.pk])
+            touch_titles(pk=title.pk)
+        bump_versions('titles', 'reviews')
+    for index, review in changed:
+        results[index] = {
+            'index': index,
+            'status': status.HTTP_200_OK,
+            'data': ReviewsSerializer(review, context=context).data,
+        }
+    return results
+
+
+def bulk_delete_reviews(title, data):
+    """Deletes reviews of one title, ratings follow through signals."""
+
+    ids = [item['id'] for item in data]
+    with transaction.atomic():
+        reviews = title.reviews.filter(pk__in=ids)
+        found = set(reviews.values_list('pk', flat=True))
+        reviews.delete()
+    return [
+        {'index': index, 'id': pk, 'status': status.HTTP_204_NO_CONTENT}
+        if pk in found else
+        error_result(index, {'id': ['Не найдено']}, status.HTTP_404_NOT_FOUND)
+        for index, pk in enumerate(ids)
+    ]
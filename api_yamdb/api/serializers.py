@@ -2,17 +2,19 @@ import uuid
 
 from core.validators import year_validator
 from django.conf import settings
-from django.core.mail import send_mail
-from django.shortcuts import get_object_or_404
+from django.db import transaction
 from djoser.serializers import UserCreateSerializer
 from rest_framework import serializers
-from reviews.models import Category, Comment, Genre, Review, Title, User
+from reviews.models import (SCORES, Category, Comment, Genre, Review, Title,
+                            User, score_field)
+from reviews.outbox import queue_email
 
 ERRORS = {
     'user_exists': 'Пользователь с таким email уже есть',
     'field_required': 'Обязательное поле',
     'me_restrict': 'Логин "me" нельзя использовать',
 }
+HISTOGRAM_FIELDS = tuple(score_field(score) for score in SCORES)
 
 
 class CustomUserSerializer(UserCreateSerializer):
@@ -43,19 +45,20 @@ class SelfRegisterSerializer(CustomUserSerializer):
         confirm_code = uuid.uuid4().hex[:8]
         email = validated_data.get('email')
         username = validated_data.get('username')
-        send_mail(
-            settings.EMAIL_CONFIG.get('subject'),
-            settings.EMAIL_CONFIG.get('text').format(username, confirm_code),
-            settings.EMAIL_CONFIG.get('from'),
-            [email],
-            fail_silently=False,
-        )
-        return User.objects.create_user(
-            username=username,
-            email=email,
-            confirm_code=confirm_code,
-            is_active=False,
-        )
+        with transaction.atomic():
+            queue_email(
+                settings.EMAIL_CONFIG.get('subject'),
+                settings.EMAIL_CONFIG.get('text').format(
+                    username, confirm_code),
+                settings.EMAIL_CONFIG.get('from'),
+                email,
+            )
+            return User.objects.create_user(
+                username=username,
+                email=email,
+                confirm_code=confirm_code,
+                is_active=False,
+            )
 
     class Meta:
         model = User
@@ -74,6 +77,8 @@ class UserSerializer(CustomUserSerializer):
             'last_name',
             'bio',
             'role',
+            'review_count',
+            'comment_count',
         )
 
 
@@ -91,6 +96,8 @@ class MeSerializer(CustomUserSerializer):
             'last_name',
             'bio',
             'role',
+            'review_count',
+            'comment_count',
         )
 
 
@@ -115,25 +122,73 @@ class TitleReadSerializer(serializers.ModelSerializer):
 
     category = CategorySerializer()
     genre = GenreSerializer(many=True,)
-    rating = serializers.IntegerField()
+    rating = serializers.IntegerField(read_only=True)
 
     class Meta:
         model = Title
-        fields = ('__all__')
+        exclude = (
+            'score_sum', 'modified', 'weighted_rating'
+        ) + HISTOGRAM_FIELDS
         read_only_fields = ('category', 'genre', 'rating',)
 
 
+class TitleDetailSerializer(TitleReadSerializer):
+    """Title with the number of reviews for every score."""
+
+    score_distribution = serializers.DictField(
+        child=serializers.IntegerField(), read_only=True)
+
+
+class LeaderboardSerializer(TitleReadSerializer):
+    """Title with its weighted rating and number of reviews."""
+
+    weighted_rating = serializers.FloatField(read_only=True)
+    review_count = serializers.IntegerField(read_only=True)
+
+    class Meta(TitleReadSerializer.Meta):
+        exclude = ('score_sum', 'modified') + HISTOGRAM_FIELDS
+
+
+class SimilarTitleSerializer(TitleReadSerializer):
+    """Title with its cosine similarity to the requested one."""
+
+    similarity = serializers.FloatField(read_only=True)
+
+
+class RecommendationSerializer(TitleReadSerializer):
+    """Title with the score the user is predicted to give it."""
+
+    predicted_score = serializers.FloatField(read_only=True)
+
+
+class PreloadedSlugRelatedField(serializers.SlugRelatedField):
+    """Takes objects from context['slug_lookups'] when it is given."""
+
+    def to_internal_value(self, data):
+        lookups = self.context.get('slug_lookups')
+        if lookups is None:
+            return super().to_internal_value(data)
+        try:
+            return lookups[self.get_queryset().model][str(data)]
+        except KeyError:
+            self.fail(
+                'does_not_exist', slug_name=self.slug_field, value=data)
+
+
 class TitleWriteSerializer(serializers.ModelSerializer):
     """Serializer for not safe methods with titles."""
 
-    category = serializers.SlugRelatedField(
+    category = PreloadedSlugRelatedField(
         queryset=Category.objects.all(), slug_field='slug')
-    genre = serializers.SlugRelatedField(
+    genre = PreloadedSlugRelatedField(
         queryset=Genre.objects.all(), slug_field='slug', many=True)
 
     class Meta:
         model = Title
-        fields = ('__all__')
+        exclude = (
+            'score_sum', 'review_count', 'rating', 'modified',
+            'weighted_rating',
+        ) + HISTOGRAM_FIELDS
 
     def validate_year(self, value):
         return year_validator(value)
@@ -152,10 +207,7 @@ class ReviewsSerializer(serializers.ModelSerializer):
         model = Review
 
     def validate(self, data):
-        title_id = self.context.get(
-            'request'
-        ).parser_context.get('kwargs').get('title_id')
-        title = get_object_or_404(Title, pk=title_id)
+        title = self.context['title']
         author = self.context['request'].user
         if self.context['request'].method == 'POST':
             if author.reviews.filter(title_id=title).exists():
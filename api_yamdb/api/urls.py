@@ -3,7 +3,7 @@ from rest_framework import routers
 
 from .views import (CategoryViewSet, CommentViewSet, CreateUserView,
                     GenreViewSet, ReviewsViewSet, TitleViewSet, UserViewSet,
-                    get_user_token)
+                    export_reviews, export_titles, get_user_token)
 
 router_v1 = routers.DefaultRouter()
 router_v1.register('users', UserViewSet, basename='users')
@@ -23,7 +23,7 @@ router_v1.register(
 
 urlpatterns = [
     path('v1/auth/token/', get_user_token, name='token_obtain'),
-    path('v1/auth/signup/', CreateUserView.as_view()),
+    path('v1/auth/signup/', CreateUserView.as_view(), name='signup'),
     path('v1/auth/', include('djoser.urls')),
     path('v1/auth/', include('djoser.urls.jwt')),
     path(
@@ -31,5 +31,12 @@ urlpatterns = [
         UserViewSet.as_view({'get': 'me', 'patch': 'me', 'delete': 'me'}),
         name='me',
     ),
+    path(
+        'v1/users/me/recommendations/',
+        UserViewSet.as_view({'get': 'recommendations'}),
+        name='recommendations',
+    ),
+    path('v1/export/titles/', export_titles, name='export_titles'),
+    path('v1/export/reviews/', export_reviews, name='export_reviews'),
     path('v1/', include(router_v1.urls))
 ]
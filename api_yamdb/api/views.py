@@ -1,20 +1,40 @@
-from core.api_views import RetrieveUpdateModelMixin
-from core.filters import TitleFilters
+import datetime
+import json
+
+from core.api_views import (RetrieveUpdateModelMixin, ReviewChildMixin,
+                            TitleChildMixin)
+from core.cache import CachedReadMixin, get_versions, is_enabled
+from core.conditional import ConditionalGetMixin
+from core.fast_read import FastReadMixin
+from core.filters import TitleFilters, TitleSearchFilter
+from core.instrumentation import SerializeTimingMixin, serialized
+from core.pagination import PageNumberOrCursorPagination
 from core.permissions import (AdminOnly, AdminOrReadOnly,
-                              AuthorAdminModerOrReadOnly)
-from django.db.models import Avg
+                              AuthorAdminModerOrReadOnly, ModeratorOrAdmin)
+from core.sparse import SparseFieldsMixin
+from django.conf import settings
+from django.http import StreamingHttpResponse
 from django.shortcuts import get_object_or_404
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework import filters, permissions, status, viewsets
 from rest_framework.decorators import action, api_view, permission_classes
+from rest_framework.exceptions import NotFound, ValidationError
 from rest_framework.generics import CreateAPIView
 from rest_framework.response import Response
 from rest_framework_simplejwt.tokens import RefreshToken, SlidingToken
-from reviews.models import Category, Comment, Genre, Review, Title, User
+from reviews.models import (Category, Genre, Recommendation, Review,
+                            SimilarTitle, Title, User)
 
-from .serializers import (CategorySerializer, CommentSerializer,
-                          GenreSerializer, MeSerializer, ReviewsSerializer,
-                          SelfRegisterSerializer, TitleReadSerializer,
+from .bulk import (bulk_delete_reviews, bulk_save_titles, bulk_update_reviews,
+                   validate_batch)
+from .serializers import (HISTOGRAM_FIELDS, CategorySerializer,
+                          CommentSerializer, GenreSerializer,
+                          LeaderboardSerializer, MeSerializer,
+                          RecommendationSerializer, ReviewsSerializer,
+                          SelfRegisterSerializer, SimilarTitleSerializer,
+                          TitleDetailSerializer, TitleReadSerializer,
                           TitleWriteSerializer, UserSerializer)
 
 
@@ -68,17 +88,18 @@ def get_user_token(request):
         )
 
 
-class UserViewSet(viewsets.ModelViewSet):
+class UserViewSet(SerializeTimingMixin, viewsets.ModelViewSet):
     """Viewset for users."""
 
     queryset = User.objects.all()
     serializer_class = UserSerializer
+    count_resources = ('users',)
     filter_backends = (filters.SearchFilter,)
     search_fields = ('=username',)
     lookup_field = 'username'
 
     def get_permissions(self):
-        if self.action == 'me':
+        if self.action in ('me', 'recommendations'):
             permission_classes = [permissions.IsAuthenticated]
         else:
             permission_classes = [AdminOnly]
@@ -90,22 +111,45 @@ class UserViewSet(viewsets.ModelViewSet):
             return Response(
                 status=status.HTTP_405_METHOD_NOT_ALLOWED
             )
-        user = self.request.user
+        # request.user may be a cached snapshot with deferred fields.
+        user = get_object_or_404(User, pk=request.user.pk)
         serializer = MeSerializer(user)
         if request.method == 'PATCH':
             serializer = MeSerializer(
-                request.user,
+                user,
                 data=request.data,
                 partial=True
             )
             if serializer.is_valid():
                 serializer.save()
-        return Response(serializer.data)
+        return Response(serialized(request, serializer))
+
+    def recommendations(self, request):
+        """
+        Titles the current user is predicted to rate highest, stored by
+        the train_recommendations command. Titles reviewed since the
+        last training are skipped.
+        """
+        stored = Recommendation.objects.filter(user=request.user).exclude(
+            title__reviews__author=request.user).select_related(
+            'title__category').prefetch_related(
+            'title__genre').order_by('rank')
+        titles = []
+        for recommendation in stored:
+            recommendation.title.predicted_score = recommendation.score
+            titles.append(recommendation.title)
+        return Response(
+            serialized(request, RecommendationSerializer(titles, many=True)))
 
 
-class GenreViewSet(RetrieveUpdateModelMixin):
+class GenreViewSet(
+    CachedReadMixin, SerializeTimingMixin, SparseFieldsMixin,
+    RetrieveUpdateModelMixin
+):
     """Viewset for genres."""
 
+    cache_resources = ('genres',)
+    count_resources = ('genres',)
     queryset = Genre.objects.all()
     serializer_class = GenreSerializer
     permission_classes = [AdminOrReadOnly]
@@ -114,9 +158,14 @@ class GenreViewSet(RetrieveUpdateModelMixin):
     search_fields = ('name',)
 
 
-class CategoryViewSet(RetrieveUpdateModelMixin):
+class CategoryViewSet(
+    CachedReadMixin, SerializeTimingMixin, SparseFieldsMixin,
+    RetrieveUpdateModelMixin
+):
     """Viewset for categories."""
 
+    cache_resources = ('categories',)
+    count_resources = ('categories',)
     queryset = Category.objects.all()
     serializer_class = CategorySerializer
     permission_classes = [AdminOrReadOnly]
@@ -125,57 +174,253 @@ class CategoryViewSet(RetrieveUpdateModelMixin):
     search_fields = ('name',)
 
 
-class TitleViewSet(viewsets.ModelViewSet):
+class TitleViewSet(
+    ConditionalGetMixin, CachedReadMixin, FastReadMixin,
+    SerializeTimingMixin, SparseFieldsMixin, viewsets.ModelViewSet
+):
     """Viewset for titles."""
 
-    queryset = Title.objects.annotate(rating=Avg('reviews__score'))
+    cache_resources = ('titles',)
+    count_resources = ('titles',)
+    queryset = Title.objects.select_related(
+        'category').prefetch_related('genre')
     permission_classes = [AdminOrReadOnly]
-    filter_backends = (DjangoFilterBackend, filters.OrderingFilter,)
+    filter_backends = (
+        DjangoFilterBackend, TitleSearchFilter, filters.OrderingFilter,)
     filterset_class = TitleFilters
+    sparse_columns = {'score_distribution': HISTOGRAM_FIELDS}
 
     def get_serializer_class(self):
-        if self.action in ('list', 'retrieve'):
+        if self.action == 'retrieve':
+            return TitleDetailSerializer
+        if self.action == 'list':
             return TitleReadSerializer
         return TitleWriteSerializer
 
+    def get_freshness(self):
+        if self.action == 'retrieve':
+            try:
+                modified = Title.objects.filter(
+                    pk=self.kwargs['pk']).values_list(
+                    'modified', flat=True).first()
+            except ValueError:
+                return None
+            if modified is None:
+                return None
+            return modified, modified
+        # Every write to a title bumps its versions, the ETag already
+        # covers the query parameters; the list has no Last-Modified.
+        if not is_enabled():
+            return None
+        return None, get_versions(self.cache_resources)
+
+    @action(detail=False, methods=['post', 'patch'])
+    def bulk(self, request):
+        """
+        Creates (POST) or partially updates (PATCH, objects with id)
+        up to BULK_API['max_batch_size'] titles in one transaction.
+        Every object gets its own status in the results.
+        """
+        is_update = request.method == 'PATCH'
+        validate_batch(request.data, require_ids=is_update)
+        instances = None
+        if is_update:
+            instances = Title.objects.select_related(
+                'category').prefetch_related('genre').in_bulk(
+                [item['id'] for item in request.data])
+        results = bulk_save_titles(
+            request.data, self.get_serializer_context(), instances)
+        return Response({'results': results})
+
+    @action(detail=False)
+    def leaderboard(self, request):
+        """
+        Top titles by weighted rating, optionally within a category
+        or genre given by slug. Reads the stored rating through an index.
+        """
+        config = settings.LEADERBOARD
+        limit = request.query_params.get('limit', config['default_limit'])
+        try:
+            limit = int(limit)
+        except ValueError:
+            limit = 0
+        if not 1 <= limit <= config['max_limit']:
+            raise ValidationError({'limit': [
+                f'Ожидается число от 1 до {config["max_limit"]}']})
+        titles = Title.objects.filter(review_count__gt=0)
+        category = request.query_params.get('category')
+        if category:
+            titles = titles.filter(category__slug=category)
+        genre = request.query_params.get('genre')
+        if genre:
+            titles = titles.filter(genre__slug=genre)
+        titles = titles.select_related('category').prefetch_related(
+            'genre').order_by('-weighted_rating', 'id')[:limit]
+        return Response(
+            serialized(request, LeaderboardSerializer(titles, many=True)))
+
+    @action(detail=True)
+    def similar(self, request, pk=None):
+        """
+        Titles closest to this one by genres, category and release
+        decade, most similar first. Reads the neighbours stored by the
+        rebuild_similar_titles command.
+        """
+        try:
+            pk = int(pk)
+        except ValueError:
+            raise NotFound
+        neighbours = SimilarTitle.objects.filter(title_id=pk).select_related(
+            'similar__category').prefetch_related(
+            'similar__genre').order_by('rank')
+        titles = []
+        for neighbour in neighbours:
+            neighbour.similar.similarity = neighbour.score
+            titles.append(neighbour.similar)
+        if not titles:
+            get_object_or_404(Title.objects.only('pk'), pk=pk)
+        return Response(
+            serialized(request, SimilarTitleSerializer(titles, many=True)))
+
 
-class ReviewsViewSet(viewsets.ModelViewSet):
+class ReviewsViewSet(
+    ConditionalGetMixin, FastReadMixin, SerializeTimingMixin,
+    SparseFieldsMixin, TitleChildMixin, viewsets.ModelViewSet
+):
     """Viewset for reviews."""
 
     serializer_class = ReviewsSerializer
     permission_classes = [AuthorAdminModerOrReadOnly]
+    pagination_class = PageNumberOrCursorPagination
+    count_resources = ('reviews',)
 
     def get_queryset(self):
-        title = get_object_or_404(
-            Title, id=self.kwargs.get('title_id')
-        )
-        return title.reviews.all()
+        return self.get_title().reviews.select_related('author')
+
+    def get_freshness(self):
+        # Review and comment writes move the modification time of title.
+        modified = self.get_title().modified
+        return modified, modified
+
+    def get_permissions(self):
+        if self.action == 'bulk':
+            return [ModeratorOrAdmin()]
+        return super().get_permissions()
+
+    @action(detail=False, methods=['patch', 'delete'])
+    def bulk(self, request, title_id=None):
+        """
+        Moderation of many reviews of a title at once: PATCH changes
+        text and score, DELETE removes the reviews with the given ids.
+        """
+        validate_batch(request.data, require_ids=True)
+        if request.method == 'DELETE':
+            results = bulk_delete_reviews(self.get_title(), request.data)
+        else:
+            results = bulk_update_reviews(
+                self.get_title(), request.data,
+                self.get_serializer_context())
+        return Response({'results': results})
 
     def perform_create(self, serializer):
-        title = get_object_or_404(Title, id=self.kwargs.get('title_id'))
         serializer.save(
             author=self.request.user,
-            title=title
+            title=self.get_title()
         )
 
 
-class CommentViewSet(viewsets.ModelViewSet):
+class CommentViewSet(
+    ConditionalGetMixin, FastReadMixin, SerializeTimingMixin,
+    SparseFieldsMixin, ReviewChildMixin, viewsets.ModelViewSet
+):
     """Viewset for comments."""
 
     serializer_class = CommentSerializer
     permission_classes = [AuthorAdminModerOrReadOnly]
+    pagination_class = PageNumberOrCursorPagination
+    count_resources = ('comments',)
 
     def get_queryset(self):
-        review = get_object_or_404(
-            Review, id=self.kwargs.get('review_id')
-        )
-        return Comment.objects.filter(
-            review=review
-        )
+        return self.get_review().comments.select_related('author')
+
+    def get_freshness(self):
+        modified = self.get_title().modified
+        return modified, modified
 
     def perform_create(self, serializer):
-        review = get_object_or_404(Review, id=self.kwargs.get('review_id'))
         serializer.save(
             author=self.request.user,
-            review=review
+            review=self.get_review()
         )
+
+
+EXPORT_CHUNK_SIZE = 2000
+
+
+def parse_since(request):
+    since = request.query_params.get('since')
+    if not since:
+        return None
+    try:
+        moment = parse_datetime(since) or parse_date(since)
+    except ValueError:
+        moment = None
+    if moment is None:
+        raise ValidationError(
+            {'since': 'Ожидается дата или дата и время в ISO 8601'})
+    if not isinstance(moment, datetime.datetime):
+        moment = datetime.datetime.combine(moment, datetime.time.min)
+    if timezone.is_naive(moment):
+        return timezone.make_aware(moment)
+    return moment
+
+
+def ndjson_response(rows):
+    return StreamingHttpResponse(
+        (json.dumps(row, ensure_ascii=False) + '\n' for row in rows),
+        content_type='application/x-ndjson',
+    )
+
+
+def iter_titles(since):
+    """Titles in pk order, one page of rows in memory at a time."""
+
+    titles = TitleViewSet.queryset.order_by('pk')
+    if since is not None:
+        titles = titles.filter(modified__gte=since)
+    last_pk = 0
+    while True:
+        batch = list(titles.filter(pk__gt=last_pk)[:EXPORT_CHUNK_SIZE])
+        if not batch:
+            return
+        yield from TitleReadSerializer(batch, many=True).data
+        last_pk = batch[-1].pk
+
+
+def iter_reviews(since):
+    reviews = Review.objects.select_related('author').order_by('pk')
+    if since is not None:
+        reviews = reviews.filter(pub_date__gte=since)
+    for review in reviews.iterator(chunk_size=EXPORT_CHUNK_SIZE):
+        row = ReviewsSerializer(review).data
+        row['title'] = review.title_id
+        yield row
+
+
+@api_view(['GET', ])
+@permission_classes((AdminOnly, ))
+def export_titles(request):
+    """
+    All titles with category, genres and rating as NDJSON, optionally
+    only those changed since ?since=.
+    """
+
+    return ndjson_response(iter_titles(parse_since(request)))
+
+
+@api_view(['GET', ])
+@permission_classes((AdminOnly, ))
+def export_reviews(request):
+    """All reviews as NDJSON, optionally published since ?since=."""
+
+    return ndjson_response(iter_reviews(parse_since(request)))
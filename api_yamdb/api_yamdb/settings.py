@@ -20,6 +20,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     'rest_framework',
     'django_filters',
     'reviews.apps.ReviewsConfig',
@@ -30,6 +31,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'core.instrumentation.InstrumentationMiddleware',
+    'core.replicas.ReplicaMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -71,6 +74,43 @@ DATABASES = {
     }
 }
 
+# Read replicas, comma separated hosts (database files for SQLite),
+# become the replica_1, replica_2, ... aliases.
+_replicas = [
+    value for value in os.getenv('DB_REPLICAS', default='').split(',')
+    if value
+]
+_replica_key = (
+    'NAME' if DATABASES['default']['ENGINE'].endswith('sqlite3') else 'HOST')
+for _index, _value in enumerate(_replicas, 1):
+    DATABASES[f'replica_{_index}'] = dict(
+        DATABASES['default'], TEST={'MIRROR': 'default'},
+        **{_replica_key: _value})
+
+DATABASE_ROUTERS = ['core.replicas.ReplicaRouter']
+
+# A client reads from the primary for sticky_seconds after its write,
+# a replica that fails to connect is skipped for retry_after seconds.
+# Requests keyed by cache versions bumped less than lag_seconds ago read
+# from the primary, so replica rows older than a version are not cached.
+REPLICAS = {
+    'aliases': [f'replica_{index}' for index in range(1, len(_replicas) + 1)],
+    'cookie': 'primary_until',
+    'sticky_seconds': 5,
+    'retry_after': 30,
+    'lag_seconds': 5,
+}
+
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv(
+            'CACHE_BACKEND',
+            default='django.core.cache.backends.locmem.LocMemCache'
+        ),
+        'LOCATION': os.getenv('CACHE_LOCATION', default='yamdb'),
+    }
+}
+
 AUTH_PASSWORD_VALIDATORS = [
     {
         'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator',
@@ -112,17 +152,73 @@ SIMPLE_JWT = {
     'AUTH_HEADER_TYPES': ('Bearer',),
 }
 
+BULK_API = {
+    'max_batch_size': 100,
+}
+
+# Weighted rating is (score_sum + min_votes * mean) / (votes + min_votes),
+# mean is the stored RatingPrior or default_mean before the first rebuild.
+LEADERBOARD = {
+    'min_votes': 10,
+    'default_mean': 5.5,
+    'default_limit': 10,
+    'max_limit': 100,
+}
+
+# Similar titles are the nearest ones by cosine similarity of weighted
+# genre, category and release decade features. Scores of at most
+# block_memory bytes are held at once, batch_size titles are stored
+# per transaction.
+SIMILAR_TITLES = {
+    'neighbours': 10,
+    'genre_weight': 1.0,
+    'category_weight': 0.5,
+    'year_weight': 0.5,
+    'year_bucket': 10,
+    'block_memory': 64 * 1024 * 1024,
+    'batch_size': 1000,
+}
+
+# Recommendations come from a biased matrix factorization of review
+# scores fitted by alternating least squares. Users are scored against
+# the `candidates` most reviewed titles (None for all); row batches of
+# at most batch_entries scores are solved at once, rows with more
+# scores alone.
+RECOMMENDATIONS = {
+    'factors': 32,
+    'iterations': 10,
+    'regularization': 0.05,
+    'top_n': 20,
+    'candidates': 20000,
+    'batch_entries': 20000,
+    'block_memory': 64 * 1024 * 1024,
+    'batch_size': 1000,
+}
+
+# List endpoints build JSON from values() rows instead of serializers.
+FAST_READ = {
+    'enabled': True,
+}
+
+AUTH_USER_CACHE = {
+    'ttl': 60,
+}
+
 REST_FRAMEWORK = {
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticatedOrReadOnly',
     ],
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'core.authentication.CachedJWTAuthentication',
+    ],
+    'DEFAULT_RENDERER_CLASSES': [
+        'core.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
     ],
     'DEFAULT_FILTER_BACKENDS': [
         'django_filters.rest_framework.DjangoFilterBackend'
     ],
-    'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
+    'DEFAULT_PAGINATION_CLASS': 'core.pagination.CachedCountPagination',
     'PAGE_SIZE': 5,
 }
 
@@ -133,7 +229,64 @@ EMAIL_CONFIG = {
     'text': 'Ваш логин {}. Ваш код подтверждения {}',
     'from': 'no_reply@yamdb.com'
 }
+EMAIL_OUTBOX = {
+    'batch_size': 100,
+    'workers': 4,
+    'max_attempts': 5,
+    'backoff': 30,
+    'max_backoff': 60 * 60,
+    'lock_timeout': 60 * 10,
+    'poll_interval': 5,
+}
+
+# Cached responses, page counts and title list ETags rely on version
+# counters shared by all processes. The local memory cache is only used
+# when allow_local confirms that a single process serves the app.
+RESPONSE_CACHE = {
+    'alias': 'default',
+    'timeout': 60 * 5,
+    'allow_local': os.getenv(
+        'RESPONSE_CACHE_ALLOW_LOCAL', default='') == 'true',
+}
+# Page counts are cached until a write, unfiltered tables with more than
+# estimate_threshold rows (None to turn off) report planner estimates.
+COUNT_CACHE = {
+    'timeout': 60 * 5,
+    'estimate_threshold': 100000,
+}
+TITLE_SEARCH = {
+    'backend': os.getenv('TITLE_SEARCH_BACKEND', default='auto'),
+}
 
+# Query counts and timings of requests: Server-Timing header for admins,
+# JSON log lines for a sample_rate share of requests and slow ones.
+INSTRUMENTATION = {
+    'enabled': True,
+    'sample_rate': 0.01,
+    'slow_ms': 1000,
+}
+
+# Prometheus metrics at /metrics. Set PROMETHEUS_MULTIPROC_DIR to a
+# directory shared by the worker processes to report their totals.
+METRICS = {
+    'enabled': True,
+}
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {
+            'class': 'logging.StreamHandler',
+        },
+    },
+    'loggers': {
+        'core.instrumentation': {
+            'handlers': ['console'],
+            'level': 'INFO',
+        },
+    },
+}
 
 MAGIC_VARS = {
     'YEAR': 1492,
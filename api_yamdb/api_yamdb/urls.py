@@ -1,9 +1,11 @@
+from core.metrics import metrics_view
 from django.contrib import admin
 from django.urls import include, path
 from django.views.generic import TemplateView
 
 urlpatterns = [
     path('admin/', admin.site.urls),
+    path('metrics', metrics_view, name='metrics'),
     path(
         'api/redoc/',
         TemplateView.as_view(template_name='api/redoc.html'),
@@ -1,6 +1,8 @@
+from django.shortcuts import get_object_or_404
 from rest_framework import status
 from rest_framework.response import Response
 from rest_framework.viewsets import ModelViewSet
+from reviews.models import Review, Title
 
 
 class RetrieveUpdateModelMixin(ModelViewSet):
@@ -15,3 +17,46 @@ class RetrieveUpdateModelMixin(ModelViewSet):
         return Response(
             {'error': 'Метод не доступен'},
             status=status.HTTP_405_METHOD_NOT_ALLOWED)
+
+
+class TitleChildMixin:
+    """
+    Resolves the title from the URL once per request.
+    The title is shared by get_queryset, perform_create and
+    the serializer context.
+    """
+
+    def get_title(self):
+        if not hasattr(self, '_title'):
+            self._title = get_object_or_404(
+                Title, pk=self.kwargs.get('title_id'))
+        return self._title
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        context['title'] = self.get_title()
+        return context
+
+
+class ReviewChildMixin(TitleChildMixin):
+    """
+    Resolves the review and its title from the URL in one query.
+    A review of another title gives 404.
+    """
+
+    def get_review(self):
+        if not hasattr(self, '_review'):
+            self._review = get_object_or_404(
+                Review.objects.select_related('title'),
+                pk=self.kwargs.get('review_id'),
+                title_id=self.kwargs.get('title_id'),
+            )
+        return self._review
+
+    def get_title(self):
+        return self.get_review().title
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        context['review'] = self.get_review()
+        return context
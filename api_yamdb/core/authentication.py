@@ -0,0 +1,65 @@
+from django.conf import settings
+from django.db import router, transaction
+from django.db.models.base import DEFERRED
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.settings import api_settings
+from reviews.models import User
+
+from .cache import bump_versions, get_cache, get_versions, is_enabled
+
+SNAPSHOT_FIELDS = ('id', 'username', 'role', 'is_active', 'is_superuser')
+
+
+def _resource(user_id):
+    return f'user-{user_id}'
+
+
+def _snapshot_key(user_id, version):
+    return f'auth-user:{user_id}:{version}'
+
+
+def forget_user(user_id):
+    """
+    Makes cached snapshots of a user unreachable in every process,
+    again on commit for readers that cached the old row meanwhile.
+    """
+
+    bump_versions(_resource(user_id))
+    transaction.on_commit(lambda: bump_versions(_resource(user_id)))
+
+
+def user_from_snapshot(snapshot):
+    """
+    User instance built without a query.
+    Fields not in the snapshot are deferred and load on first access.
+    """
+
+    names = [field.attname for field in User._meta.concrete_fields]
+    values = [snapshot.get(name, DEFERRED) for name in names]
+    return User.from_db(router.db_for_read(User), names, values)
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """
+    JWT authentication that keeps resolved users in the shared cache
+    by user id and version, so repeated requests of a user make no user
+    query and a change of the user reaches every worker at once.
+    """
+
+    def get_user(self, validated_token):
+        user_id = validated_token.get(api_settings.USER_ID_CLAIM)
+        if user_id is None or not is_enabled():
+            return super().get_user(validated_token)
+        cache = get_cache()
+        # The version is read first, a change meanwhile bumps it and the
+        # snapshot stored below is never read.
+        version, = get_versions([_resource(user_id)])
+        key = _snapshot_key(user_id, version)
+        snapshot = cache.get(key)
+        if snapshot is not None:
+            return user_from_snapshot(snapshot)
+        user = super().get_user(validated_token)
+        cache.set(
+            key, {name: getattr(user, name) for name in SNAPSHOT_FIELDS},
+            settings.AUTH_USER_CACHE['ttl'])
+        return user
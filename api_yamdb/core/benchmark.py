@@ -0,0 +1,205 @@
+import math
+import platform
+import random
+import time
+
+import django
+from django.conf import settings
+from django.db import connection
+from django.db.models import Max
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.utils import timezone
+from reviews.generator import WORDS
+from reviews.models import Comment, Genre, Review, Title, User
+
+from .cache import get_cache
+
+SCALES = {
+    'tiny': {'users': 50, 'titles': 100, 'reviews': 1000, 'comments': 1000},
+    'small': {
+        'users': 2000, 'titles': 5000,
+        'reviews': 100000, 'comments': 50000,
+    },
+    'large': {
+        'users': 200000, 'titles': 100000,
+        'reviews': 10000000, 'comments': 2000000,
+    },
+}
+PERCENTILES = (50, 95, 99)
+ENDPOINTS = (
+    'titles-list', 'titles-filter', 'titles-search', 'title-detail',
+    'leaderboard', 'reviews-list', 'reviews-cursor', 'review-detail',
+    'comments-list', 'genres-list', 'categories-list',
+)
+
+
+def isolated_cache():
+    """
+    Settings with every cache alias replaced by a local cache of its
+    own, so seeding and measuring never read, bump or clear the entries
+    of the running site.
+    """
+
+    return override_settings(
+        CACHES={
+            alias: {
+                'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+                'LOCATION': f'benchmark-{alias}',
+            }
+            for alias in settings.CACHES
+        },
+        RESPONSE_CACHE=dict(settings.RESPONSE_CACHE, allow_local=True),
+    )
+
+
+def build_endpoints(rng, sample_size=100):
+    """URLs to request for every measured endpoint, sampled from data."""
+
+    title_ids = list(Title.objects.order_by('pk').values_list(
+        'pk', flat=True)[:10000])
+    popular = list(Title.objects.order_by('-review_count', 'pk').values_list(
+        'pk', flat=True)[:sample_size])
+    reviews = list(Review.objects.filter(title__in=popular).order_by(
+        'pk').values_list('title_id', 'pk')[:sample_size])
+    commented = list(Comment.objects.order_by('review_id').values_list(
+        'review__title', 'review_id').distinct()[:sample_size])
+    pages = max(1, min(20, Title.objects.count() // 5))
+    genres = list(Genre.objects.values_list('slug', flat=True))
+
+    def sample(values):
+        return [rng.choice(values) for _ in range(sample_size)] if (
+            values) else []
+
+    endpoints = {
+        'titles-list': [
+            f'/api/v1/titles/?page={page}'
+            for page in sample(range(1, pages + 1))],
+        'titles-filter': [
+            f'/api/v1/titles/?genre={slug}&ordering=-year'
+            for slug in sample(genres)],
+        'titles-search': [
+            f'/api/v1/titles/?search={word}' for word in sample(WORDS)],
+        'title-detail': [
+            f'/api/v1/titles/{pk}/' for pk in sample(title_ids)],
+        'leaderboard': ['/api/v1/titles/leaderboard/?limit=20'],
+        'reviews-list': [
+            f'/api/v1/titles/{pk}/reviews/' for pk in sample(popular)],
+        'reviews-cursor': [
+            f'/api/v1/titles/{pk}/reviews/?pagination=cursor'
+            for pk in sample(popular)],
+        'review-detail': [
+            f'/api/v1/titles/{title_id}/reviews/{pk}/'
+            for title_id, pk in sample(reviews)],
+        'comments-list': [
+            f'/api/v1/titles/{title_id}/reviews/{pk}/comments/'
+            for title_id, pk in sample(commented)],
+        'genres-list': ['/api/v1/genres/'],
+        'categories-list': ['/api/v1/categories/'],
+    }
+    return {name: urls for name, urls in endpoints.items() if urls}
+
+
+def percentile(values, rank):
+    """Nearest-rank percentile of sorted values."""
+
+    return values[max(0, math.ceil(rank / 100 * len(values)) - 1)]
+
+
+def measure(client, urls, requests, warmup, rng, cold_cache=False):
+    """Latency, status and query statistics of requests to urls."""
+
+    for url in urls[:warmup]:
+        client.get(url)
+    latencies = []
+    queries = []
+    errors = 0
+    for _ in range(requests):
+        url = rng.choice(urls)
+        if cold_cache:
+            get_cache().clear()
+        with CaptureQueriesContext(connection) as context:
+            started = time.perf_counter()
+            response = client.get(url)
+            latencies.append((time.perf_counter() - started) * 1000)
+        queries.append(len(context.captured_queries))
+        errors += response.status_code >= 400
+    latencies.sort()
+    return {
+        'requests': requests,
+        'errors': errors,
+        'throughput_rps': round(requests / (sum(latencies) / 1000), 2),
+        'latency_ms': dict(
+            {
+                f'p{rank}': round(percentile(latencies, rank), 3)
+                for rank in PERCENTILES
+            },
+            mean=round(sum(latencies) / requests, 3),
+            max=round(latencies[-1], 3),
+        ),
+        'queries': {
+            'mean': round(sum(queries) / requests, 2),
+            'max': max(queries),
+        },
+    }
+
+
+def run_benchmark(client, requests=200, warmup=10, seed=0, names=None,
+                  cold_cache=False):
+    """
+    Measures every endpoint under an isolated cache, returns results
+    ready to be saved.
+    """
+
+    rng = random.Random(seed)
+    endpoints = build_endpoints(rng)
+    if names:
+        endpoints = {
+            name: urls for name, urls in endpoints.items() if name in names}
+    with isolated_cache():
+        return {
+            'meta': {
+                'started': timezone.now().isoformat(),
+                'python': platform.python_version(),
+                'django': django.get_version(),
+                'database': connection.vendor,
+                'seed': seed,
+                'cold_cache': cold_cache,
+                'rows': {
+                    model.__name__.lower(): model.objects.count()
+                    for model in (User, Title, Review, Comment)
+                },
+                'max_reviews_per_title': Title.objects.aggregate(
+                    value=Max('review_count'))['value'],
+            },
+            'endpoints': {
+                name: measure(client, urls, requests, warmup, rng, cold_cache)
+                for name, urls in endpoints.items()
+            },
+        }
+
+
+def compare_results(current, baseline, threshold):
+    """
+    Yields (endpoint, metric, baseline, current, change %, regressed)
+    for the endpoints of both runs. Higher p95 latency, lower throughput
+    or more queries than the baseline by threshold % is a regression.
+    """
+
+    for name, result in current['endpoints'].items():
+        base = baseline['endpoints'].get(name)
+        if base is None:
+            continue
+        metrics = (
+            ('throughput_rps', base['throughput_rps'],
+             result['throughput_rps'], -1),
+            ('p50_ms', base['latency_ms']['p50'],
+             result['latency_ms']['p50'], 1),
+            ('p95_ms', base['latency_ms']['p95'],
+             result['latency_ms']['p95'], 1),
+            ('queries', base['queries']['mean'],
+             result['queries']['mean'], 1),
+        )
+        for metric, old, new, direction in metrics:
+            change = (new - old) / old * 100 if old else 0.0
+            regressed = metric != 'p50_ms' and change * direction > threshold
+            yield name, metric, old, new, round(change, 1), regressed
@@ -0,0 +1,153 @@
+import hashlib
+import threading
+import time
+from collections import Counter
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+from rest_framework import status
+from rest_framework.response import Response
+
+from .metrics import record_cache
+from .replicas import read_from_primary
+
+_stats = Counter()
+_stats_lock = threading.Lock()
+
+
+def get_cache():
+    return caches[settings.RESPONSE_CACHE['alias']]
+
+
+def is_enabled():
+    """
+    Whether responses, counts and ETags may rely on version counters.
+    Counters in a process-local cache are not bumped by writes of other
+    gunicorn workers or management commands, so LocMemCache is only
+    used when RESPONSE_CACHE['allow_local'] says the app runs in one
+    process. DummyCache keeps no counters at all.
+    """
+
+    cache = get_cache()
+    if isinstance(cache, DummyCache):
+        return False
+    if isinstance(cache, LocMemCache):
+        return settings.RESPONSE_CACHE['allow_local']
+    return True
+
+
+def _version_key(resource):
+    return f'response-version:{resource}'
+
+
+def _bumped_key(resource):
+    return f'response-bumped:{resource}'
+
+
+def get_versions(resources):
+    """
+    Current version counters of resources, created on first use.
+    A replica may not have the rows of a version bumped less than
+    REPLICAS['lag_seconds'] ago yet, the request then reads from the
+    primary whatever is stored under that version.
+    """
+
+    cache = get_cache()
+    keys = [_version_key(resource) for resource in resources]
+    bumped = [_bumped_key(resource) for resource in resources]
+    versions = cache.get_many(keys + bumped)
+    if any(key in versions for key in bumped):
+        read_from_primary()
+    for key in keys:
+        if key not in versions:
+            # A timestamp never repeats an evicted counter value.
+            cache.add(key, int(time.time() * 1000), timeout=None)
+            versions[key] = cache.get(key)
+    return [versions[key] for key in keys]
+
+
+def bump_versions(*resources):
+    """Invalidates every cached response built from resources."""
+
+    cache = get_cache()
+    for resource in resources:
+        key = _version_key(resource)
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, int(time.time() * 1000), timeout=None)
+    if settings.REPLICAS['aliases']:
+        cache.set_many(
+            {_bumped_key(resource): True for resource in resources},
+            settings.REPLICAS['lag_seconds'])
+
+
+def count(event):
+    with _stats_lock:
+        _stats[event] += 1
+    record_cache(event)
+
+
+def cache_stats():
+    """Hit and miss counters of this process."""
+
+    with _stats_lock:
+        return {'hits': _stats['hit'], 'misses': _stats['miss']}
+
+
+def reset_cache_stats():
+    with _stats_lock:
+        _stats.clear()
+
+
+class CachedReadMixin:
+    """
+    Caches list and retrieve responses of a viewset.
+    Keys include the versions of cache_resources, the action, URL kwargs,
+    sorted query parameters and the scheme and host of the absolute
+    links in the body, so any write to a listed resource makes previous
+    entries unreachable. Does nothing unless is_enabled().
+    """
+
+    cache_resources = ()
+
+    def list(self, request, *args, **kwargs):
+        return self.cached_response(super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.cached_response(
+            super().retrieve, request, *args, **kwargs)
+
+    def get_cache_key(self, request):
+        params = sorted(
+            (key, value)
+            for key, values in request.query_params.lists()
+            for value in values
+        )
+        raw = repr((
+            get_versions(self.cache_resources),
+            sorted(self.kwargs.items()),
+            params,
+            request.scheme,
+            request.get_host(),
+        ))
+        digest = hashlib.md5(raw.encode()).hexdigest()
+        return f'response:{self.basename}:{self.action}:{digest}'
+
+    def cached_response(self, handler, request, *args, **kwargs):
+        if not is_enabled():
+            return handler(request, *args, **kwargs)
+        cache = get_cache()
+        key = self.get_cache_key(request)
+        data = cache.get(key)
+        if data is not None:
+            count('hit')
+            return Response(data, headers={'X-Cache': 'HIT'})
+        count('miss')
+        response = handler(request, *args, **kwargs)
+        if response.status_code == status.HTTP_200_OK:
+            cache.set(key, response.data, settings.RESPONSE_CACHE['timeout'])
+        response['X-Cache'] = 'MISS'
+        return response
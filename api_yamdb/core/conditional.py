@@ -0,0 +1,66 @@
+import hashlib
+
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+from rest_framework import status
+
+
+class ConditionalGetMixin:
+    """
+    Answers If-None-Match and If-Modified-Since on list and retrieve
+    with 304 before the response body is built.
+    Viewsets describe the state of the resource in get_freshness,
+    the ETag also covers the action, URL kwargs, query parameters
+    and the response format.
+    """
+
+    def list(self, request, *args, **kwargs):
+        return self.conditional_response(
+            super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.conditional_response(
+            super().retrieve, request, *args, **kwargs)
+
+    def get_freshness(self):
+        """
+        Returns (last_modified, state) of the requested resource,
+        or None when the request can not be answered conditionally.
+        """
+        raise NotImplementedError
+
+    def get_etag(self, request, state):
+        params = sorted(
+            (key, value)
+            for key, values in request.query_params.lists()
+            for value in values
+        )
+        raw = repr((
+            self.basename,
+            self.action,
+            sorted(self.kwargs.items()),
+            params,
+            request.accepted_renderer.format,
+            state,
+        ))
+        return quote_etag(hashlib.md5(raw.encode()).hexdigest())
+
+    def conditional_response(self, handler, request, *args, **kwargs):
+        freshness = self.get_freshness()
+        if freshness is None:
+            return handler(request, *args, **kwargs)
+        last_modified, state = freshness
+        etag = self.get_etag(request, state)
+        timestamp = None
+        if last_modified is not None:
+            timestamp = int(last_modified.timestamp())
+        response = get_conditional_response(
+            request._request, etag=etag, last_modified=timestamp)
+        if response is None:
+            response = handler(request, *args, **kwargs)
+            if response.status_code != status.HTTP_200_OK:
+                return response
+        response['ETag'] = etag
+        if timestamp is not None:
+            response['Last-Modified'] = http_date(timestamp)
+        return response
@@ -0,0 +1,180 @@
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.exceptions import FieldDoesNotExist
+from rest_framework import serializers
+from rest_framework.response import Response
+
+from .instrumentation import serializing
+
+_plans = {}
+
+# Serializer fields whose to_representation returns database values as is.
+PLAIN_FIELDS = (
+    serializers.BooleanField,
+    serializers.CharField,
+    serializers.IntegerField,
+    serializers.SlugRelatedField,
+)
+
+
+class UnsupportedFieldError(Exception):
+    """Serializer field that the row plan can not reproduce."""
+
+
+def _converter(field):
+    if type(field) in PLAIN_FIELDS:
+        return None
+    return field.to_representation
+
+
+class RowPlan:
+    """
+    Serializer compiled to values() columns and converters.
+    Builds the same data as the serializer from plain rows: one values()
+    query for the objects and one per nested list, without model
+    instances or serializer field lookups on every row.
+    """
+
+    def __init__(self, model, fields, prefix=''):
+        self.model = model
+        self.prefix = prefix
+        self.columns = []
+        self.steps = []
+        self.lists = []
+        opts = model._meta
+        for name, field in fields.items():
+            source = field.source
+            try:
+                model_field = opts.get_field(source)
+            except FieldDoesNotExist:
+                raise UnsupportedFieldError(name)
+            if model_field.one_to_many:
+                raise UnsupportedFieldError(name)
+            if model_field.many_to_many:
+                self._add_list(name, field, model_field)
+            elif model_field.is_relation:
+                self._add_relation(name, field, source)
+            else:
+                self._add_column(name, field, source)
+
+    def _add_column(self, name, field, source):
+        column = self.prefix + source
+        self.columns.append(column)
+        self.steps.append((name, column, _converter(field), None))
+
+    def _add_relation(self, name, field, source):
+        column = self.prefix + source
+        if isinstance(field, serializers.SlugRelatedField):
+            self._add_column(name, field, f'{source}__{field.slug_field}')
+            return
+        if not isinstance(field, serializers.ModelSerializer):
+            raise UnsupportedFieldError(name)
+        nested = RowPlan(
+            field.Meta.model, field.fields, prefix=f'{column}__')
+        if nested.lists:
+            raise UnsupportedFieldError(name)
+        self.columns.append(column)
+        self.columns.extend(nested.columns)
+        self.steps.append((name, column, None, nested))
+
+    def _add_list(self, name, field, model_field):
+        if not (
+            isinstance(field, serializers.ListSerializer)
+            and isinstance(field.child, serializers.ModelSerializer)
+        ):
+            raise UnsupportedFieldError(name)
+        nested = RowPlan(field.child.Meta.model, field.child.fields)
+        if nested.lists or self.prefix:
+            raise UnsupportedFieldError(name)
+        self.columns.append('pk')
+        self.lists.append((name, model_field.related_query_name(), nested))
+        self.steps.append((name, None, None, None))
+
+    def build_row(self, row, lists=None):
+        data = {}
+        for name, column, convert, nested in self.steps:
+            if column is None:
+                data[name] = lists[name].get(row['pk'], [])
+                continue
+            value = row[column]
+            if value is None:
+                data[name] = None
+            elif nested is not None:
+                data[name] = nested.build_row(row)
+            elif convert is None:
+                data[name] = value
+            else:
+                data[name] = convert(value)
+        return data
+
+    def fetch_lists(self, rows):
+        """Nested lists of the rows by name and primary key."""
+
+        lists = {}
+        ids = [row['pk'] for row in rows]
+        for name, query_name, nested in self.lists:
+            related = defaultdict(list)
+            items = nested.model.objects.filter(
+                **{f'{query_name}__in': ids}
+            ).values(query_name, *nested.columns)
+            for item in items:
+                related[item[query_name]].append(nested.build_row(item))
+            lists[name] = related
+        return lists
+
+    def build(self, rows):
+        rows = list(rows)
+        lists = self.fetch_lists(rows) if self.lists else None
+        return [self.build_row(row, lists) for row in rows]
+
+
+def get_row_plan(serializer):
+    """
+    Cached plan for the fields of serializer, None when a field
+    can not be read from values() rows.
+    """
+
+    key = (type(serializer), tuple(serializer.fields))
+    if key not in _plans:
+        # Fields of a serializer without request context are kept.
+        fields = type(serializer)().fields
+        try:
+            _plans[key] = RowPlan(
+                serializer.Meta.model,
+                {name: fields[name] for name in serializer.fields})
+        except UnsupportedFieldError:
+            _plans[key] = None
+    return _plans[key]
+
+
+class FastReadMixin:
+    """
+    Serves JSON list responses from values() rows through a RowPlan
+    instead of model instances and the serializer. The output is the
+    same; browsable API, keyset pages and serializers with fields
+    the plan does not support keep the regular path.
+    """
+
+    def get_row_plan(self):
+        if not settings.FAST_READ['enabled']:
+            return None
+        if self.request.accepted_renderer.format != 'json':
+            return None
+        is_cursor_mode = getattr(self.paginator, 'is_cursor_mode', None)
+        if is_cursor_mode and is_cursor_mode(self.request):
+            return None
+        return get_row_plan(self.get_serializer())
+
+    def list(self, request, *args, **kwargs):
+        plan = self.get_row_plan()
+        if plan is None:
+            return super().list(request, *args, **kwargs)
+        queryset = self.filter_queryset(self.get_queryset())
+        rows = queryset.prefetch_related(None).values(*plan.columns)
+        page = self.paginate_queryset(rows)
+        with serializing(request):
+            data = plan.build(rows if page is None else page)
+        if page is None:
+            return Response(data)
+        return self.get_paginated_response(data)
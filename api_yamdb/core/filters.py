@@ -1,6 +1,9 @@
 import django_filters as df
+from rest_framework.filters import BaseFilterBackend
 from reviews.models import Title
 
+from .search import search_titles
+
 
 class TitleFilters(df.FilterSet):
     """Filters for /titles."""
@@ -17,3 +20,15 @@ class TitleFilters(df.FilterSet):
     class Meta:
         model = Title
         fields = ('category', 'genre', 'name', 'year')
+
+
+class TitleSearchFilter(BaseFilterBackend):
+    """Ranked full-text search for /titles by ?search=."""
+
+    search_param = 'search'
+
+    def filter_queryset(self, request, queryset, view):
+        text = request.query_params.get(self.search_param, '').strip()
+        if not text:
+            return queryset
+        return search_titles(queryset, text)
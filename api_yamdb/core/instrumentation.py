@@ -0,0 +1,193 @@
+import json
+import logging
+import random
+import time
+from contextlib import ExitStack, contextmanager
+
+from django.conf import settings
+from django.db import connections
+from reviews.models import User
+
+from .metrics import record_request
+
+logger = logging.getLogger(__name__)
+
+
+def view_action(request, view_func):
+    """Name of the view and action handling the request."""
+
+    cls = getattr(view_func, 'cls', None)
+    if cls is None:
+        return getattr(view_func, '__name__', type(view_func).__name__)
+    method = request.method.lower()
+    actions = getattr(view_func, 'actions', None) or {}
+    return f'{cls.__name__}.{actions.get(method, method)}'
+
+
+def is_admin(user):
+    return user is not None and user.is_authenticated and (
+        user.role == User.ADMIN or user.is_superuser)
+
+
+@contextmanager
+def serializing(request):
+    """Counts the time spent in the block as serialization of request."""
+
+    stats = getattr(request, '_instrumentation', None)
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        if stats is not None:
+            stats.serialize_time += time.perf_counter() - started
+
+
+def serialized(request, serializer):
+    """Data of serializer, built within serializing(request)."""
+
+    with serializing(request):
+        return serializer.data
+
+
+class SerializeTimingMixin:
+    """
+    Viewset mixin counting to_representation of its serializers as
+    serialization time, apart from the rest of the view.
+    """
+
+    def get_serializer(self, *args, **kwargs):
+        serializer = super().get_serializer(*args, **kwargs)
+        to_representation = serializer.to_representation
+
+        def timed(instance):
+            with serializing(self.request):
+                return to_representation(instance)
+
+        serializer.to_representation = timed
+        return serializer
+
+
+class RequestStats:
+    """SQL and timing figures of one request."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.action = None
+        self.queries = 0
+        self.db_time = 0.0
+        self.serialize_time = 0.0
+        self.view_started = None
+        self.render_started = None
+        self.render_finished = None
+        self.finished = None
+
+    def __call__(self, execute, sql, params, many, context):
+        # Execute wrapper of every database connection.
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db_time += time.perf_counter() - started
+            self.queries += 1
+
+    def timings(self):
+        """
+        Durations in milliseconds by Server-Timing metric name. The view
+        time leaves out serialization of data by serializers or row
+        plans, render is encoding of the data by the renderer. Database
+        time overlaps the others.
+        """
+
+        view_end = self.render_started or self.finished
+        view = 0.0
+        if self.view_started is not None:
+            view = view_end - self.view_started - self.serialize_time
+        render = 0.0
+        if self.render_finished is not None:
+            render = self.render_finished - self.render_started
+        return {
+            'db': self.db_time * 1000,
+            'view': view * 1000,
+            'serialize': self.serialize_time * 1000,
+            'render': render * 1000,
+            'total': (self.finished - self.started) * 1000,
+        }
+
+    def server_timing(self):
+        timings = self.timings()
+        descriptions = {
+            'db': f'{self.queries} queries',
+            'view': self.action,
+        }
+        return ', '.join(
+            f'{name};dur={value:.1f}' + (
+                f';desc="{descriptions[name]}"'
+                if descriptions.get(name) else '')
+            for name, value in timings.items()
+        )
+
+    def log_record(self, request, response):
+        record = {
+            'action': self.action,
+            'method': request.method,
+            'path': request.path,
+            'status': response.status_code,
+            'queries': self.queries,
+        }
+        record.update(
+            (f'{name}_ms', round(value, 2))
+            for name, value in self.timings().items())
+        return record
+
+
+class InstrumentationMiddleware:
+    """
+    Counts SQL queries and measures database, view, serialization,
+    rendering and total time of every request, attributed to the viewset
+    action. Admins get the figures in a Server-Timing header; a sample of
+    requests, and all requests slower than slow_ms, is logged as JSON.
+    The same figures feed the Prometheus metrics.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        config = settings.INSTRUMENTATION
+        if not (config['enabled'] or settings.METRICS['enabled']):
+            return self.get_response(request)
+        stats = request._instrumentation = RequestStats()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(stats))
+            response = self.get_response(request)
+        stats.finished = time.perf_counter()
+        record_request(request, response, stats)
+        if not config['enabled']:
+            return response
+
+        if is_admin(getattr(request, 'user', None)):
+            response['Server-Timing'] = stats.server_timing()
+        if (
+            random.random() < config['sample_rate']
+            or stats.timings()['total'] >= config['slow_ms']
+        ):
+            logger.info(json.dumps(
+                stats.log_record(request, response), ensure_ascii=False))
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        stats = getattr(request, '_instrumentation', None)
+        if stats is not None:
+            stats.action = view_action(request, view_func)
+            stats.view_started = time.perf_counter()
+
+    def process_template_response(self, request, response):
+        stats = getattr(request, '_instrumentation', None)
+        if stats is not None:
+            # Called right before the response is rendered.
+            stats.render_started = time.perf_counter()
+            response.add_post_render_callback(
+                lambda rendered: setattr(
+                    stats, 'render_finished', time.perf_counter()))
+        return response
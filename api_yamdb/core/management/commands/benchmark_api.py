@@ -0,0 +1,143 @@
+import json
+
+from core.benchmark import (ENDPOINTS, SCALES, compare_results, isolated_cache,
+                            run_benchmark)
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+from django.test.utils import setup_test_environment, teardown_test_environment
+from reviews.generator import generate_database
+from reviews.models import Title
+
+
+class Command(BaseCommand):
+    help = (
+        'Seeds a throwaway test database at the given scale, requests the '
+        'API endpoints through the Django test client and saves '
+        'throughput, latency percentiles and query counts to JSON.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--scale', choices=SCALES, default='tiny',
+            help='Preset numbers of users, titles, reviews and comments.')
+        for name in ('users', 'titles', 'reviews', 'comments'):
+            parser.add_argument(
+                f'--{name}', type=int, help=f'Override number of {name}.')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument(
+            '--requests', type=int, default=200,
+            help='Measured requests per endpoint.')
+        parser.add_argument(
+            '--warmup', type=int, default=10,
+            help='Unmeasured requests per endpoint before measuring.')
+        parser.add_argument(
+            '--endpoints', help='Comma separated endpoint names to run.')
+        parser.add_argument(
+            '--cold-cache', action='store_true',
+            help='Clear the benchmark response cache before every request.')
+        parser.add_argument(
+            '--use-existing', action='store_true',
+            help='Measure the configured database as is, without seeding.')
+        parser.add_argument(
+            '--keepdb', action='store_true',
+            help='Keep and reuse the seeded test database.')
+        parser.add_argument('--output', default='benchmark.json')
+        parser.add_argument(
+            '--baseline', help='Results of a previous run to compare with.')
+        parser.add_argument(
+            '--threshold', type=float, default=10,
+            help='Allowed regression against the baseline, in percent.')
+
+    def handle(self, *args, **options):
+        if options['requests'] < 1:
+            raise CommandError('--requests must be positive')
+        names = self.endpoint_names(options['endpoints'])
+        baseline = None
+        if options['baseline']:
+            with open(options['baseline'], encoding='utf-8') as source:
+                baseline = json.load(source)
+
+        try:
+            setup_test_environment()
+            own_environment = True
+        except RuntimeError:
+            # Already set up by a test runner.
+            own_environment = False
+        old_name = None
+        try:
+            if not options['use_existing']:
+                old_name = connection.settings_dict['NAME']
+                # The generator bumps cache versions of the seeded data.
+                with isolated_cache():
+                    self.create_database(options)
+            results = run_benchmark(
+                Client(),
+                requests=options['requests'],
+                warmup=options['warmup'],
+                seed=options['seed'],
+                names=names,
+                cold_cache=options['cold_cache'],
+            )
+        finally:
+            if old_name is not None:
+                connection.creation.destroy_test_db(
+                    old_name, verbosity=0, keepdb=options['keepdb'])
+            if own_environment:
+                teardown_test_environment()
+
+        with open(options['output'], 'w', encoding='utf-8') as target:
+            json.dump(results, target, ensure_ascii=False, indent=2)
+        self.report(results)
+        self.stdout.write(f'Saved to {options["output"]}')
+        if baseline is not None:
+            self.compare(results, baseline, options['threshold'])
+
+    def endpoint_names(self, value):
+        if not value:
+            return None
+        names = value.split(',')
+        unknown = set(names) - set(ENDPOINTS)
+        if unknown:
+            raise CommandError(
+                f'Unknown endpoints: {", ".join(sorted(unknown))}')
+        return names
+
+    def create_database(self, options):
+        counts = dict(SCALES[options['scale']])
+        for name in counts:
+            if options[name] is not None:
+                counts[name] = options[name]
+        connection.creation.create_test_db(
+            verbosity=0, autoclobber=True, keepdb=options['keepdb'])
+        if not options['keepdb'] or not Title.objects.exists():
+            generate_database(
+                counts, seed=options['seed'],
+                log=lambda line: self.stdout.write(f'seeded {line}'))
+
+    def report(self, results):
+        self.stdout.write(
+            f'{"endpoint":<16}{"rps":>9}{"p50":>9}{"p95":>9}{"p99":>9}'
+            f'{"queries":>9}{"errors":>8}')
+        for name, result in results['endpoints'].items():
+            latency = result['latency_ms']
+            self.stdout.write(
+                f'{name:<16}{result["throughput_rps"]:>9.1f}'
+                f'{latency["p50"]:>9.2f}{latency["p95"]:>9.2f}'
+                f'{latency["p99"]:>9.2f}{result["queries"]["mean"]:>9.1f}'
+                f'{result["errors"]:>8}'
+            )
+
+    def compare(self, results, baseline, threshold):
+        regressions = 0
+        for (
+            name, metric, old, new, change, regressed
+        ) in compare_results(results, baseline, threshold):
+            regressions += regressed
+            marker = ' REGRESSION' if regressed else ''
+            self.stdout.write(
+                f'{name:<16}{metric:<16}{old:>10}{new:>10}'
+                f'{change:>+8.1f}%{marker}')
+        if regressions:
+            raise CommandError(
+                f'{regressions} metrics regressed by more than {threshold}%')
@@ -0,0 +1,98 @@
+import time
+
+from api.serializers import ReviewsSerializer, TitleReadSerializer
+from core.fast_read import get_row_plan
+from core.renderers import FastJSONRenderer, orjson
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from rest_framework.renderers import JSONRenderer
+from reviews.models import Category, Genre, Review, Title, User
+
+
+class Command(BaseCommand):
+    help = (
+        'Compares serializer and row plan rendering of title and review '
+        'lists on generated data, written inside a transaction that is '
+        'rolled back.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--rows', type=int, default=100,
+            help='Objects per rendered list.')
+        parser.add_argument(
+            '--repeat', type=int, default=50,
+            help='Renderings per measurement.')
+
+    def handle(self, *args, **options):
+        if options['rows'] < 1 or options['repeat'] < 1:
+            raise CommandError('--rows and --repeat must be positive')
+        with transaction.atomic():
+            title = self.seed(options['rows'])
+            self.compare(
+                'titles', TitleReadSerializer,
+                Title.objects.filter(category__slug='benchmark-category')
+                .select_related('category').prefetch_related('genre'),
+                options['repeat'])
+            self.compare(
+                'reviews', ReviewsSerializer,
+                title.reviews.select_related('author'),
+                options['repeat'])
+            transaction.set_rollback(True)
+
+    def seed(self, rows):
+        category = Category.objects.create(
+            name='Бенчмарк', slug='benchmark-category')
+        genres = [
+            Genre.objects.create(
+                name=f'Бенчмарк {i}', slug=f'benchmark-genre-{i}')
+            for i in range(3)
+        ]
+        Title.objects.bulk_create(
+            Title(name=f'Произведение {i}', year=2000,
+                  description='Описание ' * 20, category=category)
+            for i in range(rows)
+        )
+        # Read back, not every backend returns ids of bulk inserted rows.
+        titles = list(Title.objects.filter(category=category).order_by('pk'))
+        Title.genre.through.objects.bulk_create(
+            Title.genre.through(title=title, genre=genre)
+            for title in titles for genre in genres
+        )
+        usernames = [f'benchmark{i}' for i in range(rows)]
+        User.objects.bulk_create(
+            User(username=username, email=f'{username}@yamdb.fake')
+            for username in usernames
+        )
+        authors = User.objects.filter(username__in=usernames).order_by('pk')
+        Review.objects.bulk_create(
+            Review(title=titles[0], author=author, text='Отзыв ' * 50,
+                   score=i % 10 + 1)
+            for i, author in enumerate(authors)
+        )
+        return titles[0]
+
+    def measure(self, render, repeat):
+        started = time.perf_counter()
+        for _ in range(repeat):
+            content = render()
+        return (time.perf_counter() - started) / repeat * 1000, content
+
+    def compare(self, name, serializer_class, queryset, repeat):
+        plan = get_row_plan(serializer_class())
+        regular_ms, regular = self.measure(
+            lambda: JSONRenderer().render(
+                serializer_class(queryset.all(), many=True).data),
+            repeat)
+        fast_ms, fast = self.measure(
+            lambda: FastJSONRenderer().render(plan.build(
+                queryset.prefetch_related(None).values(*plan.columns))),
+            repeat)
+        if fast != regular:
+            raise CommandError(f'{name}: outputs differ')
+        encoder = 'orjson' if orjson else 'json'
+        self.stdout.write(
+            f'{name}: serializer {regular_ms:.2f} ms, '
+            f'row plan + {encoder} {fast_ms:.2f} ms, '
+            f'x{regular_ms / fast_ms:.1f}'
+        )
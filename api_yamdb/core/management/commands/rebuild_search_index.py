@@ -0,0 +1,17 @@
+from core.search import rebuild_search_index
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+
+class Command(BaseCommand):
+    help = 'Rebuilds the search index of titles.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=1000,
+            help='Titles indexed per batch.')
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            total = rebuild_search_index(options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Indexed {total} titles'))
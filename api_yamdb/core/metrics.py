@@ -0,0 +1,87 @@
+import os
+
+from django.conf import settings
+from django.http import HttpResponse
+from prometheus_client import (CONTENT_TYPE_LATEST, REGISTRY,
+                               CollectorRegistry, Counter, Histogram,
+                               generate_latest, multiprocess)
+
+# Metric files of gunicorn workers are kept in this directory, a scrape
+# of any worker sums them up.
+MULTIPROCESS_ENV = 'PROMETHEUS_MULTIPROC_DIR'
+AUTH_ROUTES = {'signup': 'signup', 'token_obtain': 'token'}
+UNMATCHED = 'unmatched'
+
+REQUESTS = Counter(
+    'yamdb_requests_total', 'HTTP requests by route, method and status.',
+    ['route', 'method', 'status'])
+ERRORS = Counter(
+    'yamdb_request_errors_total', 'Requests answered with a 5xx status.',
+    ['route', 'method'])
+LATENCY = Histogram(
+    'yamdb_request_duration_seconds', 'Time to answer a request.',
+    ['route', 'method'],
+    buckets=(
+        0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10))
+QUERIES = Histogram(
+    'yamdb_request_queries', 'SQL queries per request.', ['route'],
+    buckets=(0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 89))
+DB_TIME = Histogram(
+    'yamdb_request_db_duration_seconds', 'SQL time per request.', ['route'],
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5))
+CACHE = Counter(
+    'yamdb_response_cache_total', 'Response cache lookups by result.',
+    ['result'])
+AUTH = Counter(
+    'yamdb_auth_requests_total', 'Signup and token requests by status.',
+    ['endpoint', 'status'])
+
+
+def route_name(request):
+    """URL name of the request, e.g. titles-list; bounded label values."""
+
+    match = getattr(request, 'resolver_match', None)
+    if match is None or not match.url_name:
+        return UNMATCHED
+    return match.url_name
+
+
+def record_request(request, response, stats):
+    """Adds a finished request measured by the instrumentation middleware."""
+
+    if not settings.METRICS['enabled']:
+        return
+    route = route_name(request)
+    method = request.method
+    status = response.status_code
+    REQUESTS.labels(route, method, status).inc()
+    if status >= 500:
+        ERRORS.labels(route, method).inc()
+    LATENCY.labels(route, method).observe(stats.finished - stats.started)
+    QUERIES.labels(route).observe(stats.queries)
+    DB_TIME.labels(route).observe(stats.db_time)
+    if route in AUTH_ROUTES:
+        AUTH.labels(AUTH_ROUTES[route], status).inc()
+
+
+def record_cache(result):
+    if settings.METRICS['enabled']:
+        CACHE.labels(result).inc()
+
+
+def get_registry():
+    """Registry of all worker processes in multiprocess mode."""
+
+    directory = os.environ.get(MULTIPROCESS_ENV)
+    if not directory:
+        return REGISTRY
+    registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(registry, path=directory)
+    return registry
+
+
+def metrics_view(request):
+    """Metrics in the Prometheus text format."""
+
+    return HttpResponse(
+        generate_latest(get_registry()), content_type=CONTENT_TYPE_LATEST)
@@ -0,0 +1,232 @@
+import base64
+import binascii
+import hashlib
+import json
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from django.utils.functional import cached_property
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import replace_query_param
+
+from .cache import get_cache, get_versions, is_enabled
+
+# Query parameters that change the order or shape of a page, not the count.
+COUNT_NEUTRAL_PARAMS = (
+    'ordering', 'fields', 'omit', 'format', 'pagination', 'cursor')
+
+
+class PubDateCursorPagination(BasePagination):
+    """
+    Keyset pagination over (-pub_date, -id).
+    Pages are fetched with an indexed range condition instead of
+    OFFSET and without COUNT(*), so deep pages cost the same as the first.
+    """
+
+    cursor_query_param = 'cursor'
+    page_size = api_settings.PAGE_SIZE
+    invalid_cursor_message = 'Неверный курсор'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.base_url = request.build_absolute_uri()
+        reverse, position = self.decode_cursor(request)
+        queryset = queryset.order_by(
+            *(('pub_date', 'id') if reverse else ('-pub_date', '-id')))
+        if position is not None:
+            pub_date, pk = position
+            if reverse:
+                queryset = queryset.filter(
+                    Q(pub_date__gt=pub_date) | Q(pub_date=pub_date, id__gt=pk))
+            else:
+                queryset = queryset.filter(
+                    Q(pub_date__lt=pub_date) | Q(pub_date=pub_date, id__lt=pk))
+        results = list(queryset[:self.page_size + 1])
+        has_more = len(results) > self.page_size
+        page = results[:self.page_size]
+        if reverse:
+            page.reverse()
+            self.has_next = position is not None
+            self.has_previous = has_more
+        else:
+            self.has_next = has_more
+            self.has_previous = position is not None
+        self.page = page
+        return page
+
+    def get_paginated_response(self, data):
+        return Response(OrderedDict([
+            ('next', self.get_next_link()),
+            ('previous', self.get_previous_link()),
+            ('results', data),
+        ]))
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        return self.encode_cursor(False, self.page[-1])
+
+    def get_previous_link(self):
+        if not self.has_previous or not self.page:
+            return None
+        return self.encode_cursor(True, self.page[0])
+
+    def encode_cursor(self, reverse, obj):
+        token = json.dumps([int(reverse), obj.pub_date.isoformat(), obj.pk])
+        encoded = base64.urlsafe_b64encode(token.encode()).decode()
+        return replace_query_param(
+            self.base_url, self.cursor_query_param, encoded)
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return False, None
+        try:
+            token = base64.urlsafe_b64decode(encoded.encode()).decode()
+            reverse, pub_date, pk = json.loads(token)
+            pub_date = parse_datetime(pub_date)
+        except (TypeError, ValueError, binascii.Error):
+            raise NotFound(self.invalid_cursor_message)
+        if pub_date is None or not isinstance(pk, int):
+            raise NotFound(self.invalid_cursor_message)
+        return bool(reverse), (pub_date, pk)
+
+
+class CountedPaginator(Paginator):
+    """Paginator that takes the object count from a callable."""
+
+    def __init__(self, object_list, per_page, get_count, **kwargs):
+        super().__init__(object_list, per_page, **kwargs)
+        self.get_count = get_count
+
+    @cached_property
+    def count(self):
+        return self.get_count()
+
+
+class CachedCountPagination(PageNumberPagination):
+    """
+    Page number pagination that caches counts per filter set
+    when the response cache is enabled.
+    Cache keys include the versions of the view's count_resources,
+    so a write to any of them makes previous counts unreachable.
+    Unfiltered tables larger than estimate_threshold rows get
+    the planner estimate instead; count_is_exact tells them apart.
+    """
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.count_is_exact = True
+
+        def django_paginator_class(object_list, per_page):
+            return CountedPaginator(
+                object_list, per_page,
+                lambda: self.get_count(object_list, request, view))
+
+        self.django_paginator_class = django_paginator_class
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_count(self, queryset, request, view):
+        resources = getattr(view, 'count_resources', None)
+        if not resources or not is_enabled():
+            return self.count_queryset(queryset)
+        cache = get_cache()
+        key = self.get_count_key(request, view, resources)
+        cached = cache.get(key)
+        if cached is None:
+            cached = self.count_queryset(queryset), self.count_is_exact
+            cache.set(key, cached, settings.COUNT_CACHE['timeout'])
+        count, self.count_is_exact = cached
+        return count
+
+    def count_queryset(self, queryset):
+        estimate = self.estimate_count(queryset)
+        if estimate is None:
+            return queryset.count()
+        self.count_is_exact = False
+        return estimate
+
+    def get_count_key(self, request, view, resources):
+        neutral = COUNT_NEUTRAL_PARAMS + (
+            self.page_query_param, self.page_size_query_param)
+        params = sorted(
+            (key, value)
+            for key, values in request.query_params.lists()
+            if key not in neutral
+            for value in values
+        )
+        raw = repr((
+            get_versions(resources), sorted(view.kwargs.items()), params))
+        digest = hashlib.md5(raw.encode()).hexdigest()
+        return f'count:{view.basename}:{digest}'
+
+    def estimate_count(self, queryset):
+        """Planner row estimate of an unfiltered large table, or None."""
+
+        threshold = settings.COUNT_CACHE['estimate_threshold']
+        query = queryset.query
+        if threshold is None or query.has_filters() or query.distinct:
+            return None
+        connection = connections[queryset.db]
+        if connection.vendor != 'postgresql':
+            return None
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'SELECT reltuples FROM pg_class WHERE oid = %s::regclass',
+                [queryset.model._meta.db_table])
+            row = cursor.fetchone()
+        if row is None or row[0] < max(threshold, 0):
+            return None
+        return int(row[0])
+
+    def get_paginated_response(self, data):
+        return Response(OrderedDict([
+            ('count', self.page.paginator.count),
+            ('count_is_exact', self.count_is_exact),
+            ('next', self.get_next_link()),
+            ('previous', self.get_previous_link()),
+            ('results', data),
+        ]))
+
+    def get_paginated_response_schema(self, schema):
+        response_schema = super().get_paginated_response_schema(schema)
+        response_schema['properties']['count_is_exact'] = {
+            'type': 'boolean'}
+        return response_schema
+
+
+class PageNumberOrCursorPagination(BasePagination):
+    """
+    Page number pagination by default, keyset pagination on request.
+    Clients opt in with ?pagination=cursor and then follow
+    the next/previous links, which carry an opaque cursor.
+    """
+
+    mode_query_param = 'pagination'
+    cursor_mode = 'cursor'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if self.is_cursor_mode(request):
+            self.paginator = PubDateCursorPagination()
+        else:
+            self.paginator = CachedCountPagination()
+        return self.paginator.paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        return self.paginator.get_paginated_response(data)
+
+    def is_cursor_mode(self, request):
+        return (
+            request.query_params.get(self.mode_query_param)
+            == self.cursor_mode
+            or PubDateCursorPagination.cursor_query_param
+            in request.query_params
+        )
+
+    def get_schema_fields(self, view):
+        return PageNumberPagination().get_schema_fields(view)
@@ -45,3 +45,15 @@ class AdminOnly(permissions.BasePermission):
 
     def has_object_permission(self, request, view, obj):
         return request.user.role in (User.ADMIN,) or request.user.is_superuser
+
+
+class ModeratorOrAdmin(permissions.BasePermission):
+    """Access only for moderators and admins."""
+
+    def has_permission(self, request, view):
+        if request.user.is_anonymous:
+            return False
+        return (
+            request.user.role in (User.ADMIN, User.MODERATOR)
+            or request.user.is_superuser
+        )
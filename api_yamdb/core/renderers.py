@@ -0,0 +1,57 @@
+import math
+
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def _plain_floats(data):
+    """
+    Whether every float in data is written without an exponent, as
+    orjson writes 1e-07 as 1e-7 and NaN as null where the stdlib fails.
+    """
+
+    stack = [data]
+    while stack:
+        value = stack.pop()
+        if isinstance(value, float):
+            if not math.isfinite(value) or (
+                    value and not 1e-4 <= abs(value) < 1e16):
+                return False
+        elif isinstance(value, dict):
+            stack.extend(value.values())
+        elif isinstance(value, (list, tuple)):
+            stack.extend(value)
+    return True
+
+
+class FastJSONRenderer(JSONRenderer):
+    """
+    JSONRenderer that encodes compact responses with orjson when it is
+    installed. The output matches the stdlib renderer byte for byte:
+    payloads with floats in exponent form, NaN, infinity or integers
+    beyond 64 bits, indented responses and dates are left to the
+    stdlib and DRF encoders.
+    """
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if orjson is None or data is None or not _plain_floats(data):
+            return super().render(data, accepted_media_type, renderer_context)
+        renderer_context = renderer_context or {}
+        if self.get_indent(accepted_media_type, renderer_context):
+            return super().render(data, accepted_media_type, renderer_context)
+        try:
+            content = orjson.dumps(
+                data, default=JSONEncoder().default,
+                option=(
+                    orjson.OPT_NON_STR_KEYS
+                    | orjson.OPT_PASSTHROUGH_DATETIME))
+        except orjson.JSONEncodeError:
+            return super().render(data, accepted_media_type, renderer_context)
+        # Same escaping of line separators as JSONRenderer.
+        return content.replace(
+            b'\xe2\x80\xa8', b'\\u2028').replace(b'\xe2\x80\xa9', b'\\u2029')
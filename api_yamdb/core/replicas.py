@@ -0,0 +1,116 @@
+import random
+import threading
+import time
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connections
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+_state = threading.local()
+# Replica alias -> monotonic time before which it is not tried again.
+_down = {}
+_down_lock = threading.Lock()
+
+
+def mark_down(alias):
+    with _down_lock:
+        _down[alias] = time.monotonic() + settings.REPLICAS['retry_after']
+
+
+def healthy_replicas():
+    now = time.monotonic()
+    with _down_lock:
+        return [
+            alias for alias in settings.REPLICAS['aliases']
+            if _down.get(alias, 0) <= now
+        ]
+
+
+def choose_replica():
+    """A random reachable replica, None when every replica is down."""
+
+    candidates = healthy_replicas()
+    random.shuffle(candidates)
+    for alias in candidates:
+        try:
+            connections[alias].ensure_connection()
+        except DatabaseError:
+            mark_down(alias)
+            continue
+        return alias
+    return None
+
+
+def read_from_primary():
+    """Sends the remaining reads of the current request to the primary."""
+
+    _state.read_alias = None
+
+
+class ReplicaRouter:
+    """
+    Writes go to the primary. Reads go to the replica the middleware
+    picked for the request; without one, in a transaction and outside
+    of requests they stay on the primary as well.
+    """
+
+    def db_for_read(self, model, **hints):
+        instance = hints.get('instance')
+        if instance is not None and instance._state.db:
+            return instance._state.db
+        alias = getattr(_state, 'read_alias', None)
+        if alias is None or connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+        return alias
+
+    def db_for_write(self, model, **hints):
+        _state.wrote = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same rows as the primary.
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Replicas get the schema through replication.
+        return db == DEFAULT_DB_ALIAS
+
+
+class ReplicaMiddleware:
+    """
+    Sends reads of safe requests to a replica. A request that wrote
+    sets a short-lived cookie; until it expires the client reads from
+    the primary and sees its own writes.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        config = settings.REPLICAS
+        if not config['aliases']:
+            return self.get_response(request)
+        _state.wrote = False
+        _state.read_alias = None
+        if request.method in SAFE_METHODS and not self.is_sticky(request):
+            _state.read_alias = choose_replica()
+        try:
+            response = self.get_response(request)
+        finally:
+            wrote = _state.wrote
+            _state.read_alias = None
+            _state.wrote = False
+        if wrote:
+            response.set_cookie(
+                config['cookie'],
+                str(int(time.time() + config['sticky_seconds'])),
+                max_age=config['sticky_seconds'], httponly=True)
+        return response
+
+    def is_sticky(self, request):
+        try:
+            until = int(request.COOKIES[settings.REPLICAS['cookie']])
+        except (KeyError, ValueError):
+            return False
+        return until >= time.time()
@@ -0,0 +1,141 @@
+import re
+from collections import Counter
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import Count, IntegerField, OuterRef, Q, Subquery, Sum
+from reviews.models import Title, TitleSearchToken
+
+TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+TOKEN_LENGTH = 64
+NAME_WEIGHT = 3
+DESCRIPTION_WEIGHT = 1
+MAX_QUERY_TOKENS = 10
+
+_trigram_available = {}
+
+
+def tokenize(text):
+    """Lowercased word tokens, single characters are dropped."""
+
+    return [
+        token[:TOKEN_LENGTH]
+        for token in TOKEN_RE.findall((text or '').lower())
+        if len(token) > 1
+    ]
+
+
+class InvertedIndexBackend:
+    """
+    Portable search over the TitleSearchToken table.
+    Every query token has to match; titles are ranked by the summed
+    weights of their matching tokens.
+    """
+
+    def index(self, titles):
+        titles = list(titles)
+        TitleSearchToken.objects.filter(title__in=titles).delete()
+        tokens = []
+        for title in titles:
+            weights = Counter()
+            for token in tokenize(title.name):
+                weights[token] += NAME_WEIGHT
+            for token in tokenize(title.description):
+                weights[token] += DESCRIPTION_WEIGHT
+            tokens.extend(
+                TitleSearchToken(title=title, token=token, weight=weight)
+                for token, weight in weights.items()
+            )
+        TitleSearchToken.objects.bulk_create(tokens, batch_size=1000)
+
+    def search(self, queryset, text):
+        terms = set(tokenize(text)[:MAX_QUERY_TOKENS])
+        if not terms:
+            return queryset.none()
+        matches = (
+            TitleSearchToken.objects.filter(token__in=terms)
+            .order_by()
+            .values('title')
+            .annotate(matched=Count('token'), rank=Sum('weight'))
+            .filter(matched=len(terms))
+        )
+        return queryset.filter(
+            pk__in=matches.values('title')
+        ).annotate(
+            search_rank=Subquery(
+                matches.filter(title=OuterRef('pk')).values('rank'),
+                output_field=IntegerField(),
+            )
+        ).order_by('-search_rank', 'name')
+
+
+class PostgresBackend:
+    """
+    PostgreSQL full-text search with GIN expression index,
+    plus trigram similarity on names when pg_trgm is installed.
+    The GIN index is maintained by the database itself.
+    """
+
+    def index(self, titles):
+        pass
+
+    def search(self, queryset, text):
+        from django.contrib.postgres.search import (SearchQuery, SearchRank,
+                                                    SearchVector,
+                                                    TrigramSimilarity)
+
+        vector = (
+            SearchVector('name', weight='A', config='simple')
+            + SearchVector('description', weight='B', config='simple')
+        )
+        query = SearchQuery(text, config='simple')
+        rank = SearchRank(vector, query)
+        condition = Q(search_vector=query)
+        if trigram_available():
+            rank = rank + TrigramSimilarity('name', text)
+            condition |= Q(name__trigram_similar=text)
+        return queryset.annotate(
+            search_vector=vector, search_rank=rank
+        ).filter(condition).order_by('-search_rank', 'name')
+
+
+def trigram_available():
+    if connection.alias not in _trigram_available:
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm'")
+            _trigram_available[connection.alias] = bool(cursor.fetchone())
+    return _trigram_available[connection.alias]
+
+
+def get_backend():
+    name = settings.TITLE_SEARCH['backend']
+    if name == 'auto':
+        name = 'postgres' if connection.vendor == 'postgresql' else 'inverted'
+    if name == 'postgres':
+        return PostgresBackend()
+    return InvertedIndexBackend()
+
+
+def search_titles(queryset, text):
+    return get_backend().search(queryset, text)
+
+
+def index_titles(titles):
+    get_backend().index(titles)
+
+
+def rebuild_search_index(batch_size=1000):
+    """Reindexes every title, returns the number of titles."""
+
+    backend = get_backend()
+    total = 0
+    last_pk = 0
+    while True:
+        batch = list(
+            Title.objects.filter(pk__gt=last_pk).order_by('pk')[:batch_size])
+        if not batch:
+            return total
+        backend.index(batch)
+        total += len(batch)
+        last_pk = batch[-1].pk
@@ -0,0 +1,51 @@
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+from reviews.models import (Category, Comment, Genre, GenreTitle, Review,
+                            Title, User)
+
+from .authentication import forget_user
+from .cache import bump_versions
+from .search import index_titles
+
+AFFECTED_RESOURCES = {
+    Title: ('titles',),
+    Genre: ('genres', 'titles'),
+    Category: ('categories', 'titles'),
+    GenreTitle: ('titles',),
+    Review: ('titles', 'reviews'),
+    Comment: ('comments',),
+    User: ('users',),
+}
+
+
+def invalidate(resources):
+    bump_versions(*resources)
+    # Readers that cached the old state before commit are dropped too.
+    transaction.on_commit(lambda: bump_versions(*resources))
+
+
+@receiver(post_save)
+@receiver(post_delete)
+def invalidate_on_write(sender, **kwargs):
+    resources = AFFECTED_RESOURCES.get(sender)
+    if resources:
+        invalidate(resources)
+
+
+@receiver(m2m_changed, sender=Title.genre.through)
+def invalidate_on_genre_change(sender, action, **kwargs):
+    if action.startswith('post_'):
+        invalidate(AFFECTED_RESOURCES[GenreTitle])
+
+
+@receiver(post_save, sender=Title)
+def index_title(sender, instance, raw, **kwargs):
+    if not raw:
+        index_titles([instance])
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def forget_cached_user(sender, instance, **kwargs):
+    forget_user(instance.pk)
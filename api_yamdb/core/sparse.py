@@ -0,0 +1,155 @@
+from django.core.exceptions import FieldDoesNotExist
+from rest_framework import serializers
+from rest_framework.exceptions import ValidationError
+
+SPARSE_ACTIONS = ('list', 'retrieve')
+
+
+def _split(value):
+    return [name.strip() for name in value.split(',') if name.strip()]
+
+
+def _related_columns(name, field):
+    """Columns of a related object read by a nested or slug field."""
+
+    if isinstance(field, serializers.SlugRelatedField):
+        return [f'{name}__{field.slug_field}']
+    if isinstance(field, serializers.BaseSerializer):
+        return [
+            f'{name}__{child.source}'
+            for child in field.fields.values()
+            if '.' not in child.source and child.source != '*'
+        ]
+    return []
+
+
+def _ordering_columns(queryset):
+    """Columns the queryset is ordered by, keyset pagination reads them."""
+
+    opts = queryset.model._meta
+    for name in queryset.query.order_by or opts.ordering:
+        if not isinstance(name, str):
+            continue
+        name = name.lstrip('-')
+        try:
+            if opts.get_field(name).concrete:
+                yield name
+        except FieldDoesNotExist:
+            pass
+
+
+def _field_plan(opts, field):
+    """
+    Columns, join and prefetch one serializer field needs,
+    None when its source is not a model field.
+    """
+
+    name = field.source.split('.')[0]
+    try:
+        model_field = opts.get_field(name)
+    except FieldDoesNotExist:
+        return None
+    if model_field.many_to_many or model_field.one_to_many:
+        return [], None, name
+    if model_field.is_relation:
+        related = _related_columns(name, field)
+        return [name] + related, name if related else None, None
+    return [name], None, None
+
+
+def sparse_queryset(queryset, fields, columns=None):
+    """
+    Narrows queryset to what serializer fields read: joins and prefetches
+    of dropped relations are removed and, when every field maps to model
+    columns, the SELECT is limited to those columns.
+    columns maps field sources that are not model fields to columns.
+    """
+
+    opts = queryset.model._meta
+    columns = columns or {}
+    only = {opts.pk.name}
+    select_related = []
+    prefetch_related = []
+    exact = True
+    for field in fields.values():
+        if field.source in columns:
+            only.update(columns[field.source])
+            continue
+        plan = _field_plan(opts, field)
+        if plan is None:
+            exact = False
+            continue
+        field_columns, join, prefetch = plan
+        only.update(field_columns)
+        if join:
+            select_related.append(join)
+        if prefetch:
+            prefetch_related.append(prefetch)
+
+    queryset = queryset.select_related(None).prefetch_related(None)
+    if select_related:
+        queryset = queryset.select_related(*select_related)
+    if prefetch_related:
+        queryset = queryset.prefetch_related(*prefetch_related)
+    if not exact:
+        return queryset
+    # Related managers check the foreign key of every fetched row.
+    only.update(field.name for field in queryset._known_related_objects)
+    return queryset.only(*only, *_ordering_columns(queryset))
+
+
+class SparseFieldsMixin:
+    """
+    Supports ?fields= and ?omit= with comma separated field names
+    on list and retrieve. Dropped fields are not serialized and their
+    columns, joins and prefetches are left out of the query.
+    sparse_columns maps fields without a model field to their columns.
+    """
+
+    sparse_columns = {}
+
+    def get_sparse_fields(self):
+        """Kept serializer fields, None when the request has no filter."""
+
+        if not hasattr(self, '_sparse_fields'):
+            self._sparse_fields = None
+            params = self.request.query_params
+            requested = _split(params.get('fields', ''))
+            omitted = _split(params.get('omit', ''))
+            if self.action in SPARSE_ACTIONS and (requested or omitted):
+                serializer = self.get_serializer_class()(
+                    context=self.get_serializer_context())
+                self._sparse_fields = self._select_fields(
+                    serializer.fields, requested, omitted)
+        return self._sparse_fields
+
+    def _select_fields(self, fields, requested, omitted):
+        errors = {}
+        for param, names in (('fields', requested), ('omit', omitted)):
+            unknown = [name for name in names if name not in fields]
+            if unknown:
+                errors[param] = [f'Неизвестные поля: {", ".join(unknown)}']
+        if errors:
+            raise ValidationError(errors)
+        names = requested or list(fields)
+        return {
+            name: field for name, field in fields.items()
+            if name in names and name not in omitted
+        }
+
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        fields = self.get_sparse_fields()
+        if fields is None:
+            return queryset
+        return sparse_queryset(queryset, fields, self.sparse_columns)
+
+    def get_serializer(self, *args, **kwargs):
+        serializer = super().get_serializer(*args, **kwargs)
+        fields = self.get_sparse_fields()
+        if fields is not None:
+            target = getattr(serializer, 'child', serializer)
+            for name in list(target.fields):
+                if name not in fields:
+                    target.fields.pop(name)
+        return serializer
@@ -0,0 +1,21 @@
+import os
+import shutil
+
+from prometheus_client import multiprocess
+
+bind = '0:8000'
+
+
+def on_starting(server):
+    """Starts metrics from zero: removes files of previous runs."""
+
+    directory = os.environ.get('PROMETHEUS_MULTIPROC_DIR')
+    if directory:
+        shutil.rmtree(directory, ignore_errors=True)
+        os.makedirs(directory)
+
+
+def child_exit(server, worker):
+    """Drops live gauges of the exited worker, keeps its counters."""
+
+    multiprocess.mark_process_dead(worker.pid)
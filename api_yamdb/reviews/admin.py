@@ -3,7 +3,8 @@ from import_export import resources, widgets
 from import_export.admin import ImportExportModelAdmin
 from import_export.fields import Field
 
-from .models import Category, Comment, Genre, GenreTitle, Review, Title, User
+from .models import (Category, Comment, Genre, GenreTitle, OutgoingEmail,
+                     Review, Title, User)
 
 
 class UserResource(resources.ModelResource):
@@ -101,3 +102,11 @@ class ReviewsAdmin(ImportExportModelAdmin):
 @admin.register(Title)
 class TitleAdmin(ImportExportModelAdmin):
     resource_class = TitleResource
+
+
+@admin.register(OutgoingEmail)
+class OutgoingEmailAdmin(admin.ModelAdmin):
+    list_display = (
+        'to', 'subject', 'status', 'attempts', 'next_attempt_at', 'sent_at',)
+    list_filter = ('status',)
+    search_fields = ('to',)
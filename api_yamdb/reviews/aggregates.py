@@ -0,0 +1,230 @@
+from django.conf import settings
+from django.db.models import (Count, F, FloatField, IntegerField, OuterRef, Q,
+                              Subquery, Sum, Value)
+from django.db.models.functions import Cast, Coalesce, NullIf
+from django.utils import timezone
+
+from .models import (SCORES, Comment, RatingPrior, Review, Title, User,
+                     score_field)
+
+# Stored counters by model: field -> (counted model, its foreign key).
+COUNTERS = {
+    Title: {'review_count': (Review, 'title')},
+    Review: {'comment_count': (Comment, 'review')},
+    User: {
+        'review_count': (Review, 'author'),
+        'comment_count': (Comment, 'author'),
+    },
+}
+
+
+def _rating(score_sum, review_count):
+    """Integer rating expression, NULL for titles without reviews."""
+    return score_sum / NullIf(review_count, 0)
+
+
+def _weighted_rating(score_sum, review_count):
+    """
+    Bayesian average: the mean score of a title pulled towards the mean
+    of all reviews until it has about min_votes reviews of its own.
+    """
+    config = settings.LEADERBOARD
+    min_votes = Value(float(config['min_votes']), output_field=FloatField())
+    mean = Coalesce(
+        Subquery(
+            RatingPrior.objects.values('mean')[:1],
+            output_field=FloatField()),
+        Value(float(config['default_mean']), output_field=FloatField()),
+    )
+    return (
+        (Cast(score_sum, FloatField()) + min_votes * mean)
+        / (Cast(review_count, FloatField()) + min_votes)
+    )
+
+
+def apply_review_change(title_id, old_score=None, new_score=None):
+    """
+    Shifts stored aggregates and the score histogram of a title
+    by one review change: a removed old_score and an added new_score.
+    """
+
+    score_delta = (new_score or 0) - (old_score or 0)
+    count_delta = (new_score is not None) - (old_score is not None)
+    score_sum = F('score_sum') + score_delta
+    review_count = F('review_count') + count_delta
+    histogram = {}
+    if old_score != new_score:
+        if old_score is not None:
+            field = score_field(old_score)
+            histogram[field] = F(field) - 1
+        if new_score is not None:
+            field = score_field(new_score)
+            histogram[field] = F(field) + 1
+    Title.objects.filter(pk=title_id).update(
+        score_sum=score_sum,
+        review_count=review_count,
+        rating=_rating(score_sum, review_count),
+        weighted_rating=_weighted_rating(score_sum, review_count),
+        modified=timezone.now(),
+        **histogram,
+    )
+
+
+def shift_counter(model, pk, field, delta):
+    """Atomically adds delta to a stored counter of one row."""
+
+    model.objects.filter(pk=pk).update(**{field: F(field) + delta})
+
+
+def touch_titles(**lookups):
+    """Moves modification time of matching titles to now."""
+
+    Title.objects.filter(**lookups).update(modified=timezone.now())
+
+
+def _count_subquery(model, field):
+    return Coalesce(
+        Subquery(
+            model.objects.filter(**{field: OuterRef('pk')})
+            .order_by()
+            .values(field)
+            .annotate(value=Count('id'))
+            .values('value'),
+            output_field=IntegerField(),
+        ),
+        0,
+    )
+
+
+def _review_subquery(aggregate):
+    return Coalesce(
+        Subquery(
+            Review.objects.filter(title=OuterRef('pk'))
+            .order_by()
+            .values('title')
+            .annotate(value=aggregate)
+            .values('value'),
+            output_field=IntegerField(),
+        ),
+        0,
+    )
+
+
+def _histogram_subqueries():
+    return {
+        score_field(score): _review_subquery(
+            Count('id', filter=Q(score=score)))
+        for score in SCORES
+    }
+
+
+def rebuild_title_aggregates(title_ids=None):
+    """Recomputes stored aggregates from the review table."""
+
+    titles = Title.objects.all()
+    if title_ids is not None:
+        titles = titles.filter(pk__in=title_ids)
+    return _rebuild_aggregates(titles)
+
+
+def _rebuild_aggregates(titles):
+    expected = {
+        'score_sum': _review_subquery(Sum('score')),
+        'review_count': _review_subquery(Count('id')),
+        **_histogram_subqueries(),
+    }
+    # Stale titles are touched first, conditional requests of the others
+    # keep matching.
+    titles.exclude(**expected).update(modified=timezone.now())
+    titles.update(**expected)
+    return titles.update(
+        rating=_rating(F('score_sum'), F('review_count')),
+        weighted_rating=_weighted_rating(F('score_sum'), F('review_count')),
+    )
+
+
+def rebuild_counters(model, **lookups):
+    """
+    Recomputes stored counters of the matching rows of model. Titles
+    get all their aggregates rebuilt, the rating follows the count.
+    """
+
+    rows = model.objects.filter(**lookups)
+    if model is Title:
+        return _rebuild_aggregates(rows)
+    expected = {
+        field: _count_subquery(*source)
+        for field, source in COUNTERS[model].items()
+    }
+    if model is Review:
+        # Review pages are fresh while their title is not modified.
+        touch_titles(reviews__in=rows.exclude(**expected))
+    return rows.update(**expected)
+
+
+def find_stale_counters(model, **lookups):
+    """Yields (pk, field, stored, expected) of stale counters of model."""
+
+    expected = {
+        f'expected_{field}': _count_subquery(*source)
+        for field, source in COUNTERS[model].items()
+    }
+    rows = model.objects.filter(**lookups).order_by('pk').values(
+        'pk', *COUNTERS[model], **expected)
+    for row in rows.iterator():
+        for field in COUNTERS[model]:
+            if row[field] != row[f'expected_{field}']:
+                yield row['pk'], field, row[field], row[f'expected_{field}']
+
+
+def rebuild_weighted_ratings():
+    """
+    Stores the mean score of all reviews as the prior and recomputes
+    weighted ratings of every title with it. Returns the new mean.
+    """
+
+    totals = Title.objects.aggregate(
+        score_sum=Sum('score_sum'), review_count=Sum('review_count'))
+    mean = settings.LEADERBOARD['default_mean']
+    if totals['review_count']:
+        mean = totals['score_sum'] / totals['review_count']
+    RatingPrior.objects.update_or_create(pk=1, defaults={'mean': mean})
+    Title.objects.update(
+        weighted_rating=_weighted_rating(F('score_sum'), F('review_count')))
+    return mean
+
+
+def find_inconsistent_titles():
+    """
+    Yields (title, expected_sum, expected_count, expected_histogram)
+    for titles whose stored aggregates or histogram are stale.
+    """
+
+    expected_fields = {
+        f'expected_{field}': value
+        for field, value in _histogram_subqueries().items()
+    }
+    titles = Title.objects.order_by('pk').annotate(
+        expected_sum=_review_subquery(Sum('score')),
+        expected_count=_review_subquery(Count('id')),
+        **expected_fields,
+    )
+    for title in titles.iterator():
+        expected_rating = (
+            title.expected_sum // title.expected_count
+            if title.expected_count else None
+        )
+        expected_histogram = {
+            score: getattr(title, f'expected_{score_field(score)}')
+            for score in SCORES
+        }
+        if (
+            title.score_sum != title.expected_sum
+            or title.review_count != title.expected_count
+            or title.rating != expected_rating
+            or title.score_distribution != expected_histogram
+        ):
+            yield (
+                title, title.expected_sum, title.expected_count,
+                expected_histogram,
+            )
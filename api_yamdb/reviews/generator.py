@@ -0,0 +1,451 @@
+import json
+import multiprocessing
+import random
+from array import array
+from bisect import bisect
+from datetime import datetime, timedelta
+from itertools import accumulate
+
+from core.cache import bump_versions
+from core.search import rebuild_search_index
+from django.contrib.auth.hashers import UNUSABLE_PASSWORD_PREFIX
+from django.core import serializers
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connections
+from django.db.models import Max
+from django.utils import timezone
+
+from .aggregates import (rebuild_counters, rebuild_title_aggregates,
+                         rebuild_weighted_ratings)
+from .loading import batched, insert_batches, reset_sequences
+from .models import Category, Comment, Genre, GenreTitle, Review, Title, User
+from .similarity import mark_stale
+
+DEFAULT_COUNTS = {
+    'users': 1000,
+    'titles': 1000,
+    'reviews': 50000,
+    'comments': 20000,
+    'genres': 30,
+    'categories': 5,
+}
+DEFAULT_SHAPE = {
+    # Zipf exponents: 0 spreads rows evenly, larger values pile them
+    # onto the first ranks.
+    'review_skew': 1.1,
+    'comment_skew': 1.2,
+    'author_skew': 0.8,
+    'genre_skew': 0.7,
+    'min_genres': 1,
+    'max_genres': 5,
+    'score_spread': 2.0,
+    'roles': {User.USER: 0.97, User.MODERATOR: 0.025, User.ADMIN: 0.005},
+    'until': datetime(2024, 1, 1, tzinfo=timezone.utc),
+    'days': 3650,
+}
+WORDS = (
+    'тёмный', 'последний', 'летний', 'северный', 'тихий', 'звёздный',
+    'город', 'океан', 'сад', 'путь', 'рассвет', 'остров', 'ветер', 'дом',
+)
+# Rows of a chunk, the unit of work and of random streams. Chunks do not
+# depend on the number of workers, so neither does the data.
+CHUNK_SIZE = 10000
+TITLES_PER_REVIEW_CHUNK = 500
+# Fields written to fixtures, as in infra/test_database.json.
+FIXTURE_FIELDS = {
+    Category: ('name', 'slug'),
+    Genre: ('name', 'slug'),
+    User: ('password', 'username', 'email', 'role', 'bio', 'date_joined'),
+    Title: ('name', 'year', 'description', 'category'),
+    GenreTitle: ('genre', 'title'),
+    Review: ('title', 'text', 'author', 'score', 'pub_date'),
+    Comment: ('review', 'text', 'author', 'pub_date'),
+}
+MODELS = {
+    'categories': Category,
+    'genres': Genre,
+    'users': User,
+    'titles': Title,
+    'genre_titles': GenreTitle,
+    'reviews': Review,
+    'comments': Comment,
+}
+# Kinds of one phase only reference rows of the previous phases.
+PHASES = (
+    ('categories', 'genres', 'users', 'titles'),
+    ('genre_titles', 'reviews'),
+    ('comments',),
+)
+
+_generator = None
+
+
+def zipf_rank(rng, size, skew):
+    """Random rank in range(size), rank r drawn about 1 / (r + 1) ** skew."""
+
+    u = rng.random()
+    if skew == 1:
+        value = (size + 1) ** u
+    else:
+        power = 1 - skew
+        value = (1 + u * ((size + 1) ** power - 1)) ** (1 / power)
+    return min(size, int(value)) - 1
+
+
+def skewed_counts(total, size, skew, cap):
+    """
+    Splits total into size counts of at most cap, the count of rank r
+    proportional to 1 / (r + 1) ** skew. What does not fit under the cap
+    flows to the next ranks.
+    """
+
+    weights = [1 / (rank + 1) ** skew for rank in range(size)]
+    counts = [0] * size
+    remaining = total
+    active = list(range(size))
+    while remaining > 0 and active:
+        weight = sum(weights[rank] for rank in active)
+        added = 0
+        for rank in active:
+            extra = min(
+                cap - counts[rank], int(remaining * weights[rank] / weight))
+            counts[rank] += extra
+            added += extra
+        if not added:
+            for rank in active[:remaining]:
+                counts[rank] += 1
+                added += 1
+        remaining -= added
+        active = [rank for rank in active if counts[rank] < cap]
+    return counts
+
+
+def _starts(counts):
+    """Offsets of the first row of every group, then the total."""
+
+    starts = array('q', [0])
+    starts.extend(accumulate(counts))
+    return starts
+
+
+def _text(rng, words):
+    return ' '.join(rng.choices(WORDS, k=words))
+
+
+class DataGenerator:
+    """
+    Production shaped data for a seed: few titles collect most reviews,
+    titles have several genres of skewed popularity, comment threads
+    grow under the reviews of popular titles and a few users are
+    moderators or admins. Primary keys are assigned here, continuing
+    after the given offsets, so chunks are generated independently.
+    """
+
+    def __init__(self, counts, shape, seed=0, offsets=None,
+                 genre_ids=(), category_ids=()):
+        self.counts = counts
+        self.shape = shape
+        self.seed = seed
+        self.offsets = {kind: 0 for kind in MODELS}
+        self.offsets.update(offsets or {})
+        self.genre_ids = list(genre_ids) + self._ids('genres')
+        self.category_ids = list(category_ids) + self._ids('categories')
+        self._plan_titles()
+
+    def _ids(self, kind):
+        start = self.offsets[kind] + 1
+        return list(range(start, start + self.counts[kind]))
+
+    def _rng(self, kind, chunk=0):
+        return random.Random(f'{self.seed}:{kind}:{chunk}')
+
+    def _plan_titles(self):
+        shape = self.shape
+        titles = self.counts['titles']
+        rng = self._rng('plan')
+        # Popularity rank of every title, rank 0 gets the most reviews.
+        ranks = list(range(titles))
+        rng.shuffle(ranks)
+        by_rank = skewed_counts(
+            self.counts['reviews'] if self.counts['users'] else 0,
+            titles, shape['review_skew'], self.counts['users'])
+        self.review_counts = array('l', (by_rank[rank] for rank in ranks))
+        self.review_starts = _starts(self.review_counts)
+        popular = sorted(range(titles), key=ranks.__getitem__)
+        self.reviewed = array('l', (
+            index for index in popular if self.review_counts[index]))
+        genres = len(self.genre_ids)
+        self.genre_counts = array('l', (
+            min(genres, rng.randint(shape['min_genres'], shape['max_genres']))
+            for _ in range(titles)
+        ))
+        self.genre_starts = _starts(self.genre_counts)
+
+    @property
+    def total_reviews(self):
+        return self.review_starts[-1]
+
+    def rows(self, kind):
+        if kind == 'genre_titles':
+            return self.genre_starts[-1]
+        if kind == 'reviews':
+            return self.total_reviews
+        if kind == 'comments':
+            return self.counts['comments'] if self.total_reviews else 0
+        return self.counts[kind]
+
+    def chunks(self, kind):
+        if kind in ('genre_titles', 'reviews'):
+            size = TITLES_PER_REVIEW_CHUNK
+            rows = self.counts['titles']
+        else:
+            size = CHUNK_SIZE
+            rows = self.rows(kind)
+        return range((rows + size - 1) // size)
+
+    def _dates(self, rng):
+        until = self.shape['until']
+        seconds = self.shape['days'] * 86400
+        return lambda: until - timedelta(seconds=rng.randrange(seconds))
+
+    def categories(self, chunk):
+        for index in self._row_range('categories', chunk):
+            pk = self.offsets['categories'] + index + 1
+            yield Category(
+                pk=pk, name=f'Категория {pk}', slug=f'category-{pk}')
+
+    def genres(self, chunk):
+        for index in self._row_range('genres', chunk):
+            pk = self.offsets['genres'] + index + 1
+            yield Genre(pk=pk, name=f'Жанр {pk}', slug=f'genre-{pk}')
+
+    def users(self, chunk):
+        rng = self._rng('users', chunk)
+        date = self._dates(rng)
+        roles = self.shape['roles']
+        role_names = list(roles)
+        role_weights = list(accumulate(roles.values()))
+        password = f'{UNUSABLE_PASSWORD_PREFIX}generated'
+        for index in self._row_range('users', chunk):
+            pk = self.offsets['users'] + index + 1
+            yield User(
+                pk=pk,
+                username=f'user{pk}',
+                email=f'user{pk}@yamdb.fake',
+                password=password,
+                role=role_names[bisect(
+                    role_weights, rng.random() * role_weights[-1])],
+                bio=_text(rng, rng.randint(0, 8)),
+                date_joined=date(),
+            )
+
+    def titles(self, chunk):
+        rng = self._rng('titles', chunk)
+        year = self.shape['until'].year
+        for index in self._row_range('titles', chunk):
+            yield Title(
+                pk=self.offsets['titles'] + index + 1,
+                name=f'{_text(rng, rng.randint(1, 3))} {index}',
+                year=rng.randint(1900, year),
+                description=_text(rng, rng.randint(0, 40)) or None,
+                category_id=rng.choice(
+                    self.category_ids) if self.category_ids else None,
+            )
+
+    def _row_range(self, kind, chunk):
+        start = chunk * CHUNK_SIZE
+        return range(start, min(start + CHUNK_SIZE, self.rows(kind)))
+
+    def _title_range(self, chunk):
+        start = chunk * TITLES_PER_REVIEW_CHUNK
+        return range(
+            start, min(start + TITLES_PER_REVIEW_CHUNK, self.counts['titles']))
+
+    def genre_titles(self, chunk):
+        rng = self._rng('genre_titles', chunk)
+        genres = len(self.genre_ids)
+        skew = self.shape['genre_skew']
+        for index in self._title_range(chunk):
+            chosen = []
+            while len(chosen) < self.genre_counts[index]:
+                genre_id = self.genre_ids[zipf_rank(rng, genres, skew)]
+                if genre_id not in chosen:
+                    chosen.append(genre_id)
+            pk = self.offsets['genre_titles'] + self.genre_starts[index]
+            for offset, genre_id in enumerate(chosen, 1):
+                yield GenreTitle(
+                    pk=pk + offset, genre_id=genre_id,
+                    title_id=self.offsets['titles'] + index + 1)
+
+    def reviews(self, chunk):
+        rng = self._rng('reviews', chunk)
+        date = self._dates(rng)
+        users = self.counts['users']
+        spread = self.shape['score_spread']
+        for index in self._title_range(chunk):
+            total = self.review_counts[index]
+            if not total:
+                continue
+            quality = rng.gauss(6.5, 1.5)
+            # A window of consecutive users keeps authors unique,
+            # windows starting at the first users make them most active.
+            first = zipf_rank(rng, users, self.shape['author_skew'])
+            pk = self.offsets['reviews'] + self.review_starts[index]
+            for offset in range(total):
+                yield Review(
+                    pk=pk + offset + 1,
+                    title_id=self.offsets['titles'] + index + 1,
+                    author_id=(
+                        self.offsets['users'] + (first + offset) % users + 1),
+                    text=_text(rng, rng.randint(3, 60)),
+                    score=min(10, max(1, round(rng.gauss(quality, spread)))),
+                    pub_date=date(),
+                )
+
+    def comments(self, chunk):
+        rng = self._rng('comments', chunk)
+        date = self._dates(rng)
+        skew = self.shape['comment_skew']
+        users = self.counts['users']
+        for index in self._row_range('comments', chunk):
+            # Popular titles first, then the first reviews of the title.
+            title = self.reviewed[zipf_rank(rng, len(self.reviewed), skew)]
+            review = self.review_starts[title] + zipf_rank(
+                rng, self.review_counts[title], skew)
+            yield Comment(
+                pk=self.offsets['comments'] + index + 1,
+                review_id=self.offsets['reviews'] + review + 1,
+                author_id=self.offsets['users'] + zipf_rank(
+                    rng, users, self.shape['author_skew']) + 1,
+                text=_text(rng, rng.randint(2, 30)),
+                pub_date=date(),
+            )
+
+    def objects(self, kind, chunk):
+        return getattr(self, kind)(chunk)
+
+    def insert(self, kind, chunk, batch_size):
+        return len(insert_batches(
+            MODELS[kind], self.objects(kind, chunk), batch_size))
+
+
+def _insert_chunk(job):
+    kind, chunk, batch_size = job
+    return _generator.insert(kind, chunk, batch_size)
+
+
+def _max_pks():
+    return {
+        kind: model.objects.aggregate(value=Max('pk'))['value'] or 0
+        for kind, model in MODELS.items()
+    }
+
+
+def generate_database(counts, shape=None, seed=0, batch_size=5000,
+                      workers=1, log=print):
+    """
+    Inserts generated rows after the existing ones, then rebuilds
+    stored aggregates, counters, weighted ratings and the search index,
+    and queues the new titles for rebuild_similar_titles.
+    With several workers every process inserts whole chunks in its
+    own connection and transaction.
+    """
+
+    global _generator
+    counts = dict(DEFAULT_COUNTS, **counts)
+    shape = dict(DEFAULT_SHAPE, **(shape or {}))
+    _generator = generator = DataGenerator(
+        counts, shape, seed, offsets=_max_pks(),
+        genre_ids=Genre.objects.values_list('pk', flat=True),
+        category_ids=Category.objects.values_list('pk', flat=True),
+    )
+    pool = None
+    if workers > 1:
+        connections.close_all()
+        pool = multiprocessing.get_context('fork').Pool(workers)
+    try:
+        for phase in PHASES:
+            for kind in phase:
+                jobs = [
+                    (kind, chunk, batch_size)
+                    for chunk in generator.chunks(kind)]
+                if pool is None:
+                    inserted = sum(map(_insert_chunk, jobs))
+                else:
+                    inserted = sum(pool.imap_unordered(_insert_chunk, jobs))
+                log(f'{kind}: {inserted}')
+    finally:
+        if pool is not None:
+            pool.close()
+            pool.join()
+        _generator = None
+    reset_sequences(MODELS.values())
+    rebuild_title_aggregates()
+    rebuild_counters(Review)
+    rebuild_counters(User)
+    rebuild_weighted_ratings()
+    rebuild_search_index()
+    mark_stale(
+        Title.objects.filter(pk__gt=generator.offsets['titles']).values_list(
+            'pk', flat=True).iterator())
+    bump_versions('titles', 'genres', 'categories', 'reviews', 'comments')
+    return generator
+
+
+def _fixture_pks(items):
+    pks = {kind: 0 for kind in MODELS}
+    labels = {
+        model._meta.label_lower: kind for kind, model in MODELS.items()}
+    ids = {kind: [] for kind in ('genres', 'categories')}
+    for item in items:
+        kind = labels.get(item['model'])
+        if kind is None:
+            continue
+        pks[kind] = max(pks[kind], item['pk'])
+        if kind in ids:
+            ids[kind].append(item['pk'])
+    return pks, ids
+
+
+def generate_fixture(target, counts, shape=None, seed=0, extend=None,
+                     batch_size=5000, log=print):
+    """
+    Writes generated rows as a JSON fixture for loaddata. Objects of
+    the fixture to extend come first, generated ones continue its
+    primary keys and may use its genres and categories.
+    """
+
+    counts = dict(DEFAULT_COUNTS, **counts)
+    shape = dict(DEFAULT_SHAPE, **(shape or {}))
+    items = []
+    if extend:
+        with open(extend, encoding='utf-8') as source:
+            items = json.load(source)
+    offsets, ids = _fixture_pks(items)
+    generator = DataGenerator(
+        counts, shape, seed, offsets=offsets,
+        genre_ids=ids['genres'], category_ids=ids['categories'])
+    first = True
+
+    def write(item):
+        nonlocal first
+        target.write('[\n' if first else ',\n')
+        first = False
+        json.dump(item, target, cls=DjangoJSONEncoder, ensure_ascii=False)
+
+    for item in items:
+        write(item)
+    for phase in PHASES:
+        for kind in phase:
+            written = 0
+            model = MODELS[kind]
+            for chunk in generator.chunks(kind):
+                for batch in batched(
+                        generator.objects(kind, chunk), batch_size):
+                    for item in serializers.serialize(
+                            'python', batch, fields=FIXTURE_FIELDS[model]):
+                        write(item)
+                    written += len(batch)
+            log(f'{kind}: {written}')
+    target.write('[]\n' if first else '\n]\n')
+    return generator
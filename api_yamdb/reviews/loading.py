@@ -0,0 +1,52 @@
+from array import array
+from contextlib import contextmanager
+from itertools import islice
+
+from django.core.exceptions import FieldDoesNotExist
+from django.core.management.color import no_style
+from django.db import connection
+
+
+@contextmanager
+def explicit_pub_date(model):
+    """Lets bulk_create keep pub_date values taken from the input."""
+
+    try:
+        field = model._meta.get_field('pub_date')
+    except FieldDoesNotExist:
+        yield
+        return
+    field.auto_now_add = False
+    try:
+        yield
+    finally:
+        field.auto_now_add = True
+
+
+def batched(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        batch = list(islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+
+def insert_batches(model, objects, batch_size):
+    """Bulk inserts objects in batches, returns their ids."""
+
+    ids = array('q')
+    with explicit_pub_date(model):
+        for batch in batched(objects, batch_size):
+            ids.extend(obj.pk for obj in model.objects.bulk_create(batch))
+    return ids
+
+
+def reset_sequences(models):
+    """Moves primary key sequences past rows inserted with explicit ids."""
+
+    statements = connection.ops.sequence_reset_sql(no_style(), models)
+    if statements:
+        with connection.cursor() as cursor:
+            for sql in statements:
+                cursor.execute(sql)
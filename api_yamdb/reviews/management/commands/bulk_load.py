@@ -0,0 +1,282 @@
+import csv
+import json
+import os
+import time
+from itertools import islice
+
+from core.cache import bump_versions
+from core.search import index_titles
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from reviews.aggregates import (rebuild_counters, rebuild_title_aggregates,
+                                touch_titles)
+from reviews.loading import explicit_pub_date, reset_sequences
+from reviews.models import (Category, Comment, Genre, GenreTitle, Review,
+                            Title, User)
+from reviews.similarity import mark_stale
+
+KINDS = {
+    'categories': Category,
+    'genres': Genre,
+    'titles': Title,
+    'genre_titles': GenreTitle,
+    'reviews': Review,
+    'comments': Comment,
+}
+RESOURCES = {
+    'categories': ('categories', 'titles'),
+    'genres': ('genres', 'titles'),
+    'titles': ('titles',),
+    'genre_titles': ('titles',),
+    'reviews': ('titles', 'reviews'),
+    'comments': ('comments',),
+}
+
+
+def read_csv(path):
+    with open(path, newline='', encoding='utf-8') as source:
+        yield from csv.DictReader(source)
+
+
+def read_ndjson(path):
+    with open(path, encoding='utf-8') as source:
+        for line in source:
+            line = line.strip()
+            if line:
+                yield json.loads(line)
+
+
+def read_json_array(path, chunk_size=1 << 16):
+    """Yields items of a top-level JSON array without loading the file."""
+
+    decoder = json.JSONDecoder()
+    with open(path, encoding='utf-8') as source:
+        buffer = source.read(chunk_size).lstrip()
+        if not buffer.startswith('['):
+            raise CommandError('JSON input must be an array')
+        buffer = buffer[1:]
+        while True:
+            buffer = buffer.lstrip(', \n\r\t')
+            if buffer.startswith(']'):
+                return
+            try:
+                item, end = decoder.raw_decode(buffer)
+            except ValueError:
+                chunk = source.read(chunk_size)
+                if not chunk:
+                    raise CommandError('Unexpected end of JSON input')
+                buffer += chunk
+                continue
+            buffer = buffer[end:]
+            yield item
+
+
+def read_records(path):
+    extension = os.path.splitext(path)[1].lower()
+    if extension == '.csv':
+        return read_csv(path)
+    if extension in ('.jsonl', '.ndjson'):
+        return read_ndjson(path)
+    if extension == '.json':
+        return read_json_array(path)
+    raise CommandError(f'Unsupported file type: {extension}')
+
+
+class Command(BaseCommand):
+    help = (
+        'Streams categories, genres, titles, genre links, reviews or '
+        'comments from '
+        'CSV, JSON, NDJSON or Django fixture files into the database '
+        'with batched bulk inserts.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('kind', choices=KINDS)
+        parser.add_argument('path')
+        parser.add_argument(
+            '--batch-size', type=int, default=1000,
+            help='Rows inserted per transaction.')
+        parser.add_argument(
+            '--checkpoint',
+            help='Checkpoint file, defaults to <path>.checkpoint.')
+        parser.add_argument(
+            '--resume', action='store_true',
+            help='Skip rows committed by a previous interrupted run.')
+
+    def handle(self, *args, **options):
+        self.kind = options['kind']
+        self.model = KINDS[self.kind]
+        self.label = self.model._meta.label_lower
+        self.lookups = {}
+        path = options['path']
+        batch_size = options['batch_size']
+        checkpoint = options['checkpoint'] or f'{path}.checkpoint'
+        if batch_size < 1:
+            raise CommandError('--batch-size must be positive')
+
+        position = 0
+        if options['resume']:
+            position = self.read_checkpoint(checkpoint)
+        records = islice(read_records(path), position, None)
+        loaded = 0
+        started = time.monotonic()
+        with explicit_pub_date(self.model):
+            while True:
+                batch = list(islice(records, batch_size))
+                if not batch:
+                    break
+                rows = [row for row in map(self.normalize, batch) if row]
+                with transaction.atomic():
+                    self.insert(rows)
+                loaded += len(rows)
+                position += len(batch)
+                self.write_checkpoint(checkpoint, path, position)
+                elapsed = time.monotonic() - started
+                self.stdout.write(
+                    f'{self.kind}: {loaded} rows loaded, '
+                    f'{loaded / max(elapsed, 1e-6):.0f} rows/s'
+                )
+        self.reset_sequences()
+        bump_versions(*RESOURCES[self.kind])
+        if os.path.exists(checkpoint):
+            os.remove(checkpoint)
+        elapsed = time.monotonic() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'Loaded {loaded} {self.kind} in {elapsed:.2f}s '
+            f'({loaded / max(elapsed, 1e-6):.0f} rows/s)'
+        ))
+
+    def read_checkpoint(self, checkpoint):
+        if not os.path.exists(checkpoint):
+            return 0
+        with open(checkpoint, encoding='utf-8') as source:
+            state = json.load(source)
+        if state.get('kind') != self.kind:
+            raise CommandError(
+                f'Checkpoint {checkpoint} belongs to {state.get("kind")}')
+        self.stdout.write(f'Resuming after {state["position"]} rows')
+        return state['position']
+
+    def write_checkpoint(self, checkpoint, path, position):
+        with open(checkpoint, 'w', encoding='utf-8') as target:
+            json.dump(
+                {'kind': self.kind, 'source': path, 'position': position},
+                target
+            )
+
+    def normalize(self, record):
+        """Flattens fixture records and skips those of other models."""
+
+        if 'model' in record and 'fields' in record:
+            if record['model'] != self.label:
+                return None
+            return dict(record['fields'], id=record['pk'])
+        return record
+
+    def lookup(self, model, field, value):
+        """Resolves a slug or username to an id, plain ids pass through."""
+
+        if value in (None, ''):
+            return None
+        key = (model, field)
+        if key not in self.lookups:
+            self.lookups[key] = dict(
+                model.objects.values_list(field, 'id').iterator())
+        table = self.lookups[key]
+        if value in table:
+            return table[value]
+        if isinstance(value, int) or str(value).isdigit():
+            return int(value)
+        raise CommandError(f'Unknown {model.__name__} {field}: {value}')
+
+    def build(self, row):
+        pk = row.get('id') or None
+        if self.kind in ('categories', 'genres'):
+            return self.model(id=pk, name=row['name'], slug=row['slug'])
+        if self.kind == 'titles':
+            return Title(
+                id=pk,
+                name=row['name'],
+                year=int(row['year']),
+                description=row.get('description') or None,
+                category_id=self.lookup(
+                    Category, 'slug',
+                    row.get('category', row.get('category_id'))),
+            )
+        if self.kind == 'genre_titles':
+            return GenreTitle(
+                id=pk,
+                genre_id=self.lookup(
+                    Genre, 'slug', row.get('genre', row.get('genre_id'))),
+                title_id=int(row.get('title', row.get('title_id'))),
+            )
+        author_id = self.lookup(User, 'username', row['author'])
+        pub_date = parse_datetime(row.get('pub_date') or '') or timezone.now()
+        if timezone.is_naive(pub_date):
+            pub_date = timezone.make_aware(pub_date, timezone.utc)
+        if self.kind == 'reviews':
+            return Review(
+                id=pk,
+                title_id=int(row.get('title', row.get('title_id'))),
+                text=row['text'],
+                author_id=author_id,
+                score=int(row['score']),
+                pub_date=pub_date,
+            )
+        return Comment(
+            id=pk,
+            review_id=int(row.get('review', row.get('review_id'))),
+            text=row['text'],
+            author_id=author_id,
+            pub_date=pub_date,
+        )
+
+    def genre_ids(self, row):
+        genres = row.get('genre') or []
+        if isinstance(genres, str):
+            genres = genres.replace(',', ' ').split()
+        return [self.lookup(Genre, 'slug', genre) for genre in genres]
+
+    def insert(self, rows):
+        objects = [self.build(row) for row in rows]
+        self.model.objects.bulk_create(objects)
+        if self.kind == 'titles':
+            links = []
+            for title, row in zip(objects, rows):
+                genre_ids = self.genre_ids(row)
+                if genre_ids and title.pk is None:
+                    raise CommandError(
+                        'Titles with genres need explicit ids '
+                        'on this database backend')
+                links.extend(
+                    GenreTitle(title_id=title.pk, genre_id=genre_id)
+                    for genre_id in genre_ids
+                )
+            GenreTitle.objects.bulk_create(links)
+            if all(title.pk for title in objects):
+                index_titles(objects)
+                mark_stale([title.pk for title in objects])
+        elif self.kind == 'genre_titles':
+            title_ids = {link.title_id for link in objects}
+            touch_titles(pk__in=title_ids)
+            mark_stale(title_ids)
+        elif self.kind == 'reviews':
+            title_ids = {review.title_id for review in objects}
+            rebuild_title_aggregates(title_ids)
+            rebuild_counters(
+                User, pk__in={review.author_id for review in objects})
+            touch_titles(pk__in=title_ids)
+        elif self.kind == 'comments':
+            review_ids = {comment.review_id for comment in objects}
+            rebuild_counters(Review, pk__in=review_ids)
+            rebuild_counters(
+                User, pk__in={comment.author_id for comment in objects})
+            touch_titles(reviews__in=review_ids)
+
+    def reset_sequences(self):
+        models = [self.model]
+        if self.kind == 'titles':
+            models.append(GenreTitle)
+        reset_sequences(models)
@@ -0,0 +1,97 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from reviews.generator import (DEFAULT_COUNTS, DEFAULT_SHAPE,
+                               generate_database, generate_fixture)
+from reviews.models import User
+
+
+class Command(BaseCommand):
+    help = (
+        'Generates production shaped users, titles, genre links, reviews '
+        'and comments, the same for the same seed, into the database or '
+        'a JSON fixture.'
+    )
+
+    def add_arguments(self, parser):
+        for name, value in DEFAULT_COUNTS.items():
+            parser.add_argument(
+                f'--{name}', type=int, default=value,
+                help=f'Number of {name} to add (default {value}).')
+        parser.add_argument('--seed', type=int, default=0)
+        for name in ('review_skew', 'comment_skew', 'author_skew',
+                     'genre_skew', 'score_spread'):
+            parser.add_argument(
+                f'--{name.replace("_", "-")}', type=float,
+                default=DEFAULT_SHAPE[name])
+        for name in ('min_genres', 'max_genres'):
+            parser.add_argument(
+                f'--{name.replace("_", "-")}', type=int,
+                default=DEFAULT_SHAPE[name])
+        roles = DEFAULT_SHAPE['roles']
+        parser.add_argument(
+            '--moderators', type=float, default=roles[User.MODERATOR],
+            help='Share of moderators among users.')
+        parser.add_argument(
+            '--admins', type=float, default=roles[User.ADMIN],
+            help='Share of admins among users.')
+        parser.add_argument(
+            '--workers', type=int, default=1,
+            help='Processes inserting chunks in parallel.')
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument(
+            '--output',
+            help='Write a fixture to this file instead of the database.')
+        parser.add_argument(
+            '--extend',
+            help='Fixture whose objects come first in --output.')
+
+    def handle(self, *args, **options):
+        counts = {name: options[name] for name in DEFAULT_COUNTS}
+        shape = self.get_shape(options)
+        if min(counts.values()) < 0:
+            raise CommandError('Counts can not be negative')
+        if options['batch_size'] < 1 or options['workers'] < 1:
+            raise CommandError('--batch-size and --workers must be positive')
+        if options['extend'] and not options['output']:
+            raise CommandError('--extend needs --output')
+
+        started = time.monotonic()
+        log = self.stdout.write
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as target:
+                generate_fixture(
+                    target, counts, shape, seed=options['seed'],
+                    extend=options['extend'],
+                    batch_size=options['batch_size'], log=log)
+            self.stdout.write(self.style.SUCCESS(
+                f'Saved to {options["output"]}; after loaddata run '
+                f'rebuild_counters and rebuild_leaderboard'))
+            return
+        generate_database(
+            counts, shape, seed=options['seed'],
+            batch_size=options['batch_size'], workers=options['workers'],
+            log=log)
+        self.stdout.write(self.style.SUCCESS(
+            f'Generated in {time.monotonic() - started:.1f}s'))
+
+    def get_shape(self, options):
+        shape = {
+            name: options[name] for name in (
+                'review_skew', 'comment_skew', 'author_skew', 'genre_skew',
+                'score_spread', 'min_genres', 'max_genres')
+        }
+        if not 1 <= shape['min_genres'] <= shape['max_genres']:
+            raise CommandError(
+                '--min-genres must be between 1 and --max-genres')
+        if min(options['moderators'], options['admins']) < 0 or (
+            options['moderators'] + options['admins'] > 1
+        ):
+            raise CommandError(
+                'Shares of moderators and admins must add up to at most 1')
+        shape['roles'] = {
+            User.USER: 1 - options['moderators'] - options['admins'],
+            User.MODERATOR: options['moderators'],
+            User.ADMIN: options['admins'],
+        }
+        return shape
@@ -0,0 +1,109 @@
+import multiprocessing
+import time
+
+from core.cache import bump_versions
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections, transaction
+from django.db.models import Max, Min
+from reviews.aggregates import find_stale_counters, rebuild_counters
+from reviews.models import Review, Title, User
+
+KINDS = {
+    'titles': Title,
+    'reviews': Review,
+    'users': User,
+}
+# Cache versions of responses and counts showing the counters of a kind.
+RESOURCES = {
+    'titles': ('titles',),
+    'reviews': ('reviews', 'comments'),
+    'users': ('users',),
+}
+
+
+def pk_ranges(model, batch_size):
+    """Half-open primary key ranges covering the rows of model."""
+
+    bounds = model.objects.aggregate(low=Min('pk'), high=Max('pk'))
+    if bounds['low'] is None:
+        return []
+    return [
+        (start, start + batch_size)
+        for start in range(bounds['low'], bounds['high'] + 1, batch_size)
+    ]
+
+
+def _run_batch(job):
+    kind, start, stop, check = job
+    lookups = {'pk__gte': start, 'pk__lt': stop}
+    if check:
+        return kind, list(find_stale_counters(KINDS[kind], **lookups))
+    with transaction.atomic():
+        return kind, rebuild_counters(KINDS[kind], **lookups)
+
+
+class Command(BaseCommand):
+    help = (
+        'Rebuilds or validates stored review and comment counters of '
+        'titles, reviews and users in primary key batches.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--check', action='store_true',
+            help='Only report stale counters.')
+        parser.add_argument(
+            '--kind', action='append', choices=KINDS,
+            help='Counters to process, all by default; can be repeated.')
+        parser.add_argument('--batch-size', type=int, default=10000)
+        parser.add_argument(
+            '--workers', type=int, default=1,
+            help='Processes handling batches in parallel.')
+
+    def handle(self, *args, **options):
+        if options['batch_size'] < 1 or options['workers'] < 1:
+            raise CommandError('--batch-size and --workers must be positive')
+        kinds = options['kind'] or list(KINDS)
+        check = options['check']
+        jobs = [
+            (kind, start, stop, check)
+            for kind in kinds
+            for start, stop in pk_ranges(KINDS[kind], options['batch_size'])
+        ]
+        started = time.monotonic()
+        pool = None
+        if options['workers'] > 1:
+            connections.close_all()
+            pool = multiprocessing.get_context('fork').Pool(
+                options['workers'])
+        try:
+            results = (
+                map(_run_batch, jobs) if pool is None
+                else pool.imap_unordered(_run_batch, jobs))
+            totals = dict.fromkeys(kinds, 0)
+            for kind, result in results:
+                if not check:
+                    totals[kind] += result
+                    continue
+                for pk, field, stored, expected in result:
+                    totals[kind] += 1
+                    self.stdout.write(
+                        f'{kind} {pk}: {field} stored {stored}, '
+                        f'expected {expected}')
+        finally:
+            if pool is not None:
+                pool.close()
+                pool.join()
+
+        summary = ', '.join(f'{kind} {totals[kind]}' for kind in kinds)
+        if check:
+            stale = sum(totals.values())
+            if stale:
+                raise CommandError(f'{stale} counters are stale: {summary}')
+            self.stdout.write(self.style.SUCCESS('Counters are consistent'))
+            return
+        bump_versions(*{
+            resource for kind in kinds for resource in RESOURCES[kind]})
+        self.stdout.write(self.style.SUCCESS(
+            f'Rebuilt counters of {summary} rows in '
+            f'{time.monotonic() - started:.1f}s'))
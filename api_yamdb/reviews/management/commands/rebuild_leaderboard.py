@@ -0,0 +1,18 @@
+from core.cache import bump_versions
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from reviews.aggregates import rebuild_weighted_ratings
+
+
+class Command(BaseCommand):
+    help = (
+        'Recomputes the mean score of all reviews and the weighted '
+        'ratings of titles used by the leaderboard.'
+    )
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            mean = rebuild_weighted_ratings()
+        bump_versions('titles', 'reviews')
+        self.stdout.write(self.style.SUCCESS(
+            f'Rebuilt weighted ratings, mean score {mean:.2f}'))
@@ -0,0 +1,40 @@
+from core.cache import bump_versions
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from reviews.aggregates import (find_inconsistent_titles,
+                                rebuild_title_aggregates)
+
+
+class Command(BaseCommand):
+    help = (
+        'Rebuilds or validates stored rating aggregates and score '
+        'histograms of titles.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--check', action='store_true',
+            help='Only report titles with stale aggregates.')
+
+    def handle(self, *args, **options):
+        if options['check']:
+            stale = 0
+            for (
+                title, score_sum, review_count, histogram
+            ) in find_inconsistent_titles():
+                stale += 1
+                self.stdout.write(
+                    f'Title {title.pk}: stored {title.score_sum}/'
+                    f'{title.review_count} '
+                    f'{list(title.score_distribution.values())}, expected '
+                    f'{score_sum}/{review_count} {list(histogram.values())}'
+                )
+            if stale:
+                raise CommandError(f'{stale} titles have stale ratings')
+            self.stdout.write(self.style.SUCCESS('Ratings are consistent'))
+            return
+        with transaction.atomic():
+            updated = rebuild_title_aggregates()
+        bump_versions('titles', 'reviews')
+        self.stdout.write(
+            self.style.SUCCESS(f'Rebuilt ratings of {updated} titles'))
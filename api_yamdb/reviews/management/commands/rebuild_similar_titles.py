@@ -0,0 +1,29 @@
+import time
+
+from core.cache import bump_versions
+from django.core.management.base import BaseCommand
+from reviews.similarity import rebuild_similar_titles, update_similar_titles
+
+
+class Command(BaseCommand):
+    help = (
+        'Recomputes the similar titles of every title, or with '
+        '--incremental only of titles whose genres, category or year '
+        'changed and of titles they may enter or leave.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--incremental', action='store_true',
+            help='Only process titles queued by changes.')
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        if options['incremental']:
+            updated = update_similar_titles()
+        else:
+            updated = rebuild_similar_titles()
+        bump_versions('titles')
+        self.stdout.write(self.style.SUCCESS(
+            f'Rebuilt similar titles of {updated} titles in '
+            f'{time.monotonic() - started:.1f}s'))
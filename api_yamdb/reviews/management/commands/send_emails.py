@@ -0,0 +1,39 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from reviews.outbox import drain_outbox
+
+
+class Command(BaseCommand):
+    help = 'Delivers queued emails with retries and backoff.'
+
+    def add_arguments(self, parser):
+        config = settings.EMAIL_OUTBOX
+        parser.add_argument(
+            '--batch-size', type=int, default=config['batch_size'],
+            help='Emails claimed per batch.')
+        parser.add_argument(
+            '--workers', type=int, default=config['workers'],
+            help='Threads sending a batch, one connection each.')
+        parser.add_argument(
+            '--loop', action='store_true',
+            help='Keep polling the outbox instead of exiting when empty.')
+        parser.add_argument(
+            '--interval', type=float, default=config['poll_interval'],
+            help='Seconds between polls in --loop mode.')
+
+    def handle(self, *args, **options):
+        while True:
+            started = time.monotonic()
+            sent, failed = drain_outbox(
+                options['batch_size'], options['workers'])
+            elapsed = time.monotonic() - started
+            if sent or failed or not options['loop']:
+                self.stdout.write(
+                    f'Sent {sent}, failed {failed} in {elapsed:.2f}s '
+                    f'({sent / max(elapsed, 1e-6):.0f} emails/s)'
+                )
+            if not options['loop']:
+                return
+            time.sleep(options['interval'])
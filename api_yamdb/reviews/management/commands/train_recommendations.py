@@ -0,0 +1,100 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from reviews.recommendations import (Factors, ScoreMatrix, holdout_entries,
+                                     load_scores, peak_memory, recommend,
+                                     split_holdout, store_recommendations)
+
+# Ranks are stored in a PositiveSmallIntegerField.
+MAX_TOP_N = 32767
+
+
+class Command(BaseCommand):
+    help = (
+        'Fits a biased matrix factorization of review scores by '
+        'alternating least squares and stores the top predicted titles '
+        'of every reviewer.'
+    )
+
+    def add_arguments(self, parser):
+        config = settings.RECOMMENDATIONS
+        parser.add_argument(
+            '--factors', type=int, default=config['factors'],
+            help='Latent factors of users and titles.')
+        parser.add_argument(
+            '--iterations', type=int, default=config['iterations'],
+            help='Alternating least squares iterations.')
+        parser.add_argument(
+            '--regularization', type=float,
+            default=config['regularization'],
+            help='Regularization, scaled by the reviews of each row.')
+        parser.add_argument(
+            '--top-n', type=int, default=config['top_n'],
+            help='Titles stored per user.')
+        parser.add_argument(
+            '--workers', type=int, default=1,
+            help='Processes solving rows and scoring users in parallel.')
+        parser.add_argument(
+            '--holdout', type=float, default=0,
+            help='Share of reviews left out to report holdout RMSE.')
+        parser.add_argument(
+            '--seed', type=int, default=0,
+            help='Seed of the initial factors and of the holdout split.')
+
+    def _log(self, started):
+        def log(iteration, train, holdout):
+            line = f'Iteration {iteration}: train RMSE {train:.4f}'
+            if holdout is not None:
+                line += f', holdout RMSE {holdout:.4f}'
+            self.stdout.write(
+                f'{line} ({time.monotonic() - started:.1f}s)')
+        return log
+
+    def handle(self, *args, **options):
+        for name in ('factors', 'iterations', 'workers'):
+            if options[name] < 1:
+                raise CommandError(f'--{name} must be positive')
+        if not 1 <= options['top_n'] <= MAX_TOP_N:
+            raise CommandError(f'--top-n must be between 1 and {MAX_TOP_N}')
+        if options['regularization'] <= 0:
+            # Rows with a single review have no unique solution without it.
+            raise CommandError('--regularization must be positive')
+        if not 0 <= options['holdout'] < 1:
+            raise CommandError('--holdout must be at least 0 and below 1')
+        config = settings.RECOMMENDATIONS
+        started = time.monotonic()
+        scores = load_scores()
+        validation = None
+        if options['holdout']:
+            scores, held = split_holdout(
+                *scores, options['holdout'], options['seed'])
+        matrix = ScoreMatrix(*scores)
+        del scores
+        if options['holdout']:
+            validation = holdout_entries(matrix, *held)
+        self.stdout.write(
+            f'Loaded {len(matrix)} reviews of {len(matrix.user_ids)} users '
+            f'and {len(matrix.title_ids)} titles '
+            f'({matrix.nbytes / 2 ** 20:.1f} MB) in '
+            f'{time.monotonic() - started:.1f}s')
+
+        started = time.monotonic()
+        model = Factors(matrix, options['factors'], options['seed']).fit(
+            options['iterations'], options['regularization'],
+            config['batch_entries'], options['workers'], validation,
+            self._log(started))
+        self.stdout.write(f'Fitted in {time.monotonic() - started:.1f}s')
+
+        started = time.monotonic()
+        stored = store_recommendations(
+            model,
+            recommend(
+                model, options['top_n'], config['candidates'],
+                options['workers']),
+            config['batch_size'])
+        own, workers = peak_memory()
+        self.stdout.write(self.style.SUCCESS(
+            f'Stored recommendations of {stored} users in '
+            f'{time.monotonic() - started:.1f}s, peak memory '
+            f'{own:.0f} MB, workers {workers:.0f} MB'))
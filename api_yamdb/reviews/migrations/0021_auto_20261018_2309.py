@@ -0,0 +1,56 @@
+# Generated by Django 2.2.16 on 2026-10-18 20:09
+
+from django.db import migrations, models
+from django.db.models import Count, Sum
+
+
+def fill_title_aggregates(apps, schema_editor):
+    Review = apps.get_model('reviews', 'Review')
+    Title = apps.get_model('reviews', 'Title')
+    totals = (
+        Review.objects.order_by().values('title')
+        .annotate(score_sum=Sum('score'), review_count=Count('id'))
+    )
+    for row in totals.iterator():
+        Title.objects.filter(pk=row['title']).update(
+            score_sum=row['score_sum'],
+            review_count=row['review_count'],
+            rating=row['score_sum'] // row['review_count'],
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reviews', '0020_auto_20220123_0031'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='title',
+            name='rating',
+            field=models.PositiveSmallIntegerField(blank=True, db_index=True, editable=False, null=True, verbose_name='Рейтинг'),
+        ),
+        migrations.AddField(
+            model_name='title',
+            name='review_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Количество отзывов'),
+        ),
+        migrations.AddField(
+            model_name='title',
+            name='score_sum',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Сумма оценок'),
+        ),
+        migrations.AlterField(
+            model_name='user',
+            name='confirm_code',
+            field=models.CharField(max_length=8, null=True, verbose_name='Код подтверждения'),
+        ),
+        migrations.AlterField(
+            model_name='user',
+            name='role',
+            field=models.CharField(choices=[('user', 'user'), ('moderator', 'moderator'), ('admin', 'admin')], default='user', max_length=9, verbose_name='Роль'),
+        ),
+        migrations.RunPython(
+            fill_title_aggregates, migrations.RunPython.noop),
+    ]
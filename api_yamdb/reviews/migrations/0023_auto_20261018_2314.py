@@ -0,0 +1,65 @@
+# Generated by Django 2.2.16 on 2026-10-18 20:14
+
+from django.db import DatabaseError, migrations, models, transaction
+import django.db.models.deletion
+
+# Must match the SearchVector expression built in core.search.
+TITLE_SEARCH_INDEX_SQL = '''
+CREATE INDEX title_search_idx ON reviews_title USING gin ((
+    setweight(to_tsvector('simple'::regconfig,
+                          COALESCE("name", '')), 'A')
+    || setweight(to_tsvector('simple'::regconfig,
+                             COALESCE("description", '')), 'B')
+))
+'''
+
+
+def create_postgres_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute(TITLE_SEARCH_INDEX_SQL)
+    try:
+        with transaction.atomic(using=schema_editor.connection.alias):
+            schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    except DatabaseError:
+        # Trigram matching is optional, full-text search works without it.
+        return
+    schema_editor.execute(
+        'CREATE INDEX title_name_trgm_idx ON reviews_title '
+        'USING gin ("name" gin_trgm_ops)'
+    )
+
+
+def drop_postgres_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('DROP INDEX IF EXISTS title_search_idx')
+    schema_editor.execute('DROP INDEX IF EXISTS title_name_trgm_idx')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reviews', '0022_auto_20261018_2312'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TitleSearchToken',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('token', models.CharField(max_length=64, verbose_name='Токен')),
+                ('weight', models.PositiveIntegerField(verbose_name='Вес')),
+                ('title', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='search_tokens', to='reviews.Title')),
+            ],
+            options={
+                'verbose_name': 'Поисковый токен',
+                'verbose_name_plural': 'Поисковые токены',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='titlesearchtoken',
+            constraint=models.UniqueConstraint(fields=('token', 'title'), name='unique_title_token'),
+        ),
+        migrations.RunPython(create_postgres_indexes, drop_postgres_indexes),
+    ]
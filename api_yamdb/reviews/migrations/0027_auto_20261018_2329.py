@@ -0,0 +1,61 @@
+# Generated by Django 2.2.16 on 2026-10-18 20:29
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import F, FloatField, Sum, Value
+from django.db.models.functions import Cast
+
+
+def fill_weighted_ratings(apps, schema_editor):
+    RatingPrior = apps.get_model('reviews', 'RatingPrior')
+    Title = apps.get_model('reviews', 'Title')
+    totals = Title.objects.aggregate(
+        score_sum=Sum('score_sum'), review_count=Sum('review_count'))
+    mean = settings.LEADERBOARD['default_mean']
+    if totals['review_count']:
+        mean = totals['score_sum'] / totals['review_count']
+    RatingPrior.objects.create(pk=1, mean=mean)
+    min_votes = float(settings.LEADERBOARD['min_votes'])
+    prior = Value(min_votes * mean, output_field=FloatField())
+    votes = Value(min_votes, output_field=FloatField())
+    Title.objects.update(weighted_rating=(
+        (Cast(F('score_sum'), FloatField()) + prior)
+        / (Cast(F('review_count'), FloatField()) + votes)
+    ))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reviews', '0026_auto_20261018_2327'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RatingPrior',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('mean', models.FloatField(verbose_name='Средняя оценка')),
+                ('updated', models.DateTimeField(auto_now=True, verbose_name='Дата пересчёта')),
+            ],
+            options={
+                'verbose_name': 'Средняя оценка',
+                'verbose_name_plural': 'Средняя оценка',
+            },
+        ),
+        migrations.AddField(
+            model_name='title',
+            name='weighted_rating',
+            field=models.FloatField(blank=True, editable=False, null=True, verbose_name='Взвешенный рейтинг'),
+        ),
+        migrations.AddIndex(
+            model_name='title',
+            index=models.Index(fields=['-weighted_rating', 'id'], name='title_leaderboard_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='title',
+            index=models.Index(fields=['category', '-weighted_rating', 'id'], name='title_category_leaderboard_idx'),
+        ),
+        migrations.RunPython(
+            fill_weighted_ratings, migrations.RunPython.noop),
+    ]
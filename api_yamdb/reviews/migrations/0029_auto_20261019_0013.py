@@ -0,0 +1,55 @@
+# Generated by Django 2.2.16 on 2026-10-18 21:13
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def mark_titles_stale(apps, schema_editor):
+    StaleSimilarity = apps.get_model('reviews', 'StaleSimilarity')
+    Title = apps.get_model('reviews', 'Title')
+    StaleSimilarity.objects.bulk_create(
+        (
+            StaleSimilarity(title=pk)
+            for pk in Title.objects.values_list('pk', flat=True).iterator()
+        ),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reviews', '0028_auto_20261019_0007'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StaleSimilarity',
+            fields=[
+                ('title', models.PositiveIntegerField(primary_key=True, serialize=False, verbose_name='Id произведения')),
+            ],
+            options={
+                'verbose_name': 'Устаревшие похожие произведения',
+                'verbose_name_plural': 'Устаревшие похожие произведения',
+            },
+        ),
+        migrations.CreateModel(
+            name='SimilarTitle',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('rank', models.PositiveSmallIntegerField(verbose_name='Место')),
+                ('score', models.FloatField(verbose_name='Сходство')),
+                ('similar', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='reviews.Title', verbose_name='Похожее произведение')),
+                ('title', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='similar_titles', to='reviews.Title')),
+            ],
+            options={
+                'verbose_name': 'Похожее произведение',
+                'verbose_name_plural': 'Похожие произведения',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='similartitle',
+            constraint=models.UniqueConstraint(fields=('title', 'rank'), name='unique_similar_title_rank'),
+        ),
+        migrations.RunPython(mark_titles_stale, migrations.RunPython.noop),
+    ]
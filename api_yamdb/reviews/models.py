@@ -1,7 +1,15 @@
 from core.validators import year_validator
 from django.contrib.auth.models import AbstractUser
 from django.core.validators import MaxValueValidator, MinValueValidator
-from django.db import models
+from django.db import models, transaction
+from django.utils import timezone
+
+SCORES = range(1, 11)
+
+
+def score_field(score):
+    """Name of the Title histogram field counting the score."""
+    return f'score_{score}'
 
 
 class User(AbstractUser):
@@ -21,6 +29,10 @@ class User(AbstractUser):
         'Код подтверждения', null=True, max_length=8)
     email = models.EmailField(
         'Адрес эл. почты', unique=True, null=False)
+    review_count = models.PositiveIntegerField(
+        'Количество отзывов', default=0, editable=False)
+    comment_count = models.PositiveIntegerField(
+        'Количество комментариев', default=0, editable=False)
 
     class Meta:
 
@@ -73,8 +85,48 @@ class Title(models.Model):
     category = models.ForeignKey(
         Category, on_delete=models.SET_NULL, related_name='titles',
         blank=True, null=True, verbose_name='Категория')
+    score_sum = models.PositiveIntegerField(
+        'Сумма оценок', default=0, editable=False)
+    review_count = models.PositiveIntegerField(
+        'Количество отзывов', default=0, editable=False)
+    rating = models.PositiveSmallIntegerField(
+        'Рейтинг', blank=True, null=True, editable=False, db_index=True)
+    modified = models.DateTimeField('Дата изменения', auto_now=True)
+    # Histogram of review scores, score_N counts reviews with score N.
+    score_1 = models.PositiveIntegerField(
+        'Оценок 1', default=0, editable=False)
+    score_2 = models.PositiveIntegerField(
+        'Оценок 2', default=0, editable=False)
+    score_3 = models.PositiveIntegerField(
+        'Оценок 3', default=0, editable=False)
+    score_4 = models.PositiveIntegerField(
+        'Оценок 4', default=0, editable=False)
+    score_5 = models.PositiveIntegerField(
+        'Оценок 5', default=0, editable=False)
+    score_6 = models.PositiveIntegerField(
+        'Оценок 6', default=0, editable=False)
+    score_7 = models.PositiveIntegerField(
+        'Оценок 7', default=0, editable=False)
+    score_8 = models.PositiveIntegerField(
+        'Оценок 8', default=0, editable=False)
+    score_9 = models.PositiveIntegerField(
+        'Оценок 9', default=0, editable=False)
+    score_10 = models.PositiveIntegerField(
+        'Оценок 10', default=0, editable=False)
+    weighted_rating = models.FloatField(
+        'Взвешенный рейтинг', blank=True, null=True, editable=False)
 
     class Meta:
+        indexes = [
+            models.Index(
+                fields=['-weighted_rating', 'id'],
+                name='title_leaderboard_idx'
+            ),
+            models.Index(
+                fields=['category', '-weighted_rating', 'id'],
+                name='title_category_leaderboard_idx'
+            ),
+        ]
         ordering = ('name',)
         verbose_name = 'Название'
         verbose_name_plural = 'Названия'
@@ -86,6 +138,128 @@ class Title(models.Model):
             f'-  {self.year} {self.name}'
         )
 
+    @property
+    def score_distribution(self):
+        """Number of reviews for every score from 1 to 10."""
+        return {
+            score: getattr(self, score_field(score)) for score in SCORES}
+
+
+class RatingPrior(models.Model):
+    """
+    Model: mean score of all reviews, the prior of weighted ratings.
+    Holds a single row refreshed by the rebuild_leaderboard command.
+    """
+
+    mean = models.FloatField('Средняя оценка')
+    updated = models.DateTimeField('Дата пересчёта', auto_now=True)
+
+    class Meta:
+        verbose_name = 'Средняя оценка'
+        verbose_name_plural = 'Средняя оценка'
+
+    def __str__(self):
+        return f'[RatingPrior] {self.mean:.2f}'
+
+
+class TitleSearchToken(models.Model):
+    """Model: inverted search index of title names and descriptions."""
+
+    title = models.ForeignKey(
+        Title, on_delete=models.CASCADE, related_name='search_tokens')
+    token = models.CharField('Токен', max_length=64)
+    weight = models.PositiveIntegerField('Вес')
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['token', 'title'],
+                name='unique_title_token'
+            )
+        ]
+        verbose_name = 'Поисковый токен'
+        verbose_name_plural = 'Поисковые токены'
+
+    def __str__(self):
+        return f'[Token {self.token}] [Title {self.title_id}] {self.weight}'
+
+
+class SimilarTitle(models.Model):
+    """
+    Model: precomputed nearest titles by genres, category and release
+    decade, rebuilt by the rebuild_similar_titles command.
+    """
+
+    title = models.ForeignKey(
+        Title, on_delete=models.CASCADE, related_name='similar_titles')
+    similar = models.ForeignKey(
+        Title, on_delete=models.CASCADE, related_name='+',
+        verbose_name='Похожее произведение')
+    rank = models.PositiveSmallIntegerField('Место')
+    score = models.FloatField('Сходство')
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['title', 'rank'],
+                name='unique_similar_title_rank'
+            )
+        ]
+        verbose_name = 'Похожее произведение'
+        verbose_name_plural = 'Похожие произведения'
+
+    def __str__(self):
+        return (
+            f'[Title {self.title_id}] [{self.rank}] '
+            f'[Similar {self.similar_id}] {self.score:.3f}'
+        )
+
+
+class StaleSimilarity(models.Model):
+    """Model: titles whose similar titles have to be recomputed."""
+
+    # Not a foreign key: a title deleted after it was queued only
+    # leaves its id behind, the update skips it.
+    title = models.PositiveIntegerField('Id произведения', primary_key=True)
+
+    class Meta:
+        verbose_name = 'Устаревшие похожие произведения'
+        verbose_name_plural = 'Устаревшие похожие произведения'
+
+    def __str__(self):
+        return f'[Stale similarity] [Title {self.title}]'
+
+
+class Recommendation(models.Model):
+    """
+    Model: titles recommended to a user with the predicted score,
+    written by the train_recommendations command.
+    """
+
+    user = models.ForeignKey(
+        User, on_delete=models.CASCADE, related_name='recommendations')
+    title = models.ForeignKey(
+        Title, on_delete=models.CASCADE, related_name='+',
+        verbose_name='Произведение')
+    rank = models.PositiveSmallIntegerField('Место')
+    score = models.FloatField('Ожидаемая оценка')
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'rank'],
+                name='unique_recommendation_rank'
+            )
+        ]
+        verbose_name = 'Рекомендация'
+        verbose_name_plural = 'Рекомендации'
+
+    def __str__(self):
+        return (
+            f'[User {self.user_id}] [{self.rank}] '
+            f'[Title {self.title_id}] {self.score:.2f}'
+        )
+
 
 class GenreTitle(models.Model):
     """Model: connections titles with genres."""
@@ -121,6 +295,8 @@ class Review(models.Model):
         ])
     pub_date = models.DateTimeField(
         'Дата добавления', auto_now_add=True, db_index=True)
+    comment_count = models.PositiveIntegerField(
+        'Количество комментариев', default=0, editable=False)
 
     class Meta:
         constraints = [
@@ -129,9 +305,15 @@ class Review(models.Model):
                 name='unique_review'
             )
         ]
+        indexes = [
+            models.Index(
+                fields=['title', '-pub_date', '-id'],
+                name='review_title_pub_date_idx'
+            )
+        ]
         verbose_name = 'Отзыв'
         verbose_name_plural = 'Отзывы'
-        ordering = ['-pub_date']
+        ordering = ['-pub_date', '-id']
 
     def __str__(self):
         return (
@@ -140,6 +322,10 @@ class Review(models.Model):
             f'{self.text[:15]} {self.score}'
         )
 
+    def save(self, *args, **kwargs):
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+
 
 class Comment(models.Model):
     """Model: comments on reviews. Comment is tied to a specific review."""
@@ -154,9 +340,15 @@ class Comment(models.Model):
 
     class Meta:
 
+        indexes = [
+            models.Index(
+                fields=['review', '-pub_date', '-id'],
+                name='comment_review_pub_date_idx'
+            )
+        ]
         verbose_name = 'Комментарий'
         verbose_name_plural = 'Комментарии'
-        ordering = ['-pub_date']
+        ordering = ['-pub_date', '-id']
 
     def __str__(self):
         return (
@@ -164,3 +356,44 @@ class Comment(models.Model):
             f'-  {self.pub_date} {self.author} '
             f'{self.text[:15]}'
         )
+
+
+class OutgoingEmail(models.Model):
+    """Model: queued email, delivered by the send_emails command."""
+
+    PENDING = 'pending'
+    SENDING = 'sending'
+    SENT = 'sent'
+    FAILED = 'failed'
+    STATUSES = (
+        (PENDING, 'pending'),
+        (SENDING, 'sending'),
+        (SENT, 'sent'),
+        (FAILED, 'failed'),
+    )
+    subject = models.CharField('Тема', max_length=256)
+    body = models.TextField('Текст')
+    from_email = models.CharField('Отправитель', max_length=256)
+    to = models.EmailField('Получатель')
+    status = models.CharField(
+        'Статус', choices=STATUSES, max_length=7, default=PENDING)
+    attempts = models.PositiveSmallIntegerField('Попытки', default=0)
+    next_attempt_at = models.DateTimeField(
+        'Следующая попытка', default=timezone.now)
+    locked_at = models.DateTimeField('Взято в работу', null=True, blank=True)
+    last_error = models.TextField('Последняя ошибка', blank=True)
+    created = models.DateTimeField('Создано', auto_now_add=True)
+    sent_at = models.DateTimeField('Отправлено', null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=['status', 'next_attempt_at'],
+                name='outgoing_email_queue_idx'
+            )
+        ]
+        verbose_name = 'Исходящее письмо'
+        verbose_name_plural = 'Исходящие письма'
+
+    def __str__(self):
+        return f'[Email {self.id}] [{self.status}] {self.to} {self.subject}'
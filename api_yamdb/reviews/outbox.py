@@ -0,0 +1,114 @@
+import datetime
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import OutgoingEmail
+
+
+def queue_email(subject, body, from_email, to):
+    """Stores an email for the send_emails worker instead of sending it."""
+
+    return OutgoingEmail.objects.create(
+        subject=subject, body=body, from_email=from_email, to=to)
+
+
+def claim_batch(batch_size):
+    """Marks due emails as being sent, skipping rows locked elsewhere."""
+
+    now = timezone.now()
+    stale = now - datetime.timedelta(
+        seconds=settings.EMAIL_OUTBOX['lock_timeout'])
+    with transaction.atomic():
+        emails = list(
+            OutgoingEmail.objects.select_for_update(skip_locked=True)
+            .filter(
+                Q(status=OutgoingEmail.PENDING, next_attempt_at__lte=now)
+                | Q(status=OutgoingEmail.SENDING, locked_at__lt=stale)
+            )
+            .order_by('next_attempt_at')[:batch_size]
+        )
+        OutgoingEmail.objects.filter(
+            pk__in=[email.pk for email in emails]
+        ).update(status=OutgoingEmail.SENDING, locked_at=now)
+    return emails
+
+
+def send_chunk(emails):
+    """Sends emails over one connection, returns (email, error) pairs."""
+
+    results = []
+    connection = get_connection(fail_silently=False)
+    try:
+        connection.open()
+        for email in emails:
+            message = EmailMessage(
+                email.subject, email.body, email.from_email, [email.to],
+                connection=connection)
+            try:
+                message.send()
+            except Exception as error:
+                results.append((email, repr(error)))
+            else:
+                results.append((email, None))
+    except Exception as error:
+        done = {email.pk for email, _ in results}
+        results.extend(
+            (email, repr(error)) for email in emails if email.pk not in done)
+    finally:
+        connection.close()
+    return results
+
+
+def backoff(attempts):
+    config = settings.EMAIL_OUTBOX
+    return datetime.timedelta(seconds=min(
+        config['backoff'] * 2 ** (attempts - 1), config['max_backoff']))
+
+
+def record_results(results):
+    now = timezone.now()
+    sent = [email.pk for email, error in results if error is None]
+    OutgoingEmail.objects.filter(pk__in=sent).update(
+        status=OutgoingEmail.SENT, sent_at=now, locked_at=None,
+        last_error='')
+    for email, error in results:
+        if error is None:
+            continue
+        attempts = email.attempts + 1
+        status = OutgoingEmail.PENDING
+        if attempts >= settings.EMAIL_OUTBOX['max_attempts']:
+            status = OutgoingEmail.FAILED
+        OutgoingEmail.objects.filter(pk=email.pk).update(
+            status=status,
+            attempts=attempts,
+            next_attempt_at=now + backoff(attempts),
+            locked_at=None,
+            last_error=error,
+        )
+    return len(sent), len(results) - len(sent)
+
+
+def drain_outbox(batch_size, workers):
+    """
+    Sends due emails until none are left.
+    Each batch is split between worker threads, every thread delivers
+    its share through a single mail connection.
+    Returns numbers of sent and failed deliveries.
+    """
+
+    sent = failed = 0
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        while True:
+            emails = claim_batch(batch_size)
+            if not emails:
+                return sent, failed
+            chunks = [emails[i::workers] for i in range(workers)]
+            for results in executor.map(send_chunk, filter(None, chunks)):
+                batch_sent, batch_failed = record_results(results)
+                sent += batch_sent
+                failed += batch_failed
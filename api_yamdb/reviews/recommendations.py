@@ -0,0 +1,333 @@
+import multiprocessing
+import resource
+
+import numpy as np
+from django.conf import settings
+from django.db import connections, transaction
+
+from .loading import batched
+from .models import Recommendation, Review
+
+CHUNK_SIZE = 100000
+MIN_SCORE = 1
+MAX_SCORE = 10
+
+# Arrays read by forked worker processes.
+_shared = {}
+
+
+def load_scores(chunk_size=CHUNK_SIZE):
+    """
+    Streams (author, title, score) of all reviews into int32 id and
+    int8 score arrays, 9 bytes per review.
+    """
+
+    authors, titles, scores = [], [], []
+    rows = Review.objects.order_by().values_list(
+        'author', 'title', 'score').iterator(chunk_size=chunk_size)
+    for batch in batched(rows, chunk_size):
+        chunk = np.array(batch, dtype=np.int32)
+        authors.append(chunk[:, 0].copy())
+        titles.append(chunk[:, 1].copy())
+        scores.append(chunk[:, 2].astype(np.int8))
+    if not authors:
+        return (
+            np.empty(0, np.int32), np.empty(0, np.int32),
+            np.empty(0, np.int8))
+    return (
+        np.concatenate(authors), np.concatenate(titles),
+        np.concatenate(scores))
+
+
+def _compress(rows, columns, values, size):
+    """Entries sorted by row with the offsets of every row."""
+
+    order = np.argsort(rows, kind='stable')
+    indptr = np.zeros(size + 1, dtype=np.int64)
+    np.cumsum(np.bincount(rows, minlength=size), out=indptr[1:])
+    return indptr, columns[order], values[order]
+
+
+class ScoreMatrix:
+    """
+    Sparse user x title matrix of review scores, kept by users and by
+    titles in compressed sparse row form.
+    """
+
+    def __init__(self, authors, titles, scores):
+        self.user_ids, users = np.unique(authors, return_inverse=True)
+        self.title_ids, items = np.unique(titles, return_inverse=True)
+        users = users.astype(np.int32)
+        items = items.astype(np.int32)
+        values = scores.astype(np.float32)
+        self.mean = float(values.mean()) if len(values) else 0.0
+        self.by_user = _compress(users, items, values, len(self.user_ids))
+        self.by_title = _compress(items, users, values, len(self.title_ids))
+
+    def __len__(self):
+        return len(self.by_user[1])
+
+    @property
+    def nbytes(self):
+        return sum(
+            array.nbytes for array in self.by_user + self.by_title
+        ) + self.user_ids.nbytes + self.title_ids.nbytes
+
+    def entries(self):
+        """User rows, title columns and scores of all entries."""
+
+        indptr, columns, values = self.by_user
+        rows = np.repeat(
+            np.arange(len(self.user_ids), dtype=np.int32), np.diff(indptr))
+        return rows, columns, values
+
+
+def row_batches(indptr, limit):
+    """Row ranges with at most limit entries, larger rows alone."""
+
+    batches = []
+    start = 0
+    rows = len(indptr) - 1
+    while start < rows:
+        stop = int(np.searchsorted(
+            indptr, indptr[start] + limit, side='right')) - 1
+        stop = min(max(stop, start + 1), rows)
+        batches.append((start, stop))
+        start = stop
+    return batches
+
+
+def _solve_rows(batch):
+    """
+    Least squares factors and bias of rows start..stop with the other
+    side fixed: (X'X + reg * n * I) w = X't for every row.
+    """
+
+    start, stop = batch
+    indptr, columns, values = _shared['rows']
+    fixed, offsets = _shared['fixed'], _shared['offsets']
+    size = fixed.shape[1]
+    counts = np.diff(indptr[start:stop + 1])
+    gram = np.empty((stop - start, size, size), dtype=np.float32)
+    right = np.empty((stop - start, size), dtype=np.float32)
+    # Rows are stacked by length rounded up to a power of two and padded
+    # with zero entries, so that every stack is one batched matmul.
+    widths = 2 ** np.ceil(np.log2(counts)).astype(np.int64)
+    for width in np.unique(widths):
+        rows = np.flatnonzero(widths == width)
+        entries = indptr[start + rows, np.newaxis] + np.arange(width)
+        padding = entries >= indptr[start + rows + 1, np.newaxis]
+        entries[padding] = indptr[start]
+        x = fixed[columns[entries]]
+        x[padding] = 0
+        target = (
+            values[entries] - _shared['mean'] - offsets[columns[entries]])
+        target[padding] = 0
+        gram[rows] = np.matmul(x.transpose(0, 2, 1), x)
+        right[rows] = np.einsum('ij,ijk->ik', target, x)
+    gram += (
+        _shared['regularization'] * counts[:, np.newaxis, np.newaxis]
+        * np.eye(size, dtype=np.float32))
+    return start, stop, np.linalg.solve(gram, right[..., np.newaxis])[..., 0]
+
+
+def _run(function, jobs, workers):
+    """
+    Yields results of function over jobs in order, computed in forked
+    processes if workers > 1.
+    """
+
+    if workers <= 1:
+        yield from map(function, jobs)
+        return
+    connections.close_all()
+    with multiprocessing.get_context('fork').Pool(workers) as pool:
+        yield from pool.imap(function, jobs)
+
+
+class Factors:
+    """
+    Biased matrix factorization: a predicted score is
+    mean + user bias + title bias + user factors . title factors.
+    """
+
+    def __init__(self, matrix, factors, seed=0):
+        rng = np.random.default_rng(seed)
+        self.matrix = matrix
+        self.users = rng.normal(
+            0, 0.1, (len(matrix.user_ids), factors)).astype(np.float32)
+        self.titles = rng.normal(
+            0, 0.1, (len(matrix.title_ids), factors)).astype(np.float32)
+        self.user_bias = np.zeros(len(matrix.user_ids), dtype=np.float32)
+        self.title_bias = np.zeros(len(matrix.title_ids), dtype=np.float32)
+
+    def _half_step(self, rows, factors, bias, regularization, batches,
+                   workers):
+        # Solving for [factors, bias] against fixed [factors, 1].
+        fixed = np.hstack(
+            [factors, np.ones((len(factors), 1), dtype=np.float32)])
+        _shared.update(
+            rows=rows, fixed=fixed, offsets=bias, mean=self.matrix.mean,
+            regularization=regularization)
+        solved = np.empty((len(rows[0]) - 1, fixed.shape[1]), np.float32)
+        try:
+            for start, stop, weights in _run(_solve_rows, batches, workers):
+                solved[start:stop] = weights
+        finally:
+            _shared.clear()
+        return solved[:, :-1].copy(), solved[:, -1].copy()
+
+    def fit(self, iterations, regularization, batch_entries, workers=1,
+            validation=None, log=None):
+        """Alternating least squares over users and titles."""
+
+        user_batches = row_batches(self.matrix.by_user[0], batch_entries)
+        title_batches = row_batches(self.matrix.by_title[0], batch_entries)
+        for iteration in range(1, iterations + 1):
+            self.users, self.user_bias = self._half_step(
+                self.matrix.by_user, self.titles, self.title_bias,
+                regularization, user_batches, workers)
+            self.titles, self.title_bias = self._half_step(
+                self.matrix.by_title, self.users, self.user_bias,
+                regularization, title_batches, workers)
+            if log is not None:
+                log(iteration, self.rmse(*self.matrix.entries()),
+                    self.rmse(*validation) if validation else None)
+        return self
+
+    def predict(self, users, titles):
+        """Scores of (user row, title column) pairs, in chunks."""
+
+        predicted = np.empty(len(users), dtype=np.float32)
+        for start in range(0, len(users), CHUNK_SIZE):
+            chunk = slice(start, start + CHUNK_SIZE)
+            predicted[chunk] = (
+                self.matrix.mean + self.user_bias[users[chunk]]
+                + self.title_bias[titles[chunk]]
+                + np.einsum(
+                    'ij,ij->i', self.users[users[chunk]],
+                    self.titles[titles[chunk]]))
+        return np.clip(predicted, MIN_SCORE, MAX_SCORE)
+
+    def rmse(self, users, titles, scores):
+        if not len(scores):
+            return None
+        errors = self.predict(users, titles) - scores
+        return float(np.sqrt(np.mean(errors * errors)))
+
+
+def split_holdout(authors, titles, scores, share, seed=0):
+    """Random (training, holdout) split of the review arrays."""
+
+    held = np.random.default_rng(seed).random(len(scores)) < share
+    return (
+        (authors[~held], titles[~held], scores[~held]),
+        (authors[held], titles[held], scores[held]),
+    )
+
+
+def holdout_entries(matrix, authors, titles, scores):
+    """Held out reviews as matrix rows and columns, skipping unknowns."""
+
+    known = (
+        np.isin(authors, matrix.user_ids) & np.isin(titles, matrix.title_ids))
+    return (
+        np.searchsorted(matrix.user_ids, authors[known]),
+        np.searchsorted(matrix.title_ids, titles[known]),
+        scores[known].astype(np.float32),
+    )
+
+
+def _recommend_users(batch):
+    """Top predicted unreviewed candidate titles of users start..stop."""
+
+    start, stop = batch
+    model, candidates = _shared['model'], _shared['candidates']
+    top_n = _shared['top_n']
+    scores = model.users[start:stop] @ _shared['titles'].T
+    scores += _shared['title_bias']
+    scores += model.matrix.mean + model.user_bias[start:stop, np.newaxis]
+    indptr, columns, _ = model.matrix.by_user
+    counts = np.diff(indptr[start:stop + 1])
+    rows = np.repeat(np.arange(stop - start), counts)
+    positions = _shared['positions'][columns[indptr[start]:indptr[stop]]]
+    reviewed = positions >= 0
+    scores[rows[reviewed], positions[reviewed]] = -np.inf
+    if top_n < scores.shape[1]:
+        best = np.argpartition(-scores, top_n, axis=1)[:, :top_n]
+    else:
+        best = np.tile(np.arange(scores.shape[1]), (stop - start, 1))
+    best_scores = np.take_along_axis(scores, best, axis=1)
+    order = np.argsort(-best_scores, axis=1, kind='stable')
+    best = np.take_along_axis(best, order, axis=1)
+    best_scores = np.take_along_axis(best_scores, order, axis=1)
+    return start, candidates[best], best_scores
+
+
+def recommend(model, top_n, candidates=None, workers=1):
+    """
+    Yields (user row, title columns, predicted scores) of every user,
+    best first, among the `candidates` most reviewed titles.
+    """
+
+    counts = np.diff(model.matrix.by_title[0])
+    columns = np.argsort(-counts, kind='stable')[:candidates]
+    positions = np.full(len(counts), -1, dtype=np.int64)
+    positions[columns] = np.arange(len(columns))
+    size = max(1, settings.RECOMMENDATIONS['block_memory'] // (
+        4 * max(len(columns), 1)))
+    users = len(model.matrix.user_ids)
+    _shared.update(
+        model=model, candidates=columns, positions=positions, top_n=top_n,
+        titles=model.titles[columns], title_bias=model.title_bias[columns])
+    try:
+        for start, titles, scores in _run(
+            _recommend_users,
+            [(start, min(start + size, users))
+             for start in range(0, users, size)],
+            workers
+        ):
+            for offset, (row_titles, row_scores) in enumerate(
+                    zip(titles, scores)):
+                # Users who reviewed most candidates get fewer titles.
+                kept = np.isfinite(row_scores)
+                yield start + offset, row_titles[kept], np.clip(
+                    row_scores[kept], MIN_SCORE, MAX_SCORE)
+    finally:
+        _shared.clear()
+
+
+def store_recommendations(model, rows, batch_size):
+    """Replaces stored recommendations of the users, returns their number."""
+
+    stored = 0
+    for batch in batched(rows, batch_size):
+        objects = [
+            Recommendation(
+                user_id=int(model.matrix.user_ids[row]),
+                title_id=int(model.matrix.title_ids[column]),
+                rank=rank, score=round(float(score), 2))
+            for row, columns, scores in batch
+            for rank, (column, score) in enumerate(zip(columns, scores), 1)
+        ]
+        user_ids = [int(model.matrix.user_ids[row]) for row, _, _ in batch]
+        with transaction.atomic():
+            Recommendation.objects.filter(user_id__in=user_ids).delete()
+            Recommendation.objects.bulk_create(objects)
+        stored += len(batch)
+    gone = np.setdiff1d(
+        np.array(
+            Recommendation.objects.values_list('user', flat=True).distinct(),
+            dtype=np.int64),
+        model.matrix.user_ids)
+    for user_ids in batched(gone.tolist(), batch_size):
+        Recommendation.objects.filter(user_id__in=user_ids).delete()
+    return stored
+
+
+def peak_memory():
+    """Peak resident memory in MB of this process and of its workers."""
+
+    return tuple(
+        resource.getrusage(who).ru_maxrss / 1024
+        for who in (resource.RUSAGE_SELF, resource.RUSAGE_CHILDREN))
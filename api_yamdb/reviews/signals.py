@@ -0,0 +1,151 @@
+from django.db.models.signals import (m2m_changed, post_delete, post_save,
+                                      pre_delete, pre_save)
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .aggregates import apply_review_change, shift_counter, touch_titles
+from .models import (Category, Comment, Genre, GenreTitle, Review,
+                     SimilarTitle, Title, User)
+from .similarity import mark_stale
+
+
+@receiver(pre_save, sender=Title)
+def set_modified_on_raw_save(sender, instance, raw, **kwargs):
+    """Fixtures without modification time are loaded as modified now."""
+
+    if raw and instance.modified is None:
+        instance.modified = timezone.now()
+
+
+@receiver(pre_save, sender=Review)
+def remember_review_state(sender, instance, raw, using, **kwargs):
+    """
+    Keeps title, score and author of a review before it is re-saved.
+    The row stays locked until Review.save commits, so a concurrent
+    re-save waits and reads the state this one leaves.
+    """
+
+    instance._stored_state = None
+    if raw or instance.pk is None:
+        return
+    instance._stored_state = (
+        Review.objects.using(using).select_for_update()
+        .filter(pk=instance.pk)
+        .values_list('title_id', 'score', 'author_id')
+        .first()
+    )
+
+
+@receiver(post_save, sender=Review)
+def update_title_on_review_save(sender, instance, created, raw, **kwargs):
+    if raw:
+        return
+    stored = getattr(instance, '_stored_state', None)
+    if created or stored is None:
+        apply_review_change(instance.title_id, new_score=instance.score)
+        shift_counter(User, instance.author_id, 'review_count', 1)
+        return
+    title_id, score, author_id = stored
+    if author_id != instance.author_id:
+        shift_counter(User, author_id, 'review_count', -1)
+        shift_counter(User, instance.author_id, 'review_count', 1)
+    if title_id != instance.title_id:
+        apply_review_change(title_id, old_score=score)
+        apply_review_change(instance.title_id, new_score=instance.score)
+    else:
+        # Text edits move the title modification time as well.
+        apply_review_change(title_id, score, instance.score)
+
+
+@receiver(post_delete, sender=Review)
+def update_title_on_review_delete(sender, instance, **kwargs):
+    apply_review_change(instance.title_id, old_score=instance.score)
+    shift_counter(User, instance.author_id, 'review_count', -1)
+
+
+@receiver(post_save, sender=Comment)
+def count_comment_on_save(sender, instance, created, raw, **kwargs):
+    if created and not raw:
+        shift_counter(Review, instance.review_id, 'comment_count', 1)
+        shift_counter(User, instance.author_id, 'comment_count', 1)
+
+
+@receiver(post_delete, sender=Comment)
+def count_comment_on_delete(sender, instance, **kwargs):
+    shift_counter(Review, instance.review_id, 'comment_count', -1)
+    shift_counter(User, instance.author_id, 'comment_count', -1)
+
+
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+def touch_title_on_comment_change(sender, instance, **kwargs):
+    if not kwargs.get('raw'):
+        touch_titles(reviews=instance.review_id)
+
+
+@receiver(post_save, sender=GenreTitle)
+@receiver(post_delete, sender=GenreTitle)
+def touch_title_on_genre_link_change(sender, instance, **kwargs):
+    if not kwargs.get('raw'):
+        touch_titles(pk=instance.title_id)
+
+
+@receiver(m2m_changed, sender=Title.genre.through)
+def touch_title_on_genre_set(sender, instance, action, reverse, pk_set,
+                             **kwargs):
+    if action in ('post_add', 'post_remove', 'post_clear') and not reverse:
+        touch_titles(pk=instance.pk)
+    elif action in ('post_add', 'post_remove') and reverse:
+        touch_titles(pk__in=pk_set)
+    elif action == 'pre_clear' and reverse:
+        touch_titles(genre=instance)
+
+
+@receiver(post_save, sender=Genre)
+def touch_titles_on_genre_save(sender, instance, created, raw, **kwargs):
+    if not (created or raw):
+        touch_titles(genre=instance)
+
+
+@receiver(post_save, sender=Category)
+@receiver(pre_delete, sender=Category)
+def touch_titles_on_category_change(sender, instance, **kwargs):
+    if not (kwargs.get('created') or kwargs.get('raw')):
+        touch_titles(category=instance)
+
+
+@receiver(post_save, sender=Title)
+def queue_similarity_on_title_save(sender, instance, **kwargs):
+    mark_stale([instance.pk])
+
+
+@receiver(pre_delete, sender=Title)
+def queue_similarity_on_title_delete(sender, instance, **kwargs):
+    """Titles listing a deleted title lose one of their neighbours."""
+
+    mark_stale(
+        SimilarTitle.objects.filter(similar=instance).values_list(
+            'title', flat=True))
+
+
+@receiver(post_save, sender=GenreTitle)
+@receiver(post_delete, sender=GenreTitle)
+def queue_similarity_on_genre_link_change(sender, instance, **kwargs):
+    mark_stale([instance.title_id])
+
+
+@receiver(m2m_changed, sender=Title.genre.through)
+def queue_similarity_on_genre_set(sender, instance, action, reverse, pk_set,
+                                  **kwargs):
+    if action in ('post_add', 'post_remove', 'post_clear') and not reverse:
+        mark_stale([instance.pk])
+    elif action in ('post_add', 'post_remove') and reverse:
+        mark_stale(pk_set)
+    elif action == 'pre_clear' and reverse:
+        mark_stale(
+            Title.objects.filter(genre=instance).values_list('pk', flat=True))
+
+
+@receiver(pre_delete, sender=Category)
+def queue_similarity_on_category_delete(sender, instance, **kwargs):
+    mark_stale(instance.titles.values_list('pk', flat=True))
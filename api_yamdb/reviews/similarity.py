@@ -0,0 +1,201 @@
+import numpy as np
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Min
+
+from .models import GenreTitle, SimilarTitle, StaleSimilarity, Title
+
+# Scores of neighbours are rounded before ranking, so that titles with
+# equal features keep their order whichever block computed them.
+DECIMALS = 6
+TOLERANCE = 10 ** -DECIMALS
+
+
+def mark_stale(title_ids):
+    """Queues titles for the next incremental update."""
+
+    StaleSimilarity.objects.bulk_create(
+        [StaleSimilarity(title=pk) for pk in title_ids],
+        batch_size=1000, ignore_conflicts=True)
+
+
+def feature_matrix():
+    """
+    Ids of all titles in ascending order and their L2 normalized
+    feature rows: genres, category and release decade, weighted by
+    SIMILAR_TITLES. Rows are dense, there are only a few dozen features.
+    """
+
+    config = settings.SIMILAR_TITLES
+    rows = list(
+        Title.objects.order_by('pk').values_list('pk', 'category', 'year'))
+    ids = np.array([row[0] for row in rows], dtype=np.int64)
+    categories = np.array(
+        [row[1] or 0 for row in rows], dtype=np.int64)
+    years = np.array([row[2] for row in rows], dtype=np.int64)
+    links = np.array(
+        list(GenreTitle.objects.values_list('title', 'genre')),
+        dtype=np.int64).reshape(-1, 2)
+
+    genres, genre_columns = np.unique(links[:, 1], return_inverse=True)
+    categorized = np.flatnonzero(categories)
+    distinct_categories, category_columns = np.unique(
+        categories[categorized], return_inverse=True)
+    decades, decade_columns = np.unique(
+        years // config['year_bucket'], return_inverse=True)
+    category_start = len(genres)
+    decade_start = category_start + len(distinct_categories)
+
+    matrix = np.zeros(
+        (len(ids), decade_start + len(decades)), dtype=np.float32)
+    matrix[np.searchsorted(ids, links[:, 0]), genre_columns] = (
+        config['genre_weight'])
+    matrix[categorized, category_start + category_columns] = (
+        config['category_weight'])
+    matrix[np.arange(len(ids)), decade_start + decade_columns] = (
+        config['year_weight'])
+    norms = np.linalg.norm(matrix, axis=1)
+    norms[norms == 0] = 1
+    matrix /= norms[:, np.newaxis]
+    return ids, matrix
+
+
+def matrix_rows(ids, pks):
+    """Rows of the titles with the given ids, skipping deleted titles."""
+
+    pks = np.asarray(pks, dtype=np.int64)
+    return np.searchsorted(ids, pks[np.isin(pks, ids)])
+
+
+def block_size(matrix):
+    """Rows whose scores against all titles fit in block_memory."""
+
+    return max(1, settings.SIMILAR_TITLES['block_memory'] // (
+        4 * max(len(matrix), 1)))
+
+
+def top_neighbours(scores, k):
+    """
+    Columns and rounded scores of the k highest positive scores, best
+    first; equal scores in column, that is title id, order.
+    """
+
+    if k < len(scores):
+        threshold = np.partition(scores, -k)[-k] - TOLERANCE
+        candidates = np.flatnonzero(scores >= max(threshold, 0))
+    else:
+        candidates = np.arange(len(scores))
+    candidates = candidates[scores[candidates] > 0]
+    rounded = np.round(scores[candidates], DECIMALS)
+    order = np.lexsort((candidates, -rounded))[:k]
+    return candidates[order], rounded[order]
+
+
+def similarity_rows(matrix, rows):
+    """Yields scores of every given row against all rows, in blocks."""
+
+    size = block_size(matrix)
+    for start in range(0, len(rows), size):
+        block = rows[start:start + size]
+        scores = matrix[block] @ matrix.T
+        # A title is not similar to itself.
+        scores[np.arange(len(block)), block] = 0
+        yield from zip(block, scores)
+
+
+def store_neighbours(ids, matrix, rows):
+    """Replaces stored similar titles of the given matrix rows."""
+
+    k = settings.SIMILAR_TITLES['neighbours']
+    similar = []
+    for row, scores in similarity_rows(matrix, rows):
+        columns, rounded = top_neighbours(scores, k)
+        similar.extend(
+            SimilarTitle(
+                title_id=int(ids[row]), similar_id=int(ids[column]),
+                rank=rank, score=float(score))
+            for rank, (column, score) in enumerate(zip(columns, rounded), 1))
+    with transaction.atomic():
+        SimilarTitle.objects.filter(title_id__in=ids[rows].tolist()).delete()
+        SimilarTitle.objects.bulk_create(similar)
+
+
+def _store_all(ids, matrix, rows):
+    size = settings.SIMILAR_TITLES['batch_size']
+    for start in range(0, len(rows), size):
+        store_neighbours(ids, matrix, rows[start:start + size])
+    return len(rows)
+
+
+def _claim_stale():
+    """
+    Takes queued titles off the queue. Titles changed later are queued
+    again and picked up by the next run.
+    """
+
+    with transaction.atomic():
+        stale = list(StaleSimilarity.objects.select_for_update().values_list(
+            'title', flat=True))
+        StaleSimilarity.objects.filter(title__in=stale).delete()
+    return stale
+
+
+def rebuild_similar_titles():
+    """Recomputes similar titles of every title, returns their number."""
+
+    stale = _claim_stale()
+    try:
+        ids, matrix = feature_matrix()
+        return _store_all(ids, matrix, np.arange(len(ids)))
+    except BaseException:
+        mark_stale(stale)
+        raise
+
+
+def affected_rows(ids, matrix, changed):
+    """
+    Rows whose neighbours may change with the changed rows: the changed
+    ones, titles listing one of them and titles to which one of them is
+    now closer than their last stored neighbour.
+    """
+
+    k = settings.SIMILAR_TITLES['neighbours']
+    listing = SimilarTitle.objects.filter(
+        similar__in=ids[changed].tolist()).values_list('title', flat=True)
+    stored = np.array(
+        list(
+            SimilarTitle.objects.values('title')
+            .annotate(number=Count('id'), score=Min('score'))
+            .values_list('title', 'number', 'score')
+        ),
+        dtype=np.float64).reshape(-1, 3)
+    # Titles with less than k neighbours take any title with a score.
+    full = stored[stored[:, 1] >= k]
+    full = full[np.isin(full[:, 0], ids)]
+    lowest = np.zeros(len(ids), dtype=np.float32)
+    lowest[matrix_rows(ids, full[:, 0])] = full[:, 2]
+    closest = np.zeros(len(ids), dtype=np.float32)
+    for _, scores in similarity_rows(matrix, changed):
+        np.maximum(closest, scores, out=closest)
+    closer = np.flatnonzero(
+        (closest > 0) & (closest >= lowest - TOLERANCE))
+    return np.union1d(
+        np.union1d(closer, changed), matrix_rows(ids, list(listing)))
+
+
+def update_similar_titles():
+    """
+    Recomputes similar titles of queued titles and of titles whose
+    neighbours they may enter or leave. Returns the number of titles.
+    """
+
+    stale = _claim_stale()
+    if not stale:
+        return 0
+    try:
+        ids, matrix = feature_matrix()
+        changed = matrix_rows(ids, stale)
+        return _store_all(ids, matrix, affected_rows(ids, matrix, changed))
+    except BaseException:
+        mark_stale(stale)
+        raise
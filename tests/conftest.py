@@ -1,9 +1,61 @@
 import sys
 from os.path import abspath, dirname, join
 
+import pytest
+
 root_dir = dirname(dirname(abspath(__file__)))
 sys.path.append(root_dir)
 infra_dir_path = join(root_dir, 'infra')
 
 pytest_plugins = [
 ]
+
+
+@pytest.fixture(autouse=True)
+def clear_cache(settings):
+    from django.core.cache import caches
+
+    # Tests are served by a single process.
+    settings.RESPONSE_CACHE = dict(settings.RESPONSE_CACHE, allow_local=True)
+    for alias in settings.CACHES:
+        caches[alias].clear()
+
+
+@pytest.fixture
+def user(django_user_model):
+    return django_user_model.objects.create_user(
+        username='reader', email='reader@yamdb.fake', password='1234567')
+
+
+@pytest.fixture
+def admin(django_user_model):
+    return django_user_model.objects.create_user(
+        username='boss', email='boss@yamdb.fake', password='1234567',
+        role='admin')
+
+
+def _client_for(user):
+    from rest_framework.test import APIClient
+    from rest_framework_simplejwt.tokens import RefreshToken
+
+    client = APIClient()
+    token = RefreshToken.for_user(user).access_token
+    client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+    return client
+
+
+@pytest.fixture
+def user_client(user):
+    return _client_for(user)
+
+
+@pytest.fixture
+def admin_client(admin):
+    return _client_for(admin)
+
+
+@pytest.fixture
+def guest_client():
+    from rest_framework.test import APIClient
+
+    return APIClient()
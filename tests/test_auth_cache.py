@@ -0,0 +1,54 @@
+import pytest
+from core.authentication import CachedJWTAuthentication
+from rest_framework_simplejwt.tokens import AccessToken
+from reviews.models import Category, User
+
+
+@pytest.mark.django_db
+class TestCachedJWTAuthentication:
+
+    def test_no_user_query_for_known_token(
+        self, user_client, django_assert_num_queries
+    ):
+        Category.objects.create(name='Фильм', slug='film')
+        user_client.get('/api/v1/categories/')
+        # Only the page query, the user and the count come from the cache.
+        with django_assert_num_queries(1):
+            response = user_client.get('/api/v1/categories/?page=1')
+        assert response.status_code == 200
+
+    def test_role_change_is_visible(self, user, user_client, admin_client):
+        assert user_client.get('/api/v1/users/').status_code == 403
+        response = admin_client.patch(
+            f'/api/v1/users/{user.username}/', {'role': 'admin'})
+        assert response.status_code == 200
+        assert user_client.get('/api/v1/users/').status_code == 200
+
+    def test_deactivated_user_is_rejected(self, user, user_client):
+        assert user_client.get('/api/v1/users/me/').status_code == 200
+        user.is_active = False
+        user.save()
+        assert user_client.get('/api/v1/users/me/').status_code == 401
+
+    def test_me_returns_full_profile(self, user, user_client):
+        user_client.get('/api/v1/users/me/')
+        response = user_client.get('/api/v1/users/me/')
+        assert response.json()['email'] == user.email
+
+
+@pytest.mark.django_db
+def test_snapshot_lives_in_shared_cache(user, settings, tmp_path):
+    settings.CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': str(tmp_path),
+        }
+    }
+    token = AccessToken.for_user(user)
+    authentication = CachedJWTAuthentication()
+    assert authentication.get_user(token).role == 'user'
+    User.objects.filter(pk=user.pk).update(role='admin')
+    assert authentication.get_user(token).role == 'user'
+    user.role = 'admin'
+    user.save()
+    assert authentication.get_user(token).role == 'admin'
@@ -0,0 +1,88 @@
+import json
+from io import StringIO
+
+import pytest
+from core.benchmark import (ENDPOINTS, compare_results, percentile,
+                            run_benchmark)
+from core.cache import get_cache, get_versions
+from django.core.management import CommandError, call_command
+from reviews.generator import generate_database
+
+COUNTS = {'users': 6, 'titles': 4, 'reviews': 18, 'comments': 10}
+
+
+def _result(rps, p95, queries):
+    return {'endpoints': {'titles-list': {
+        'throughput_rps': rps,
+        'latency_ms': {'p50': 1, 'p95': p95},
+        'queries': {'mean': queries},
+    }}}
+
+
+@pytest.mark.django_db
+class TestBenchmark:
+
+    def test_run_measures_every_endpoint(self, client):
+        generate_database(COUNTS, log=lambda line: None)
+        results = run_benchmark(client, requests=3, warmup=1)
+        assert results['meta']['rows']['review'] == COUNTS['reviews']
+        assert set(results['endpoints']) == set(ENDPOINTS)
+        for name, result in results['endpoints'].items():
+            assert result['errors'] == 0, name
+            assert result['requests'] == 3
+            assert result['latency_ms']['p50'] <= (
+                result['latency_ms']['p99'])
+        json.dumps(results)
+
+    def test_command_compares_with_baseline(self, tmp_path):
+        generate_database(COUNTS, log=lambda line: None)
+        output = tmp_path / 'run.json'
+        baseline = tmp_path / 'baseline.json'
+        baseline.write_text(json.dumps(_result(10 ** 9, 0.001, 0)))
+        out = StringIO()
+        with pytest.raises(CommandError, match='regressed'):
+            call_command(
+                'benchmark_api', use_existing=True, requests=2,
+                endpoints='titles-list', output=str(output),
+                baseline=str(baseline), stdout=out)
+        assert 'REGRESSION' in out.getvalue()
+        assert list(json.loads(output.read_text())['endpoints']) == [
+            'titles-list']
+
+    def test_keeps_configured_cache(self, tmp_path):
+        generate_database(COUNTS, log=lambda line: None)
+        cache = get_cache()
+        cache.set('sentinel', 1)
+        versions = get_versions(['titles'])
+        keys = set(cache._cache)
+        call_command(
+            'benchmark_api', use_existing=True, requests=2,
+            endpoints='titles-list,title-detail', cold_cache=True,
+            output=str(tmp_path / 'run.json'), stdout=StringIO())
+        assert cache.get('sentinel') == 1
+        assert get_versions(['titles']) == versions
+        assert set(cache._cache) == keys
+
+
+def test_unknown_endpoint():
+    with pytest.raises(CommandError, match='Unknown endpoints'):
+        call_command('benchmark_api', endpoints='titles-list,nope')
+
+
+def test_percentile():
+    values = list(range(1, 101))
+    assert percentile(values, 50) == 50
+    assert percentile(values, 99) == 99
+    assert percentile([7], 95) == 7
+
+
+@pytest.mark.parametrize('current, regressed', [
+    (_result(100, 10, 3), set()),
+    (_result(105, 10.5, 3), set()),
+    (_result(80, 10, 3), {'throughput_rps'}),
+    (_result(100, 12, 3), {'p95_ms'}),
+    (_result(100, 10, 4), {'queries'}),
+])
+def test_compare_results(current, regressed):
+    rows = compare_results(current, _result(100, 10, 3), threshold=10)
+    assert {metric for _, metric, *_, bad in rows if bad} == regressed
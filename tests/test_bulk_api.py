@@ -0,0 +1,131 @@
+import pytest
+from django.contrib.auth import get_user_model
+from django.db import connection
+from reviews.models import Category, Genre, Review, Title
+
+from .conftest import _client_for
+
+
+@pytest.fixture
+def catalogue():
+    Category.objects.create(name='Фильм', slug='film')
+    Genre.objects.create(name='Драма', slug='drama')
+    Genre.objects.create(name='Комедия', slug='comedy')
+
+
+@pytest.mark.django_db
+class TestBulkTitles:
+
+    def test_create_with_errors(
+        self, catalogue, admin_client, django_assert_max_num_queries
+    ):
+        payload = [
+            {'name': 'A', 'year': 2000, 'category': 'film',
+             'genre': ['drama', 'comedy']},
+            {'name': 'B', 'year': 3000, 'category': 'film', 'genre': []},
+            {'name': 'C', 'year': 2001, 'category': 'book', 'genre': []},
+            {'name': 'D', 'year': 2002, 'category': 'film',
+             'genre': ['drama']},
+        ]
+        with django_assert_max_num_queries(10):
+            response = admin_client.post(
+                '/api/v1/titles/bulk/', payload, format='json')
+        assert response.status_code == 200
+        results = response.json()['results']
+        assert [result['status'] for result in results] == [
+            201, 400, 400, 201]
+        assert 'year' in results[1]['errors']
+        assert 'category' in results[2]['errors']
+        assert results[0]['data']['genre'] == ['drama', 'comedy']
+        title = Title.objects.get(name='A')
+        assert set(title.genre.values_list('slug', flat=True)) == {
+            'drama', 'comedy'}
+
+    def test_create_without_returned_ids(
+        self, catalogue, admin_client, monkeypatch
+    ):
+        monkeypatch.setattr(
+            connection.features, 'can_return_ids_from_bulk_insert', False)
+        response = admin_client.post('/api/v1/titles/bulk/', [
+            {'name': 'A', 'year': 2000, 'category': 'film',
+             'genre': ['drama']},
+            {'name': 'B', 'year': 2001, 'category': 'film', 'genre': []},
+        ], format='json')
+        results = response.json()['results']
+        assert [result['status'] for result in results] == [201, 201]
+        title = Title.objects.get(pk=results[0]['data']['id'])
+        assert list(title.genre.values_list('slug', flat=True)) == ['drama']
+
+    def test_update(self, catalogue, admin_client):
+        response = admin_client.post('/api/v1/titles/bulk/', [
+            {'name': 'A', 'year': 2000, 'category': 'film',
+             'genre': ['drama']},
+            {'name': 'B', 'year': 2000, 'category': 'film',
+             'genre': ['drama']},
+        ], format='json')
+        first, second = [r['data']['id'] for r in response.json()['results']]
+        response = admin_client.patch('/api/v1/titles/bulk/', [
+            {'id': first, 'genre': ['comedy']},
+            {'id': second, 'name': 'B2'},
+            {'id': 0, 'name': 'missing'},
+        ], format='json')
+        results = response.json()['results']
+        assert [result['status'] for result in results] == [200, 200, 404]
+        assert results[0]['data']['genre'] == ['comedy']
+        assert results[1]['data']['genre'] == ['drama']
+        assert Title.objects.get(pk=second).name == 'B2'
+
+    def test_batch_limits(self, settings, admin_client, user_client):
+        settings.BULK_API = {'max_batch_size': 1}
+        payload = [{'name': 'A', 'year': 2000}] * 2
+        url = '/api/v1/titles/bulk/'
+        assert admin_client.post(
+            url, payload, format='json').status_code == 400
+        assert admin_client.post(url, {}, format='json').status_code == 400
+        assert user_client.post(
+            url, payload[:1], format='json').status_code == 403
+
+
+@pytest.mark.django_db
+class TestBulkReviews:
+
+    @pytest.fixture
+    def reviews(self):
+        title = Title.objects.create(name='Title', year=2000)
+        User = get_user_model()
+        return [
+            Review.objects.create(
+                title=title, text='text', score=score,
+                author=User.objects.create_user(
+                    username=f'author{score}',
+                    email=f'author{score}@yamdb.fake'))
+            for score in (2, 4, 6)
+        ]
+
+    @pytest.fixture
+    def moderator_client(self, django_user_model):
+        return _client_for(django_user_model.objects.create_user(
+            username='moder', email='moder@yamdb.fake', role='moderator'))
+
+    def test_update_scores(self, reviews, moderator_client):
+        title = reviews[0].title
+        response = moderator_client.patch(
+            f'/api/v1/titles/{title.id}/reviews/bulk/',
+            [{'id': reviews[0].id, 'score': 10},
+             {'id': reviews[1].id, 'score': 11}],
+            format='json')
+        results = response.json()['results']
+        assert [result['status'] for result in results] == [200, 400]
+        title.refresh_from_db()
+        assert (title.score_sum, title.rating) == (20, 6)
+
+    def test_delete(self, reviews, moderator_client, user_client):
+        title = reviews[0].title
+        url = f'/api/v1/titles/{title.id}/reviews/bulk/'
+        payload = [{'id': reviews[0].id}, {'id': reviews[1].id}]
+        assert user_client.delete(
+            url, payload, format='json').status_code == 403
+        response = moderator_client.delete(url, payload, format='json')
+        assert [r['status'] for r in response.json()['results']] == [204, 204]
+        title.refresh_from_db()
+        assert (title.review_count, title.rating) == (1, 6)
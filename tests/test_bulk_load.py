@@ -0,0 +1,77 @@
+import json
+
+import pytest
+from django.core.management import CommandError, call_command
+from reviews.management.commands.bulk_load import read_json_array
+from reviews.models import Category, Comment, Genre, GenreTitle, Review, Title
+
+from .conftest import infra_dir_path
+
+FIXTURE = f'{infra_dir_path}/test_database.json'
+
+
+def test_json_array_reader_chunks():
+    with open(FIXTURE, encoding='utf-8') as source:
+        expected = json.load(source)
+    assert list(read_json_array(FIXTURE, chunk_size=97)) == expected
+
+
+@pytest.mark.django_db
+class TestBulkLoad:
+
+    def test_fixture_catalogue(self):
+        for kind in ('categories', 'genres', 'titles', 'genre_titles'):
+            call_command('bulk_load', kind, FIXTURE, batch_size=7)
+        assert Category.objects.count() == 3
+        assert Genre.objects.count() == 15
+        assert Title.objects.count() == 32
+        assert GenreTitle.objects.count() == 42
+        # Sequences continue after the loaded ids.
+        assert Category.objects.create(name='new', slug='new').pk > 3
+
+    def test_reviews_by_username(self, tmp_path, user, admin):
+        call_command('bulk_load', 'categories', FIXTURE)
+        call_command('bulk_load', 'titles', FIXTURE)
+        source = tmp_path / 'reviews.ndjson'
+        source.write_text('\n'.join(json.dumps(row) for row in [
+            {'id': 10, 'title': 1, 'author': 'reader', 'score': 4,
+             'text': 'ok', 'pub_date': '2020-01-01T10:00:00Z'},
+            {'id': 11, 'title': 1, 'author': 'boss', 'score': 9,
+             'text': 'great', 'pub_date': '2020-01-02T10:00:00Z'},
+        ]))
+        call_command('bulk_load', 'reviews', str(source))
+        title = Title.objects.get(pk=1)
+        assert (title.review_count, title.score_sum, title.rating) == (
+            2, 13, 6)
+        assert Review.objects.get(pk=10).pub_date.year == 2020
+
+        comments = tmp_path / 'comments.csv'
+        comments.write_text(
+            'id,review_id,text,author,pub_date\n'
+            '1,10,first,boss,2020-01-03T10:00:00Z\n'
+            '2,11,second,reader,\n'
+        )
+        call_command('bulk_load', 'comments', str(comments))
+        assert Comment.objects.filter(review_id=10).get().author == admin
+
+    def test_resume_from_checkpoint(self, tmp_path):
+        source = tmp_path / 'genres.csv'
+        source.write_text(
+            'name,slug\nA,a\nB,b\nC,c\n')
+        checkpoint = tmp_path / 'genres.checkpoint'
+        checkpoint.write_text(json.dumps(
+            {'kind': 'genres', 'source': str(source), 'position': 2}))
+        call_command(
+            'bulk_load', 'genres', str(source),
+            checkpoint=str(checkpoint), resume=True)
+        assert list(Genre.objects.values_list('slug', flat=True)) == ['c']
+        assert not checkpoint.exists()
+
+    def test_unknown_username(self, tmp_path):
+        call_command('bulk_load', 'categories', FIXTURE)
+        call_command('bulk_load', 'titles', FIXTURE)
+        source = tmp_path / 'reviews.csv'
+        source.write_text(
+            'title_id,author,score,text\n1,nobody,5,text\n')
+        with pytest.raises(CommandError):
+            call_command('bulk_load', 'reviews', str(source))
@@ -0,0 +1,79 @@
+import pytest
+from core.cache import cache_stats, reset_cache_stats
+from reviews.models import Category, Genre, Review, Title
+
+
+@pytest.fixture(params=['locmem', 'filebased'])
+def response_cache(request, settings, tmp_path):
+    if request.param == 'filebased':
+        settings.CACHES = {
+            'default': {
+                'BACKEND':
+                    'django.core.cache.backends.filebased.FileBasedCache',
+                'LOCATION': str(tmp_path),
+            }
+        }
+    reset_cache_stats()
+
+
+@pytest.fixture
+def title():
+    category = Category.objects.create(name='Фильм', slug='film')
+    return Title.objects.create(name='Title', year=2000, category=category)
+
+
+@pytest.mark.django_db
+@pytest.mark.usefixtures('response_cache')
+class TestResponseCache:
+
+    def test_hit_after_miss(self, title, guest_client):
+        first = guest_client.get('/api/v1/titles/?year=2000&name=Ti')
+        second = guest_client.get('/api/v1/titles/?name=Ti&year=2000')
+        assert first['X-Cache'] == 'MISS'
+        assert second['X-Cache'] == 'HIT'
+        assert first.json() == second.json()
+        assert cache_stats() == {'hits': 1, 'misses': 1}
+
+    def test_query_params_are_part_of_key(self, title, guest_client):
+        guest_client.get('/api/v1/titles/?year=2000')
+        response = guest_client.get('/api/v1/titles/?year=2001')
+        assert response['X-Cache'] == 'MISS'
+        assert response.json()['count'] == 0
+
+    def test_review_invalidates_titles(self, title, user, guest_client):
+        guest_client.get(f'/api/v1/titles/{title.id}/')
+        Review.objects.create(title=title, author=user, text='text', score=8)
+        response = guest_client.get(f'/api/v1/titles/{title.id}/')
+        assert response['X-Cache'] == 'MISS'
+        assert response.json()['rating'] == 8
+
+    def test_genre_invalidates_titles_and_genres(self, title, guest_client):
+        guest_client.get('/api/v1/titles/')
+        guest_client.get('/api/v1/genres/')
+        genre = Genre.objects.create(name='Drama', slug='drama')
+        title.genre.add(genre)
+        titles = guest_client.get('/api/v1/titles/')
+        genres = guest_client.get('/api/v1/genres/')
+        assert titles['X-Cache'] == genres['X-Cache'] == 'MISS'
+        assert titles.json()['results'][0]['genre'] == [
+            {'name': 'Drama', 'slug': 'drama'}]
+
+    def test_host_is_part_of_key(self, title, guest_client):
+        guest_client.get('/api/v1/titles/?page=1', HTTP_HOST='a.example')
+        response = guest_client.get(
+            '/api/v1/titles/?page=1', HTTP_HOST='b.example')
+        assert response['X-Cache'] == 'MISS'
+
+    def test_category_write_keeps_genres_cached(self, title, guest_client):
+        guest_client.get('/api/v1/genres/')
+        Category.objects.create(name='Книга', slug='book')
+        assert guest_client.get('/api/v1/genres/')['X-Cache'] == 'HIT'
+
+
+@pytest.mark.django_db
+def test_local_cache_needs_single_process(title, guest_client, settings):
+    settings.RESPONSE_CACHE = dict(settings.RESPONSE_CACHE, allow_local=False)
+    for _ in range(2):
+        response = guest_client.get('/api/v1/titles/')
+        assert 'X-Cache' not in response
+        assert 'ETag' not in response
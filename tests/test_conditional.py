@@ -0,0 +1,114 @@
+import pytest
+from reviews.models import Comment, Genre, Review, Title
+
+
+@pytest.fixture
+def title(user):
+    genre = Genre.objects.create(name='Драма', slug='drama')
+    title = Title.objects.create(name='Сталкер', year=1979)
+    title.genre.set([genre])
+    review = Review.objects.create(
+        title=title, author=user, text='text', score=9)
+    Comment.objects.create(review=review, author=user, text='text')
+    return title
+
+
+def _revalidate(client, url):
+    response = client.get(url)
+    assert response.status_code == 200
+    return client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+
+
+@pytest.mark.django_db
+class TestConditionalGet:
+
+    def test_not_modified(self, title, guest_client):
+        review = title.reviews.get()
+        urls = (
+            '/api/v1/titles/',
+            '/api/v1/titles/?year=1979',
+            f'/api/v1/titles/{title.id}/',
+            f'/api/v1/titles/{title.id}/reviews/',
+            f'/api/v1/titles/{title.id}/reviews/{review.id}/',
+            f'/api/v1/titles/{title.id}/reviews/{review.id}/comments/',
+        )
+        for url in urls:
+            response = _revalidate(guest_client, url)
+            assert response.status_code == 304, url
+            assert response.content == b''
+            assert response['ETag']
+
+    def test_if_modified_since(self, title, guest_client):
+        url = f'/api/v1/titles/{title.id}/'
+        response = guest_client.get(url)
+        last_modified = response['Last-Modified']
+        response = guest_client.get(
+            url, HTTP_IF_MODIFIED_SINCE=last_modified)
+        assert response.status_code == 304
+
+    def test_list_etag_skips_database(
+        self, title, guest_client, django_assert_num_queries
+    ):
+        etag = guest_client.get('/api/v1/titles/')['ETag']
+        with django_assert_num_queries(0):
+            response = guest_client.get(
+                '/api/v1/titles/', HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == 304
+        assert 'Last-Modified' not in response
+
+    def test_etag_depends_on_query(self, title, guest_client):
+        etag = guest_client.get('/api/v1/titles/')['ETag']
+        response = guest_client.get(
+            '/api/v1/titles/?year=1979', HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == 200
+
+    def test_not_modified_skips_serialization(
+        self, title, guest_client, django_assert_num_queries
+    ):
+        url = f'/api/v1/titles/{title.id}/'
+        etag = guest_client.get(url)['ETag']
+        with django_assert_num_queries(1):
+            response = guest_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == 304
+
+    @pytest.mark.parametrize('change, lists_change', [
+        (lambda title: Title.objects.filter(pk=title.pk).get().save(), True),
+        (lambda title: title.genre.clear(), True),
+        (lambda title: Genre.objects.filter(slug='drama').get().save(), True),
+        (lambda title: title.reviews.get().save(), True),
+        (lambda title: title.reviews.get().delete(), True),
+        # Comments are not part of the title list.
+        (lambda title: Comment.objects.get().delete(), False),
+    ])
+    def test_changes_refresh_etag(self, title, guest_client, change,
+                                  lists_change):
+        review = title.reviews.get()
+        urls = (
+            f'/api/v1/titles/{title.id}/',
+            f'/api/v1/titles/{title.id}/reviews/',
+        )
+        if lists_change:
+            urls += ('/api/v1/titles/',)
+        etags = {url: guest_client.get(url)['ETag'] for url in urls}
+        comments_url = (
+            f'/api/v1/titles/{title.id}/reviews/{review.id}/comments/')
+        comments_etag = guest_client.get(comments_url)['ETag']
+
+        change(title)
+
+        for url, etag in etags.items():
+            response = guest_client.get(url, HTTP_IF_NONE_MATCH=etag)
+            assert response.status_code == 200, url
+        if Review.objects.filter(pk=review.pk).exists():
+            response = guest_client.get(
+                comments_url, HTTP_IF_NONE_MATCH=comments_etag)
+            assert response.status_code == 200
+
+    def test_api_writes_refresh_etag(self, title, user_client):
+        url = f'/api/v1/titles/{title.id}/reviews/'
+        etag = user_client.get(url)['ETag']
+        review = title.reviews.get()
+        user_client.patch(f'{url}{review.id}/', {'text': 'edited'})
+        response = user_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == 200
+        assert response.data['results'][0]['text'] == 'edited'
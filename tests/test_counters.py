@@ -0,0 +1,124 @@
+from datetime import timedelta
+
+import pytest
+from core.cache import get_versions
+from django.core.management import CommandError, call_command
+from django.utils import timezone
+from reviews.aggregates import find_stale_counters
+from reviews.models import Category, Comment, Review, Title, User
+
+
+@pytest.fixture
+def title():
+    category = Category.objects.create(name='Фильм', slug='film')
+    return Title.objects.create(name='Title', year=2000, category=category)
+
+
+def _counts(obj, *fields):
+    obj.refresh_from_db()
+    return tuple(getattr(obj, field) for field in fields)
+
+
+@pytest.mark.django_db
+class TestCounters:
+
+    def test_api_writes_keep_counters(self, title, user, user_client,
+                                      admin, admin_client):
+        url = f'/api/v1/titles/{title.id}/reviews/'
+        response = user_client.post(url, {'text': 'text', 'score': 7})
+        assert response.status_code == 201
+        review = Review.objects.get(pk=response.json()['id'])
+        comments = f'{url}{review.id}/comments/'
+        user_client.post(comments, {'text': 'one'})
+        admin_client.post(comments, {'text': 'two'})
+
+        assert _counts(title, 'review_count') == (1,)
+        assert _counts(review, 'comment_count') == (2,)
+        assert _counts(user, 'review_count', 'comment_count') == (1, 1)
+        assert _counts(admin, 'review_count', 'comment_count') == (0, 1)
+
+        comment = Comment.objects.get(author=admin)
+        admin_client.delete(f'{comments}{comment.id}/')
+        assert _counts(review, 'comment_count') == (1,)
+        assert _counts(admin, 'comment_count') == (0,)
+
+        admin_client.delete(f'{url}{review.id}/')
+        assert _counts(title, 'review_count') == (0,)
+        assert _counts(user, 'review_count', 'comment_count') == (0, 0)
+
+    def test_counters_are_serialized(self, title, user, admin,
+                                     admin_client):
+        review = Review.objects.create(
+            title=title, author=user, text='text', score=7)
+        Comment.objects.create(review=review, author=admin, text='text')
+
+        reviews = admin_client.get(
+            f'/api/v1/titles/{title.id}/reviews/').json()['results']
+        assert reviews[0]['comment_count'] == 1
+        titles = admin_client.get('/api/v1/titles/').json()['results']
+        assert titles[0]['review_count'] == 1
+        users = {
+            item['username']: item
+            for item in admin_client.get('/api/v1/users/').json()['results']
+        }
+        assert users['reader']['review_count'] == 1
+        assert users['boss']['comment_count'] == 1
+
+    def test_rebuild_command(self, title, user, admin):
+        review = Review.objects.create(
+            title=title, author=user, text='text', score=7)
+        Comment.objects.create(review=review, author=admin, text='text')
+        Review.objects.update(comment_count=5)
+        User.objects.update(review_count=0, comment_count=3)
+        Title.objects.update(review_count=2)
+        assert list(find_stale_counters(Review)) == [
+            (review.pk, 'comment_count', 5, 1)]
+
+        with pytest.raises(CommandError):
+            call_command('rebuild_counters', '--check')
+        call_command('rebuild_counters', '--batch-size', '1')
+        call_command('rebuild_counters', '--check')
+        assert _counts(title, 'review_count', 'rating') == (1, 7)
+        assert _counts(user, 'review_count', 'comment_count') == (1, 0)
+        assert _counts(admin, 'review_count', 'comment_count') == (0, 1)
+
+
+@pytest.mark.django_db
+def test_rebuild_touches_titles_of_stale_reviews(title, user, admin):
+    other = Title.objects.create(name='Other', year=2001)
+    review = Review.objects.create(
+        title=title, author=user, text='text', score=7)
+    Review.objects.create(title=other, author=admin, text='text', score=3)
+    past = timezone.now() - timedelta(days=1)
+    Title.objects.update(modified=past)
+    Review.objects.filter(pk=review.pk).update(comment_count=2)
+
+    call_command('rebuild_counters', '--kind', 'reviews')
+    assert _counts(title, 'modified')[0] > past
+    assert _counts(other, 'modified') == (past,)
+
+
+@pytest.mark.django_db
+def test_rebuild_bumps_versions_of_rebuilt_kinds(title):
+    resources = ('titles', 'reviews', 'comments', 'users')
+    before = dict(zip(resources, get_versions(resources)))
+    call_command('rebuild_counters', '--kind', 'reviews', '--kind', 'users')
+    after = dict(zip(resources, get_versions(resources)))
+    assert [
+        resource for resource in resources
+        if before[resource] != after[resource]
+    ] == ['reviews', 'comments', 'users']
+
+
+@pytest.mark.django_db(transaction=True)
+def test_rebuild_in_parallel(title, user):
+    for number in range(3):
+        author = User.objects.create_user(
+            username=f'author{number}', email=f'author{number}@yamdb.fake')
+        Review.objects.create(title=title, author=author, text='t', score=5)
+    User.objects.update(review_count=0)
+
+    call_command(
+        'rebuild_counters', '--kind', 'users', '--batch-size', '1',
+        '--workers', '2')
+    call_command('rebuild_counters', '--check')
@@ -0,0 +1,70 @@
+import json
+
+import pytest
+from django.utils import timezone
+from reviews.models import Category, Genre, Review, Title
+
+
+@pytest.fixture
+def catalogue(user, admin):
+    category = Category.objects.create(name='Фильм', slug='film')
+    genre = Genre.objects.create(name='Драма', slug='drama')
+    titles = []
+    for i in range(3):
+        title = Title.objects.create(
+            name=f'Title {i}', year=2000, category=category)
+        title.genre.add(genre)
+        titles.append(title)
+    Review.objects.create(title=titles[0], author=user, text='a', score=4)
+    old = Review.objects.create(
+        title=titles[1], author=admin, text='b', score=8)
+    Review.objects.filter(pk=old.pk).update(
+        pub_date=timezone.now() - timezone.timedelta(days=30))
+    return titles
+
+
+def _rows(response):
+    assert response.status_code == 200
+    assert response['Content-Type'] == 'application/x-ndjson'
+    body = b''.join(response.streaming_content).decode()
+    return [json.loads(line) for line in body.splitlines()]
+
+
+@pytest.mark.django_db
+class TestExport:
+
+    def test_titles(self, catalogue, admin_client):
+        rows = _rows(admin_client.get('/api/v1/export/titles/'))
+        assert [row['id'] for row in rows] == [t.id for t in catalogue]
+        assert rows[0]['genre'] == [{'name': 'Драма', 'slug': 'drama'}]
+        assert rows[0]['category'] == {'name': 'Фильм', 'slug': 'film'}
+        assert rows[0]['rating'] == 4
+
+    def test_titles_since(self, catalogue, admin_client):
+        Title.objects.filter(pk=catalogue[2].pk).update(
+            modified=timezone.now() - timezone.timedelta(days=30))
+        since = (timezone.now() - timezone.timedelta(days=1)).date()
+        rows = _rows(admin_client.get(f'/api/v1/export/titles/?since={since}'))
+        assert [row['id'] for row in rows] == [
+            catalogue[0].id, catalogue[1].id]
+        response = admin_client.get('/api/v1/export/titles/?since=yesterday')
+        assert response.status_code == 400
+
+    def test_reviews_since(self, catalogue, admin_client):
+        rows = _rows(admin_client.get('/api/v1/export/reviews/'))
+        assert len(rows) == 2
+        since = (timezone.now() - timezone.timedelta(days=1)).date()
+        rows = _rows(
+            admin_client.get(f'/api/v1/export/reviews/?since={since}'))
+        assert [(row['author'], row['title']) for row in rows] == [
+            ('reader', catalogue[0].id)]
+
+    def test_bad_since(self, catalogue, admin_client):
+        response = admin_client.get('/api/v1/export/reviews/?since=yesterday')
+        assert response.status_code == 400
+
+    @pytest.mark.parametrize('url', [
+        '/api/v1/export/titles/', '/api/v1/export/reviews/'])
+    def test_admin_only(self, url, user_client, guest_client):
+        assert user_client.get(url).status_code == 403
+        assert guest_client.get(url).status_code == 401
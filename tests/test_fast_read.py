@@ -0,0 +1,161 @@
+import datetime
+
+import pytest
+from api.serializers import (CommentSerializer, ReviewsSerializer,
+                             TitleReadSerializer)
+from core import renderers
+from core.fast_read import get_row_plan
+from django.core.cache import caches
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+from reviews.models import Category, Comment, Genre, Review, Title
+
+TEXTS = (
+    'Обычный текст',
+    'Кавычки "двойные", \'одинарные\' и \\ слэш',
+    'Строки\nс переводом\tи разделителями \u2028 \u2029',
+    'Эмодзи 🎬 и символы <>&',
+    '\x01управляющий символ',
+)
+
+
+@pytest.fixture
+def catalogue(django_user_model):
+    film = Category.objects.create(name='Фильм', slug='film')
+    book = Category.objects.create(name='Книга "Ф"', slug='book')
+    genres = [
+        Genre.objects.create(name=f'Жанр {i}', slug=f'genre-{i}')
+        for i in range(4)
+    ]
+    authors = [
+        django_user_model.objects.create_user(
+            username=f'критик{i}', email=f'critic{i}@yamdb.fake')
+        for i in range(6)
+    ]
+    titles = []
+    for i in range(8):
+        title = Title.objects.create(
+            name=f'{TEXTS[i % len(TEXTS)]} {i}',
+            year=1950 + i * 7,
+            description=None if i % 3 == 0 else TEXTS[(i + 1) % len(TEXTS)],
+            category=(film, book, None)[i % 3],
+        )
+        title.genre.set(genres[:i % 4])
+        titles.append(title)
+    moment = timezone.now().replace(microsecond=0)
+    for i, author in enumerate(authors):
+        review = Review.objects.create(
+            title=titles[0], author=author, text=TEXTS[i % len(TEXTS)],
+            score=i + 3)
+        Comment.objects.create(
+            review=review, author=authors[0], text=TEXTS[-i])
+    # Equal and fractional publication dates.
+    Review.objects.filter(pk__lte=Review.objects.first().pk).update(
+        pub_date=moment)
+    Review.objects.filter(score=5).update(
+        pub_date=moment + datetime.timedelta(microseconds=120))
+    return titles
+
+
+def _urls(titles):
+    title = titles[0]
+    review = title.reviews.order_by('pk').first()
+    yield from (
+        '/api/v1/titles/',
+        '/api/v1/titles/?page=2',
+        '/api/v1/titles/?ordering=-year',
+        '/api/v1/titles/?ordering=rating',
+        '/api/v1/titles/?category=film',
+        '/api/v1/titles/?genre=genre-1',
+        '/api/v1/titles/?search=текст',
+        '/api/v1/titles/?fields=id,genre',
+        '/api/v1/titles/?omit=category,description',
+        f'/api/v1/titles/{title.id}/reviews/',
+        f'/api/v1/titles/{title.id}/reviews/?page=2',
+        f'/api/v1/titles/{title.id}/reviews/?fields=author,pub_date',
+        f'/api/v1/titles/{title.id}/reviews/{review.id}/comments/',
+        '/api/v1/titles/?page=100',
+    )
+
+
+def _content(client, url):
+    caches['default'].clear()
+    response = client.get(url)
+    return response.status_code, response.content
+
+
+@pytest.mark.django_db
+class TestFastRead:
+
+    def test_plans_compile(self):
+        for serializer in (
+            TitleReadSerializer(), ReviewsSerializer(), CommentSerializer()
+        ):
+            assert get_row_plan(serializer) is not None
+
+    @pytest.mark.parametrize('use_orjson', [True, False])
+    def test_byte_identical(
+        self, catalogue, guest_client, settings, monkeypatch, use_orjson
+    ):
+        if use_orjson and renderers.orjson is None:
+            pytest.skip('orjson is not installed')
+        if not use_orjson:
+            monkeypatch.setattr(renderers, 'orjson', None)
+        for url in _urls(catalogue):
+            settings.FAST_READ = {'enabled': True}
+            fast = _content(guest_client, url)
+            settings.FAST_READ = {'enabled': False}
+            regular = _content(guest_client, url)
+            assert fast == regular, url
+
+    def test_page_reads_values(
+        self, catalogue, guest_client, django_assert_num_queries
+    ):
+        # table size, count, page rows, genres of the page
+        with django_assert_num_queries(4) as context:
+            response = guest_client.get('/api/v1/titles/')
+        assert response.status_code == 200
+        page_query = context.captured_queries[2]['sql']
+        assert 'score_sum' not in page_query
+
+    def test_browsable_api_keeps_serializers(self, catalogue, guest_client):
+        response = guest_client.get(
+            '/api/v1/titles/', HTTP_ACCEPT='text/html')
+        assert response.status_code == 200
+        assert isinstance(response.data['results'][0]['genre'], list)
+
+
+@pytest.mark.skipif(renderers.orjson is None, reason='orjson not installed')
+@pytest.mark.parametrize('data', [
+    {'results': [{'id': 1, 'name': text, 'rating': None}]}
+    for text in TEXTS
+] + [
+    [1, 2.5, 8.685714285714285, True, False, None, ''],
+    {'date': timezone.now(), 'naive': datetime.datetime(2020, 1, 2, 3, 4)},
+    {1: 'int key', 'nested': {'list': [{'a': []}]}},
+    [1e-7, 1e20, 0.0001, 1e16 - 2, -0.0, 0.0],
+    {'nested': [{'score': 1e-06}], 'big': 2 ** 70},
+])
+def test_renderer_matches_stdlib(data):
+    assert renderers.FastJSONRenderer().render(data) == (
+        JSONRenderer().render(data))
+
+
+@pytest.mark.parametrize('value', [float('nan'), float('inf')])
+def test_renderer_rejects_non_finite_floats(value):
+    for renderer in (renderers.FastJSONRenderer(), JSONRenderer()):
+        with pytest.raises(ValueError):
+            renderer.render({'rating': value})
+
+
+@pytest.mark.django_db
+def test_benchmark_command_leaves_no_data():
+    from io import StringIO
+
+    from django.core.management import call_command
+
+    out = StringIO()
+    call_command('benchmark_read_path', rows=5, repeat=1, stdout=out)
+    assert 'titles:' in out.getvalue()
+    assert 'reviews:' in out.getvalue()
+    assert not Title.objects.exists()
@@ -0,0 +1,134 @@
+import json
+from io import StringIO
+
+import pytest
+from django.core.management import call_command
+from reviews.aggregates import find_inconsistent_titles
+from reviews.generator import (DEFAULT_SHAPE, MODELS, DataGenerator,
+                               generate_database, generate_fixture,
+                               skewed_counts, zipf_rank)
+from reviews.models import Comment, Genre, GenreTitle, Review, Title, User
+
+COUNTS = {
+    'users': 30, 'titles': 20, 'reviews': 200, 'comments': 80,
+    'genres': 6, 'categories': 2,
+}
+
+
+def _quiet(line):
+    pass
+
+
+def _reviews():
+    return list(Review.objects.order_by('pk').values_list(
+        'pk', 'title_id', 'author_id', 'score', 'pub_date', 'text'))
+
+
+@pytest.mark.parametrize('total, size, skew, cap', [
+    (1000, 50, 1.1, 1000),
+    (1000, 50, 1.1, 30),
+    (1000, 50, 0, 30),
+    (7, 50, 2, 30),
+    (5000, 50, 1, 30),
+])
+def test_skewed_counts(total, size, skew, cap):
+    counts = skewed_counts(total, size, skew, cap)
+    assert sum(counts) == min(total, size * cap)
+    assert max(counts) <= cap
+    assert counts == sorted(counts, reverse=True)
+
+
+def test_zipf_rank_is_skewed():
+    import random
+
+    rng = random.Random(0)
+    ranks = [zipf_rank(rng, 100, 1.2) for _ in range(5000)]
+    assert min(ranks) == 0 and max(ranks) < 100
+    assert ranks.count(0) > ranks.count(50) * 10
+
+
+@pytest.mark.django_db
+class TestGenerateDatabase:
+
+    def test_shape(self):
+        generate_database(COUNTS, seed=1, log=_quiet)
+        assert User.objects.count() == COUNTS['users']
+        assert Review.objects.count() == COUNTS['reviews']
+        assert Comment.objects.count() == COUNTS['comments']
+        per_title = sorted(
+            Title.objects.values_list('review_count', flat=True),
+            reverse=True)
+        assert per_title[0] > 5 * per_title[len(per_title) // 2]
+        links = GenreTitle.objects.filter(title=Title.objects.first())
+        assert DEFAULT_SHAPE['min_genres'] <= links.count() <= (
+            DEFAULT_SHAPE['max_genres'])
+        assert set(User.objects.values_list('role', flat=True)) <= {
+            role for role, _ in User.USER_ROLES}
+        assert not list(find_inconsistent_titles())
+        # Sequences continue after generated primary keys.
+        Genre.objects.create(name='Новый', slug='new')
+
+    def test_same_seed_same_data(self):
+        generate_database(COUNTS, seed=2, log=_quiet)
+        first = _reviews()
+        for model in reversed(list(MODELS.values())):
+            model.objects.all().delete()
+        generate_database(COUNTS, seed=2, log=_quiet)
+        assert _reviews() == first
+
+    def test_command(self):
+        out = StringIO()
+        call_command(
+            'generate_data', users=5, titles=3, reviews=9, comments=4,
+            genres=2, categories=1, admins=1, moderators=0, stdout=out)
+        assert 'reviews: 9' in out.getvalue()
+        assert set(User.objects.values_list('role', flat=True)) == {
+            User.ADMIN}
+
+
+@pytest.mark.django_db(transaction=True)
+def test_workers_insert_the_same_rows():
+    generate_database(COUNTS, seed=3, workers=2, log=_quiet)
+    generator = DataGenerator(
+        dict(COUNTS), DEFAULT_SHAPE, seed=3)
+    expected = [
+        (review.pk, review.title_id, review.author_id, review.score,
+         review.pub_date, review.text)
+        for chunk in generator.chunks('reviews')
+        for review in generator.reviews(chunk)
+    ]
+    assert _reviews() == expected
+
+
+def test_fixture_extends_existing_one(tmp_path):
+    base = tmp_path / 'base.json'
+    base.write_text(json.dumps([
+        {'model': 'reviews.genre', 'pk': 7,
+         'fields': {'name': 'Драма', 'slug': 'drama'}},
+        {'model': 'reviews.title', 'pk': 40,
+         'fields': {'name': 'Старое', 'year': 1990, 'description': '',
+                    'category': None}},
+    ]))
+    target = StringIO()
+    counts = dict(COUNTS, genres=0, categories=0)
+    generate_fixture(target, counts, seed=4, extend=str(base), log=_quiet)
+    items = json.loads(target.getvalue())
+    assert items[0]['pk'] == 7
+    titles = [item for item in items if item['model'] == 'reviews.title']
+    assert [item['pk'] for item in titles][:2] == [40, 41]
+    links = [item for item in items if item['model'] == 'reviews.genretitle']
+    assert {item['fields']['genre'] for item in links} == {7}
+    assert len([
+        item for item in items if item['model'] == 'reviews.review'
+    ]) == COUNTS['reviews']
+
+
+@pytest.mark.django_db
+def test_fixture_loads(tmp_path):
+    path = tmp_path / 'generated.json'
+    with open(path, 'w', encoding='utf-8') as target:
+        generate_fixture(target, COUNTS, seed=5, log=_quiet)
+    call_command('loaddata', str(path), verbosity=0)
+    call_command('rebuild_ratings', stdout=StringIO())
+    assert Review.objects.count() == COUNTS['reviews']
+    assert not list(find_inconsistent_titles())
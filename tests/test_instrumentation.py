@@ -0,0 +1,114 @@
+import importlib
+import json
+import logging
+import time
+
+import pytest
+from reviews.models import Category, Review, Title
+
+
+@pytest.fixture
+def title():
+    return Title.objects.create(
+        name='Сталкер', year=1979,
+        category=Category.objects.create(name='Фильм', slug='film'))
+
+
+def _metrics(header):
+    metrics = {}
+    for part in header.split(', '):
+        name, *params = part.split(';')
+        metrics[name] = dict(param.split('=', 1) for param in params)
+    return metrics
+
+
+@pytest.fixture
+def instrumentation(settings):
+    settings.INSTRUMENTATION = {
+        'enabled': True, 'sample_rate': 0, 'slow_ms': 10 ** 6}
+    return settings.INSTRUMENTATION
+
+
+@pytest.mark.django_db
+class TestInstrumentation:
+
+    def test_server_timing_for_admins(
+        self, instrumentation, title, admin_client,
+        django_assert_num_queries
+    ):
+        with django_assert_num_queries(5) as context:
+            response = admin_client.get('/api/v1/titles/')
+        metrics = _metrics(response['Server-Timing'])
+        assert list(metrics) == [
+            'db', 'view', 'serialize', 'render', 'total']
+        assert metrics['db']['desc'] == f'"{len(context)} queries"'
+        assert metrics['view']['desc'] == '"TitleViewSet.list"'
+        assert float(metrics['total']['dur']) >= float(
+            metrics['db']['dur'])
+
+        response = admin_client.get(f'/api/v1/titles/{title.pk}/')
+        assert 'TitleViewSet.retrieve' in response['Server-Timing']
+        response = admin_client.get('/api/v1/titles/leaderboard/')
+        assert 'TitleViewSet.leaderboard' in response['Server-Timing']
+
+    @pytest.mark.parametrize('url, target', [
+        ('/api/v1/titles/', 'core.fast_read.RowPlan.build'),
+        ('/api/v1/titles/{pk}/',
+         'api.serializers.TitleDetailSerializer.to_representation'),
+        ('/api/v1/titles/leaderboard/',
+         'api.serializers.LeaderboardSerializer.to_representation'),
+    ])
+    def test_serialization_is_not_view_time(
+        self, instrumentation, title, admin, admin_client, monkeypatch, url,
+        target
+    ):
+        # The leaderboard lists reviewed titles only.
+        Review.objects.create(
+            title=title, author=admin, text='text', score=5)
+        module, name, method = target.rsplit('.', 2)
+        cls = getattr(importlib.import_module(module), name)
+        original = getattr(cls, method)
+
+        def slow(*args):
+            time.sleep(0.05)
+            return original(*args)
+
+        monkeypatch.setattr(cls, method, slow)
+        response = admin_client.get(url.format(pk=title.pk))
+        metrics = _metrics(response['Server-Timing'])
+        assert float(metrics['serialize']['dur']) >= 50
+        assert float(metrics['view']['dur']) < 50
+
+    def test_hidden_from_others(
+        self, instrumentation, title, user_client, guest_client
+    ):
+        assert 'Server-Timing' not in user_client.get('/api/v1/titles/')
+        assert 'Server-Timing' not in guest_client.get('/api/v1/titles/')
+
+    def test_disabled(self, instrumentation, admin_client, caplog):
+        instrumentation.update(enabled=False, sample_rate=1)
+        with caplog.at_level(logging.INFO, 'core.instrumentation'):
+            response = admin_client.get('/api/v1/genres/')
+        assert 'Server-Timing' not in response
+        assert not caplog.records
+
+    def test_sampled_log(self, instrumentation, title, guest_client, caplog):
+        with caplog.at_level(logging.INFO, 'core.instrumentation'):
+            guest_client.get('/api/v1/titles/')
+            assert not caplog.records
+            instrumentation['sample_rate'] = 1
+            guest_client.get(f'/api/v1/titles/{title.pk}/reviews/')
+        record = json.loads(caplog.records[0].getMessage())
+        assert record['action'] == 'ReviewsViewSet.list'
+        assert record['status'] == 200
+        assert record['queries'] > 0
+        assert set(record) >= {
+            'db_ms', 'view_ms', 'serialize_ms', 'render_ms', 'total_ms'}
+
+    def test_slow_requests_are_logged(
+        self, instrumentation, guest_client, caplog
+    ):
+        instrumentation['slow_ms'] = 0
+        with caplog.at_level(logging.INFO, 'core.instrumentation'):
+            guest_client.get('/api/v1/categories/')
+        assert len(caplog.records) == 1
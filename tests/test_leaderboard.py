@@ -0,0 +1,93 @@
+import pytest
+from core.cache import get_versions
+from django.core.management import call_command
+from reviews.models import Category, Genre, RatingPrior, Review, Title
+
+
+@pytest.fixture
+def catalogue(django_user_model):
+    film = Category.objects.create(name='Фильм', slug='film')
+    book = Category.objects.create(name='Книга', slug='book')
+    drama = Genre.objects.create(name='Драма', slug='drama')
+    authors = [
+        django_user_model.objects.create_user(
+            username=f'critic{i}', email=f'critic{i}@yamdb.fake')
+        for i in range(20)
+    ]
+    titles = {
+        'one_hit': Title.objects.create(name='One hit', year=2000,
+                                        category=film),
+        'classic': Title.objects.create(name='Classic', year=1950,
+                                        category=film),
+        'novel': Title.objects.create(name='Novel', year=1900,
+                                      category=book),
+        'unrated': Title.objects.create(name='Unrated', year=2020,
+                                        category=film),
+    }
+    titles['novel'].genre.set([drama])
+    Review.objects.create(
+        title=titles['one_hit'], author=authors[0], text='text', score=10)
+    for author in authors:
+        Review.objects.create(
+            title=titles['classic'], author=author, text='text', score=9)
+    for author in authors[:5]:
+        Review.objects.create(
+            title=titles['novel'], author=author, text='text', score=4)
+    call_command('rebuild_leaderboard')
+    return titles
+
+
+def _names(response):
+    assert response.status_code == 200
+    return [title['name'] for title in response.json()]
+
+
+@pytest.mark.django_db
+class TestLeaderboard:
+
+    def test_prior_outweighs_single_review(self, catalogue, guest_client):
+        response = guest_client.get('/api/v1/titles/leaderboard/')
+        assert _names(response) == ['Classic', 'One hit', 'Novel']
+        top = response.json()[0]
+        assert top['review_count'] == 20
+        mean = RatingPrior.objects.get().mean
+        assert top['weighted_rating'] == pytest.approx(
+            (20 * 9 + 10 * mean) / 30)
+
+    def test_filters_and_limit(self, catalogue, guest_client):
+        url = '/api/v1/titles/leaderboard/'
+        assert _names(guest_client.get(f'{url}?category=book')) == ['Novel']
+        assert _names(guest_client.get(f'{url}?genre=drama')) == ['Novel']
+        assert _names(guest_client.get(f'{url}?limit=1')) == ['Classic']
+        for limit in ('0', '101', 'many'):
+            response = guest_client.get(f'{url}?limit={limit}')
+            assert response.status_code == 400
+
+    def test_updated_as_reviews_arrive(
+        self, catalogue, django_user_model, guest_client
+    ):
+        one_hit = catalogue['one_hit']
+        for i in range(40):
+            author = django_user_model.objects.create_user(
+                username=f'fan{i}', email=f'fan{i}@yamdb.fake')
+            Review.objects.create(
+                title=one_hit, author=author, text='text', score=10)
+        response = guest_client.get('/api/v1/titles/leaderboard/?limit=1')
+        assert _names(response) == ['One hit']
+
+    def test_single_query_page(
+        self, catalogue, guest_client, django_assert_num_queries
+    ):
+        # titles with category, genres prefetch
+        with django_assert_num_queries(2):
+            guest_client.get('/api/v1/titles/leaderboard/')
+
+
+@pytest.mark.django_db
+def test_rebuild_bumps_versions():
+    resources = ('titles', 'reviews')
+    versions = get_versions(resources)
+    call_command('rebuild_leaderboard')
+    assert all(
+        before != after for before, after in
+        zip(versions, get_versions(resources)))
@@ -0,0 +1,77 @@
+import os
+import subprocess
+import sys
+
+import pytest
+from core.metrics import MULTIPROCESS_ENV, get_registry
+from django.conf import settings
+from prometheus_client import REGISTRY
+from reviews.models import Category, Title
+
+
+def _value(name, **labels):
+    return REGISTRY.get_sample_value(name, labels) or 0
+
+
+@pytest.mark.django_db
+class TestMetrics:
+
+    def test_requests_by_route(self, guest_client):
+        Title.objects.create(
+            name='Сталкер', year=1979,
+            category=Category.objects.create(name='Фильм', slug='film'))
+        labels = {'route': 'title-list', 'method': 'GET'}
+        requests = _value(
+            'yamdb_requests_total', status='200', **labels)
+        latency = _value('yamdb_request_duration_seconds_count', **labels)
+        queries = _value(
+            'yamdb_request_queries_count', route='title-list')
+        hits = _value('yamdb_response_cache_total', result='hit')
+
+        guest_client.get('/api/v1/titles/')
+        guest_client.get('/api/v1/titles/')
+        guest_client.get('/api/v1/missing/')
+
+        assert _value(
+            'yamdb_requests_total', status='200', **labels) == requests + 2
+        assert _value(
+            'yamdb_request_duration_seconds_count', **labels) == latency + 2
+        assert _value(
+            'yamdb_request_queries_count', route='title-list') == (
+            queries + 2)
+        assert _value('yamdb_response_cache_total', result='hit') == hits + 1
+        assert _value(
+            'yamdb_requests_total', route='unmatched', method='GET',
+            status='404') >= 1
+
+    def test_auth_endpoints(self, guest_client):
+        before = _value(
+            'yamdb_auth_requests_total', endpoint='signup', status='400')
+        guest_client.post('/api/v1/auth/signup/', {})
+        assert _value(
+            'yamdb_auth_requests_total', endpoint='signup', status='400'
+        ) == before + 1
+
+    def test_metrics_endpoint(self, client):
+        response = client.get('/metrics')
+        assert response.status_code == 200
+        assert response['Content-Type'].startswith('text/plain')
+        assert b'yamdb_requests_total' in response.content
+
+
+def test_workers_are_summed_up(tmp_path, monkeypatch):
+    code = (
+        'import django; django.setup(); '
+        'from core.metrics import REQUESTS; '
+        "REQUESTS.labels('title-list', 'GET', 200).inc(3)"
+    )
+    env = dict(
+        os.environ, DJANGO_SETTINGS_MODULE='api_yamdb.settings',
+        **{MULTIPROCESS_ENV: str(tmp_path)})
+    for _ in range(2):
+        subprocess.run(
+            [sys.executable, '-c', code], env=env, check=True,
+            cwd=settings.BASE_DIR)
+    monkeypatch.setenv(MULTIPROCESS_ENV, str(tmp_path))
+    assert get_registry().get_sample_value('yamdb_requests_total', {
+        'route': 'title-list', 'method': 'GET', 'status': '200'}) == 6
@@ -0,0 +1,69 @@
+import pytest
+from django.core import mail
+from django.core.mail.backends.locmem import EmailBackend
+from django.core.management import call_command
+from django.utils import timezone
+from reviews.models import OutgoingEmail
+from reviews.outbox import drain_outbox, queue_email
+
+
+class FlakyBackend(EmailBackend):
+    """Rejects every address at fail.fake."""
+
+    def send_messages(self, messages):
+        for message in messages:
+            if message.to[0].endswith('@fail.fake'):
+                raise ConnectionError('relay is down')
+        return super().send_messages(messages)
+
+
+@pytest.fixture(autouse=True)
+def email_backend(settings):
+    settings.EMAIL_BACKEND = 'tests.test_outbox.FlakyBackend'
+
+
+@pytest.mark.django_db
+class TestOutbox:
+
+    def test_signup_queues_email(self, guest_client):
+        response = guest_client.post(
+            '/api/v1/auth/signup/',
+            {'username': 'newbie', 'email': 'newbie@yamdb.fake'})
+        assert response.status_code == 200
+        assert mail.outbox == []
+        email = OutgoingEmail.objects.get()
+        assert email.status == OutgoingEmail.PENDING
+
+        call_command('send_emails')
+        assert len(mail.outbox) == 1
+        assert mail.outbox[0].to == ['newbie@yamdb.fake']
+        email.refresh_from_db()
+        assert email.status == OutgoingEmail.SENT
+
+    def test_retry_with_backoff(self, settings):
+        settings.EMAIL_OUTBOX = dict(settings.EMAIL_OUTBOX, max_attempts=2)
+        email = queue_email('subject', 'body', 'from@yamdb.fake', 'x@fail.fake')
+        queue_email('subject', 'body', 'from@yamdb.fake', 'ok@yamdb.fake')
+
+        assert drain_outbox(batch_size=10, workers=2) == (1, 1)
+        email.refresh_from_db()
+        assert (email.status, email.attempts) == (OutgoingEmail.PENDING, 1)
+        assert email.next_attempt_at > timezone.now()
+        assert 'relay is down' in email.last_error
+
+        OutgoingEmail.objects.filter(pk=email.pk).update(
+            next_attempt_at=timezone.now())
+        assert drain_outbox(batch_size=10, workers=2) == (0, 1)
+        email.refresh_from_db()
+        assert (email.status, email.attempts) == (OutgoingEmail.FAILED, 2)
+
+    def test_signup_burst(self, guest_client):
+        for i in range(50):
+            response = guest_client.post(
+                '/api/v1/auth/signup/',
+                {'username': f'user{i}', 'email': f'user{i}@yamdb.fake'})
+            assert response.status_code == 200
+        assert drain_outbox(batch_size=20, workers=4) == (50, 0)
+        assert len(mail.outbox) == 50
+        assert not OutgoingEmail.objects.exclude(
+            status=OutgoingEmail.SENT).exists()
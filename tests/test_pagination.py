@@ -0,0 +1,101 @@
+import pytest
+from django.db import connection
+from django.utils import timezone
+from reviews.models import Review, Title
+
+
+@pytest.fixture
+def reviews(django_user_model):
+    title = Title.objects.create(name='Title', year=2000)
+    for i in range(12):
+        author = django_user_model.objects.create_user(
+            username=f'author{i}', email=f'author{i}@yamdb.fake')
+        Review.objects.create(
+            title=title, author=author, text='text', score=5)
+    # Ties on pub_date must be broken by id.
+    Review.objects.filter(id__in=Review.objects.values('id')[:6]).update(
+        pub_date=timezone.now())
+    return list(Review.objects.order_by('-pub_date', '-id'))
+
+
+def _ids(response):
+    return [review['id'] for review in response.json()['results']]
+
+
+@pytest.mark.django_db
+class TestCursorPagination:
+
+    def test_walk_forward_and_back(self, reviews, guest_client):
+        title_id = reviews[0].title_id
+        url = f'/api/v1/titles/{title_id}/reviews/?pagination=cursor'
+        seen, pages = [], []
+        while url:
+            response = guest_client.get(url)
+            assert response.status_code == 200
+            assert 'count' not in response.json()
+            pages.append(_ids(response))
+            seen.extend(pages[-1])
+            url = response.json()['next']
+        assert seen == [review.id for review in reviews]
+
+        url = response.json()['previous']
+        for expected in reversed(pages[:-1]):
+            response = guest_client.get(url)
+            assert _ids(response) == expected
+            url = response.json()['previous']
+        assert url is None
+
+    def test_page_number_mode_is_default(self, reviews, guest_client):
+        response = guest_client.get(
+            f'/api/v1/titles/{reviews[0].title_id}/reviews/?page=2')
+        assert response.json()['count'] == len(reviews)
+        assert _ids(response) == [review.id for review in reviews[5:10]]
+
+    def test_invalid_cursor(self, reviews, guest_client):
+        response = guest_client.get(
+            f'/api/v1/titles/{reviews[0].title_id}/reviews/?cursor=broken')
+        assert response.status_code == 404
+
+
+@pytest.mark.django_db
+class TestCachedCount:
+
+    def test_count_is_cached_until_write(
+        self, reviews, user, user_client, guest_client,
+        django_assert_num_queries
+    ):
+        url = f'/api/v1/titles/{reviews[0].title_id}/reviews/'
+        response = guest_client.get(url)
+        assert response.json()['count'] == 12
+        assert response.json()['count_is_exact'] is True
+        # title lookup and page, the count of the filter set is cached
+        with django_assert_num_queries(2):
+            response = guest_client.get(f'{url}?page=2&ordering=-id')
+        assert response.json()['count'] == 12
+
+        user_client.post(url, {'text': 'Новый', 'score': 7})
+        assert guest_client.get(url).json()['count'] == 13
+        Review.objects.filter(author=user).delete()
+        assert guest_client.get(url).json()['count'] == 12
+
+    def test_filter_sets_are_counted_apart(self, guest_client):
+        for year in (1990, 1990, 2000):
+            Title.objects.create(name=f'Title {year}', year=year)
+        response = guest_client.get('/api/v1/titles/?year=1990')
+        assert response.json()['count'] == 2
+        assert guest_client.get('/api/v1/titles/').json()['count'] == 3
+
+    def test_estimate_for_large_tables(self, admin, admin_client, settings):
+        if connection.vendor != 'postgresql':
+            pytest.skip('Planner estimates are read from PostgreSQL')
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE reviews_user, reviews_title')
+        settings.COUNT_CACHE = dict(
+            settings.COUNT_CACHE, estimate_threshold=0)
+        data = admin_client.get('/api/v1/users/').json()
+        assert data['count_is_exact'] is False
+        assert isinstance(data['count'], int)
+        data = admin_client.get('/api/v1/users/?search=boss').json()
+        assert data == dict(data, count=1, count_is_exact=True)
+        data = admin_client.get('/api/v1/titles/').json()
+        assert data['count_is_exact'] is False
@@ -0,0 +1,120 @@
+import pytest
+from reviews.models import Category, Comment, Genre, Review, Title
+
+OBJECTS_COUNTS = (1, 12)
+
+
+@pytest.fixture
+def make_catalogue(django_user_model):
+    def make(count):
+        genres = [
+            Genre.objects.create(name=f'Genre {i}', slug=f'genre-{i}')
+            for i in range(3)
+        ]
+        authors = [
+            django_user_model.objects.create_user(
+                username=f'author{i}', email=f'author{i}@yamdb.fake')
+            for i in range(count)
+        ]
+        titles = []
+        for i in range(count):
+            category = Category.objects.create(
+                name=f'Category {i}', slug=f'category-{i}')
+            title = Title.objects.create(
+                name=f'Title {i}', year=2000, category=category)
+            title.genre.set(genres)
+            titles.append(title)
+        title = titles[0]
+        reviews = [
+            Review.objects.create(
+                title=title, author=author, text='text', score=5)
+            for author in authors
+        ]
+        for author in authors:
+            Comment.objects.create(
+                review=reviews[0], author=author, text='text')
+        return title, reviews[0]
+    return make
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('count', OBJECTS_COUNTS)
+class TestQueryCount:
+
+    def test_titles_list(
+        self, count, make_catalogue, guest_client, django_assert_num_queries
+    ):
+        make_catalogue(count)
+        # table size, count, page with category, genres prefetch
+        with django_assert_num_queries(4):
+            response = guest_client.get('/api/v1/titles/')
+        assert response.status_code == 200
+
+    def test_title_detail(
+        self, count, make_catalogue, guest_client, django_assert_num_queries
+    ):
+        title, _ = make_catalogue(count)
+        # etag state, title with category, genres prefetch
+        with django_assert_num_queries(3):
+            response = guest_client.get(f'/api/v1/titles/{title.id}/')
+        assert response.status_code == 200
+
+    def test_reviews_list(
+        self, count, make_catalogue, guest_client, django_assert_num_queries
+    ):
+        title, _ = make_catalogue(count)
+        # title lookup, count, page with authors
+        with django_assert_num_queries(3):
+            response = guest_client.get(f'/api/v1/titles/{title.id}/reviews/')
+        assert response.status_code == 200
+
+    def test_reviews_cursor_page(
+        self, count, make_catalogue, guest_client, django_assert_num_queries
+    ):
+        title, _ = make_catalogue(count)
+        # title lookup, page with authors, no count
+        with django_assert_num_queries(2):
+            response = guest_client.get(
+                f'/api/v1/titles/{title.id}/reviews/?pagination=cursor')
+        assert response.status_code == 200
+
+    def test_comments_list(
+        self, count, make_catalogue, guest_client, django_assert_num_queries
+    ):
+        title, review = make_catalogue(count)
+        # review lookup, count, page with authors
+        with django_assert_num_queries(3):
+            response = guest_client.get(
+                f'/api/v1/titles/{title.id}/reviews/{review.id}/comments/')
+        assert response.status_code == 200
+
+
+@pytest.mark.django_db
+class TestNestedParents:
+
+    def test_review_create_fetches_title_once(
+        self, make_catalogue, user_client, django_assert_num_queries
+    ):
+        title, _ = make_catalogue(1)
+        user_client.get('/api/v1/categories/')
+        url = f'/api/v1/titles/{title.id}/reviews/'
+        # title, uniqueness check, insert, rating and author counter
+        # updates in a savepoint
+        with django_assert_num_queries(7) as context:
+            response = user_client.post(url, {'text': 'text', 'score': 7})
+        assert response.status_code == 201
+        title_selects = [
+            query for query in context.captured_queries
+            if query['sql'].startswith('SELECT')
+            and 'FROM "reviews_title"' in query['sql']
+        ]
+        assert len(title_selects) == 1
+
+    def test_comment_of_other_title(self, make_catalogue, user_client):
+        title, review = make_catalogue(1)
+        other = Title.objects.create(name='Other', year=2000)
+        url = f'/api/v1/titles/{other.id}/reviews/{review.id}/comments/'
+        assert user_client.get(url).status_code == 404
+        assert user_client.post(url, {'text': 'text'}).status_code == 404
+        url = f'/api/v1/titles/{title.id}/reviews/{review.id}/comments/'
+        assert user_client.post(url, {'text': 'text'}).status_code == 201
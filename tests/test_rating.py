@@ -0,0 +1,162 @@
+import threading
+from datetime import timedelta
+
+import pytest
+from core.cache import get_versions
+from django.core.management import CommandError, call_command
+from django.db import connection, transaction
+from django.utils import timezone
+from reviews.aggregates import find_inconsistent_titles
+from reviews.models import Category, Review, Title
+
+
+@pytest.fixture
+def title():
+    category = Category.objects.create(name='Фильм', slug='film')
+    return Title.objects.create(name='Title', year=2000, category=category)
+
+
+def _stored(title):
+    title.refresh_from_db()
+    return title.score_sum, title.review_count, title.rating
+
+
+@pytest.mark.django_db(transaction=True)
+class TestStoredRating:
+
+    def test_review_create_update_delete(self, title, user, admin):
+        review = Review.objects.create(
+            title=title, author=user, text='text', score=4)
+        Review.objects.create(title=title, author=admin, text='text', score=9)
+        assert _stored(title) == (13, 2, 6)
+
+        review.score = 10
+        review.save()
+        assert _stored(title) == (19, 2, 9)
+
+        review.delete()
+        assert _stored(title) == (9, 1, 9)
+
+    def test_author_cascade(self, title, user):
+        Review.objects.create(title=title, author=user, text='text', score=7)
+        user.delete()
+        assert _stored(title) == (0, 0, None)
+
+    def test_title_cascade(self, title, user):
+        Review.objects.create(title=title, author=user, text='text', score=7)
+        title.delete()
+        assert not Review.objects.exists()
+
+    def test_concurrent_rescores(self, title, user):
+        if connection.vendor != 'postgresql':
+            pytest.skip('Concurrent writers need PostgreSQL')
+        review = Review.objects.create(
+            title=title, author=user, text='text', score=4)
+
+        def rescore():
+            stale = Review.objects.get(pk=review.pk)
+            stale.score = 7
+            stale.save()
+            connection.close()
+
+        with transaction.atomic():
+            review.score = 10
+            review.save()
+            thread = threading.Thread(target=rescore)
+            thread.start()
+            # Lets the other save read the state before this one commits.
+            thread.join(0.5)
+        thread.join()
+        assert _stored(title) == (7, 1, 7)
+        assert _histogram(title) == {7: 1}
+
+    def test_rebuild_command(self, title, user):
+        Review.objects.create(title=title, author=user, text='text', score=7)
+        Title.objects.update(score_sum=0, review_count=0, rating=None)
+        assert list(find_inconsistent_titles())
+
+        call_command('rebuild_ratings')
+        assert _stored(title) == (7, 1, 7)
+        call_command('rebuild_ratings', '--check')
+
+    def test_rebuild_touches_stale_titles(self, title, user):
+        fresh = Title.objects.create(name='Fresh', year=2001)
+        Review.objects.create(title=title, author=user, text='text', score=7)
+        Review.objects.create(title=fresh, author=user, text='text', score=3)
+        past = timezone.now() - timedelta(days=1)
+        Title.objects.update(modified=past)
+        Title.objects.filter(pk=title.pk).update(score_sum=0)
+        resources = ('titles', 'reviews')
+        versions = get_versions(resources)
+
+        call_command('rebuild_ratings')
+        title.refresh_from_db()
+        fresh.refresh_from_db()
+        assert title.modified > past
+        assert fresh.modified == past
+        assert all(
+            before != after for before, after in
+            zip(versions, get_versions(resources)))
+
+    def test_api_reads_stored_rating(self, title, user, guest_client):
+        Review.objects.create(title=title, author=user, text='text', score=7)
+        response = guest_client.get(f'/api/v1/titles/{title.id}/')
+        assert response.status_code == 200
+        assert response.json()['rating'] == 7
+        assert 'score_sum' not in response.json()
+
+
+def _histogram(title):
+    title.refresh_from_db()
+    return {score: count for score, count in
+            title.score_distribution.items() if count}
+
+
+@pytest.mark.django_db(transaction=True)
+class TestScoreHistogram:
+
+    def test_review_create_update_delete(self, title, user, admin):
+        review = Review.objects.create(
+            title=title, author=user, text='text', score=4)
+        Review.objects.create(title=title, author=admin, text='text', score=9)
+        assert _histogram(title) == {4: 1, 9: 1}
+
+        review.score = 9
+        review.save()
+        assert _histogram(title) == {9: 2}
+
+        review.text = 'edited'
+        review.save()
+        assert _histogram(title) == {9: 2}
+
+        review.delete()
+        assert _histogram(title) == {9: 1}
+
+    def test_review_moved_to_other_title(self, title, user):
+        other = Title.objects.create(name='Other', year=2001)
+        review = Review.objects.create(
+            title=title, author=user, text='text', score=3)
+        review.title = other
+        review.save()
+        assert _histogram(title) == {}
+        assert _histogram(other) == {3: 1}
+
+    def test_rebuild_and_check(self, title, user):
+        Review.objects.create(title=title, author=user, text='text', score=2)
+        Title.objects.update(score_2=0, score_5=4)
+        with pytest.raises(CommandError):
+            call_command('rebuild_ratings', '--check')
+
+        call_command('rebuild_ratings')
+        assert _histogram(title) == {2: 1}
+        call_command('rebuild_ratings', '--check')
+
+    def test_api_detail(self, title, user, guest_client):
+        Review.objects.create(title=title, author=user, text='text', score=8)
+        data = guest_client.get(f'/api/v1/titles/{title.id}/').json()
+        assert data['score_distribution'] == {
+            str(score): int(score == 8) for score in range(1, 11)}
+        assert 'score_8' not in data
+        listed = guest_client.get('/api/v1/titles/').json()['results'][0]
+        assert 'score_distribution' not in listed
+        assert 'score_8' not in listed
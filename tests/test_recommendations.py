@@ -0,0 +1,120 @@
+import random
+
+import numpy as np
+import pytest
+from django.core.management import CommandError, call_command
+from reviews.models import Category, Recommendation, Review, Title, User
+from reviews.recommendations import Factors, ScoreMatrix, row_batches
+
+
+@pytest.fixture
+def reviews(user):
+    """Two groups of readers, each liking the titles of its own half."""
+
+    rng = random.Random(3)
+    category = Category.objects.create(name='Фильм', slug='film')
+    titles = [
+        Title.objects.create(name=f'title{index}', year=2000,
+                             category=category)
+        for index in range(12)]
+    readers = [user] + [
+        User.objects.create_user(
+            username=f'reader{index}', email=f'reader{index}@yamdb.fake')
+        for index in range(15)]
+    for number, reader in enumerate(readers):
+        liked = titles[:6] if number % 2 == 0 else titles[6:]
+        if reader == user:
+            reviewed = titles[1:6] + titles[7:]
+        else:
+            reviewed = rng.sample(titles, 8)
+        for title in reviewed:
+            Review.objects.create(
+                title=title, author=reader, text='text',
+                score=rng.randint(8, 10) if title in liked
+                else rng.randint(1, 3))
+    return titles
+
+
+def _recommended(user):
+    return list(Recommendation.objects.filter(user=user).order_by(
+        'rank').values_list('title', flat=True))
+
+
+@pytest.mark.django_db
+class TestRecommendations:
+
+    def test_unreviewed_titles_are_stored(self, reviews, user):
+        call_command('train_recommendations', '--top-n', '3', '--factors',
+                     '4')
+        reviewed = set(Review.objects.filter(author=user).values_list(
+            'title', flat=True))
+        recommended = _recommended(user)
+        assert not reviewed & set(recommended)
+        # Of two unreviewed titles the one liked by the user's group wins.
+        assert recommended == [reviews[0].id, reviews[6].id]
+        assert Recommendation.objects.values('user').distinct().count() == 16
+
+    def test_endpoint(self, reviews, user, user_client, guest_client,
+                      django_assert_num_queries):
+        call_command('train_recommendations', '--top-n', '3')
+        url = '/api/v1/users/me/recommendations/'
+        assert guest_client.get(url).status_code == 401
+        # user, recommendations with titles and categories, genres
+        with django_assert_num_queries(3):
+            response = user_client.get(url)
+        assert response.status_code == 200
+        data = response.json()
+        assert [title['id'] for title in data] == _recommended(user)
+        assert all(1 <= title['predicted_score'] <= 10 for title in data)
+
+        Review.objects.create(
+            title_id=data[0]['id'], author=user, text='text', score=5)
+        assert data[0]['id'] not in [
+            title['id'] for title in user_client.get(url).json()]
+
+
+@pytest.mark.django_db
+def test_holdout(reviews):
+    call_command('train_recommendations', '--holdout', '0.2')
+    assert Recommendation.objects.exists()
+
+
+@pytest.mark.parametrize('arguments', [
+    ('--factors', '0'), ('--iterations', '0'), ('--workers', '0'),
+    ('--top-n', '0'), ('--top-n', '32768'), ('--regularization', '0'),
+    ('--holdout', '1'),
+])
+def test_invalid_arguments(arguments):
+    with pytest.raises(CommandError):
+        call_command('train_recommendations', *arguments)
+
+
+def test_fit_lowers_error():
+    rng = np.random.default_rng(0)
+    users = rng.normal(size=(200, 3))
+    titles = rng.normal(size=(50, 3))
+    authors, items = np.nonzero(rng.random((200, 50)) < 0.3)
+    scores = np.clip(np.rint(
+        5.5 + np.einsum('ij,ij->i', users[authors], titles[items])), 1, 10)
+    matrix = ScoreMatrix(
+        authors.astype(np.int32) + 1, items.astype(np.int32) + 1,
+        scores.astype(np.int8))
+    errors = []
+    Factors(matrix, 3).fit(
+        5, 0.05, 100,
+        log=lambda iteration, train, holdout: errors.append(train))
+    assert errors == sorted(errors, reverse=True)
+    assert errors[-1] < 0.6
+
+
+def test_row_batches():
+    indptr = np.array([0, 2, 3, 10, 11, 12])
+    assert row_batches(indptr, 3) == [(0, 2), (2, 3), (3, 5)]
+
+
+@pytest.mark.django_db(transaction=True)
+def test_train_in_parallel(reviews, user):
+    call_command('train_recommendations', '--top-n', '3', '--workers', '2')
+    parallel = _recommended(user)
+    call_command('train_recommendations', '--top-n', '3')
+    assert _recommended(user) == parallel
@@ -0,0 +1,129 @@
+import os
+import subprocess
+import sys
+import textwrap
+
+from core.replicas import ReplicaRouter, _state
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+from reviews.models import Title
+
+# Runs against a primary and a replica SQLite file; the replica is a
+# copy of the primary taken before the last title was created.
+SETUP = textwrap.dedent('''
+    import os
+    import shutil
+    import time
+
+    import django
+
+    django.setup()
+
+    from django.core.management import call_command
+    from django.db import connections
+    from django.test import Client
+    from django.test.utils import setup_test_environment
+    from rest_framework_simplejwt.tokens import RefreshToken
+    from reviews.models import Category, Title, User
+
+    setup_test_environment()
+    call_command('migrate', verbosity=0)
+    admin = User.objects.create_user(
+        username='boss', email='boss@yamdb.fake', role='admin')
+    Category.objects.create(name='Фильм', slug='film')
+    Title.objects.create(name='Старое', year=1990)
+    shutil.copy(os.environ['DB_NAME'], os.environ['DB_REPLICAS'])
+    Title.objects.create(name='Не реплицировано', year=2000)
+
+    def count(client):
+        return client.get('/api/v1/titles/').json()['count']
+
+    def create_title(client):
+        token = RefreshToken.for_user(admin).access_token
+        response = client.post(
+            '/api/v1/titles/',
+            {'name': 'Новое', 'year': 2020, 'category': 'film', 'genre': []},
+            content_type='application/json',
+            HTTP_AUTHORIZATION=f'Bearer {token}')
+        assert response.status_code == 201, response.content
+        return response
+''')
+
+SCRIPT = SETUP + textwrap.dedent('''
+    client = Client()
+    assert count(client) == 1, 'reads go to the replica'
+
+    response = create_title(client)
+    assert 'primary_until' in response.cookies
+    assert count(client) == 3, 'own writes are read from the primary'
+    assert count(Client()) == 1, 'other clients still read the replica'
+
+    # The test client keeps connections open between requests.
+    connections.close_all()
+    os.remove(os.environ['DB_REPLICAS'])
+    os.rmdir(os.path.dirname(os.environ['DB_REPLICAS']))
+    assert count(Client()) == 3, 'a broken replica falls back to primary'
+    print('ok')
+''')
+
+# The response cache is on and the replica lags behind the primary.
+CACHED_SCRIPT = SETUP + textwrap.dedent('''
+    from django.conf import settings
+    from django.core.cache import cache
+
+    settings.REPLICAS['lag_seconds'] = 1
+    # Forgets the versions bumped while the data was set up.
+    cache.clear()
+    assert count(Client()) == 1, 'reads go to the replica'
+    create_title(Client())
+    response = Client().get('/api/v1/titles/')
+    assert response['X-Cache'] == 'MISS'
+    assert response.json()['count'] == 3, 'new versions read the primary'
+    etag = response['ETag']
+
+    time.sleep(1.5)
+    response = Client().get('/api/v1/titles/')
+    assert response['X-Cache'] == 'HIT'
+    assert response.json()['count'] == 3, 'no replica rows under new version'
+    response = Client().get('/api/v1/titles/', HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == 304
+    print('ok')
+''')
+
+
+def _run(tmp_path, script, **env):
+    (tmp_path / 'replica').mkdir()
+    env = dict(
+        os.environ,
+        DJANGO_SETTINGS_MODULE='api_yamdb.settings',
+        DB_ENGINE='django.db.backends.sqlite3',
+        DB_NAME=str(tmp_path / 'primary.sqlite3'),
+        DB_REPLICAS=str(tmp_path / 'replica' / 'replica.sqlite3'),
+        **env,
+    )
+    result = subprocess.run(
+        [sys.executable, '-c', script], env=env, cwd=settings.BASE_DIR,
+        stdout=subprocess.PIPE, stderr=subprocess.STDOUT, timeout=300)
+    assert result.returncode == 0, result.stdout.decode()
+
+
+def test_reads_writes_and_fallback(tmp_path):
+    _run(
+        tmp_path, SCRIPT,
+        CACHE_BACKEND='django.core.cache.backends.dummy.DummyCache')
+
+
+def test_cache_skips_lagging_replica(tmp_path):
+    _run(
+        tmp_path, CACHED_SCRIPT,
+        CACHE_BACKEND='django.core.cache.backends.locmem.LocMemCache',
+        RESPONSE_CACHE_ALLOW_LOCAL='true')
+
+
+def test_router_without_request_uses_primary():
+    router = ReplicaRouter()
+    assert router.db_for_read(Title) == DEFAULT_DB_ALIAS
+    assert router.db_for_write(Title) == DEFAULT_DB_ALIAS
+    assert router.allow_migrate(DEFAULT_DB_ALIAS, 'reviews')
+    assert not router.allow_migrate('replica_1', 'reviews')
+    assert not getattr(_state, 'read_alias', None)
@@ -0,0 +1,65 @@
+import pytest
+from django.core.management import call_command
+from django.db import connection
+from reviews.models import Title, TitleSearchToken
+
+
+@pytest.fixture(params=['postgres', 'inverted'])
+def search_backend(request, settings):
+    if request.param == 'postgres' and connection.vendor != 'postgresql':
+        pytest.skip('The postgres backend needs PostgreSQL')
+    settings.TITLE_SEARCH = {'backend': request.param}
+    return request.param
+
+
+@pytest.fixture
+def titles(search_backend):
+    return [
+        Title.objects.create(
+            name='Большой Лебовски', year=1998,
+            description='Комедия братьев Коэн про чувака'),
+        Title.objects.create(
+            name='Фарго', year=1996,
+            description='Криминальная драма братьев Коэн'),
+        Title.objects.create(
+            name='Чувак', year=2000, description='Лебовски не упоминается'),
+    ]
+
+
+def _names(response):
+    assert response.status_code == 200
+    return [title['name'] for title in response.json()['results']]
+
+
+@pytest.mark.django_db
+class TestTitleSearch:
+
+    def test_search_description(self, titles, guest_client):
+        response = guest_client.get('/api/v1/titles/?search=братьев коэн')
+        assert sorted(_names(response)) == ['Большой Лебовски', 'Фарго']
+
+    def test_name_ranks_higher(self, titles, guest_client):
+        response = guest_client.get('/api/v1/titles/?search=лебовски')
+        assert _names(response) == ['Большой Лебовски', 'Чувак']
+
+    def test_search_with_filters(self, titles, guest_client):
+        response = guest_client.get(
+            '/api/v1/titles/?search=лебовски&year=2000')
+        assert _names(response) == ['Чувак']
+
+    def test_index_follows_updates(self, titles, guest_client):
+        titles[1].name = 'Фарго (сериал)'
+        titles[1].description = ''
+        titles[1].save()
+        response = guest_client.get('/api/v1/titles/?search=драма')
+        assert _names(response) == []
+        response = guest_client.get('/api/v1/titles/?search=сериал')
+        assert _names(response) == ['Фарго (сериал)']
+
+    def test_rebuild_command(self, titles, search_backend, guest_client):
+        TitleSearchToken.objects.all().delete()
+        call_command('rebuild_search_index')
+        if search_backend == 'inverted':
+            assert TitleSearchToken.objects.exists()
+        response = guest_client.get('/api/v1/titles/?search=фарго')
+        assert _names(response) == ['Фарго']
@@ -0,0 +1,124 @@
+import random
+
+import numpy as np
+import pytest
+from django.core.management import call_command
+from reviews.models import (Category, Genre, GenreTitle, SimilarTitle,
+                            StaleSimilarity, Title)
+from reviews.similarity import top_neighbours
+
+
+@pytest.fixture
+def catalogue():
+    film = Category.objects.create(name='Фильм', slug='film')
+    book = Category.objects.create(name='Книга', slug='book')
+    drama = Genre.objects.create(name='Драма', slug='drama')
+    horror = Genre.objects.create(name='Ужасы', slug='horror')
+    comedy = Genre.objects.create(name='Комедия', slug='comedy')
+    titles = {
+        'heat': Title.objects.create(name='Heat', year=1995, category=film),
+        'casino': Title.objects.create(
+            name='Casino', year=1995, category=film),
+        'scream': Title.objects.create(
+            name='Scream', year=1996, category=film),
+        'novel': Title.objects.create(name='Novel', year=1900, category=book),
+    }
+    titles['heat'].genre.set([drama])
+    titles['casino'].genre.set([drama])
+    titles['scream'].genre.set([horror, comedy])
+    titles['novel'].genre.set([drama])
+    call_command('rebuild_similar_titles')
+    return titles
+
+
+def _stored():
+    neighbours = {}
+    for title, similar, score in SimilarTitle.objects.order_by(
+        'title', 'rank'
+    ).values_list('title', 'similar', 'score'):
+        neighbours.setdefault(title, []).append((similar, round(score, 5)))
+    return neighbours
+
+
+@pytest.mark.django_db
+class TestSimilarTitles:
+
+    def test_ranked_by_cosine_similarity(
+        self, catalogue, guest_client, django_assert_num_queries
+    ):
+        url = f'/api/v1/titles/{catalogue["heat"].id}/similar/'
+        # neighbours with titles and categories, genres prefetch
+        with django_assert_num_queries(2):
+            response = guest_client.get(url)
+        assert response.status_code == 200
+        data = response.json()
+        assert [title['name'] for title in data] == [
+            'Casino', 'Novel', 'Scream']
+        assert [title['similarity'] for title in data] == pytest.approx(
+            [1.0, 2 / 3, 0.5 / 1.5 ** 0.5 / 2.5 ** 0.5], abs=1e-5)
+        assert data[0]['genre'] == [{'name': 'Драма', 'slug': 'drama'}]
+
+    def test_unknown_title(self, catalogue, guest_client):
+        for pk in ('0', 'abc'):
+            response = guest_client.get(f'/api/v1/titles/{pk}/similar/')
+            assert response.status_code == 404
+
+    def test_changes_are_queued(self, catalogue):
+        assert not StaleSimilarity.objects.exists()
+        casino = catalogue['casino'].id
+        catalogue['scream'].genre.set([Genre.objects.get(slug='drama')])
+        catalogue['casino'].delete()
+        # Titles that listed the deleted one, its own id is skipped later.
+        assert set(StaleSimilarity.objects.values_list(
+            'title', flat=True)) == {
+            catalogue['scream'].id, catalogue['heat'].id,
+            catalogue['novel'].id, casino,
+        }
+
+        call_command('rebuild_similar_titles', '--incremental')
+        assert not StaleSimilarity.objects.exists()
+        assert [similar for similar, _ in _stored()[
+            catalogue['heat'].id]] == [
+            catalogue['scream'].id, catalogue['novel'].id]
+
+
+def test_ties_keep_id_order():
+    scores = np.array([0.5, 0.9, 0.5, 0, 0.5], dtype=np.float32)
+    assert top_neighbours(scores, 3)[0].tolist() == [1, 0, 2]
+    assert top_neighbours(scores, 10)[0].tolist() == [1, 0, 2, 4]
+
+
+@pytest.mark.django_db
+def test_incremental_matches_full_rebuild(settings):
+    settings.SIMILAR_TITLES = dict(
+        settings.SIMILAR_TITLES, neighbours=3, batch_size=7,
+        block_memory=4 * 40 * 5)
+    rng = random.Random(1)
+    categories = [
+        Category.objects.create(name=slug, slug=slug)
+        for slug in ('film', 'book', 'music')]
+    genres = [
+        Genre.objects.create(name=f'genre{index}', slug=f'genre{index}')
+        for index in range(6)]
+    titles = []
+    for index in range(40):
+        title = Title.objects.create(
+            name=f'title{index}', year=rng.randrange(1950, 2020),
+            category=rng.choice(categories + [None]))
+        title.genre.set(rng.sample(genres, rng.randint(0, 3)))
+        titles.append(title)
+    call_command('rebuild_similar_titles')
+
+    titles[0].genre.set(genres[:2])
+    titles[1].category = categories[0]
+    titles[1].save()
+    titles[2].delete()
+    GenreTitle.objects.create(title=titles[3], genre=genres[5])
+    genres[4].delete()
+    Title.objects.create(name='new', year=1980, category=categories[1])
+    call_command('rebuild_similar_titles', '--incremental')
+    incremental = _stored()
+    assert not StaleSimilarity.objects.exists()
+
+    call_command('rebuild_similar_titles')
+    assert incremental == _stored()
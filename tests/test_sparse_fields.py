@@ -0,0 +1,81 @@
+import pytest
+from reviews.models import Category, Comment, Genre, Review, Title
+
+
+@pytest.fixture
+def title(user):
+    category = Category.objects.create(name='Фильм', slug='film')
+    genre = Genre.objects.create(name='Драма', slug='drama')
+    title = Title.objects.create(
+        name='Сталкер', year=1979, description='Зона', category=category)
+    title.genre.set([genre])
+    review = Review.objects.create(
+        title=title, author=user, text='text', score=9)
+    Comment.objects.create(review=review, author=user, text='text')
+    return title
+
+
+@pytest.mark.django_db
+class TestSparseFields:
+
+    def test_fields_and_omit(self, title, guest_client):
+        review = title.reviews.get()
+        cases = (
+            ('/api/v1/titles/?fields=id,name,rating',
+             {'id', 'name', 'rating'}),
+            (f'/api/v1/titles/{title.id}/?fields=name,score_distribution',
+             {'name', 'score_distribution'}),
+            ('/api/v1/titles/?omit=description,genre',
+             {'id', 'name', 'year', 'rating', 'review_count', 'category'}),
+            (f'/api/v1/titles/{title.id}/reviews/?fields=id,score',
+             {'id', 'score'}),
+            (f'/api/v1/titles/{title.id}/reviews/?pagination=cursor'
+             '&fields=id,score', {'id', 'score'}),
+            (f'/api/v1/titles/{title.id}/reviews/{review.id}/comments/'
+             '?omit=text', {'id', 'author', 'pub_date'}),
+            ('/api/v1/genres/?fields=slug', {'slug'}),
+            ('/api/v1/categories/?omit=slug', {'name'}),
+        )
+        for url, expected in cases:
+            response = guest_client.get(url)
+            assert response.status_code == 200, url
+            data = response.json()
+            item = data['results'][0] if 'results' in data else data
+            assert set(item) == expected, url
+
+    def test_values_unchanged(self, title, guest_client):
+        full = guest_client.get(f'/api/v1/titles/{title.id}/').json()
+        sparse = guest_client.get(
+            f'/api/v1/titles/{title.id}/?fields=category,genre,rating').json()
+        assert sparse == {
+            key: full[key] for key in ('category', 'genre', 'rating')}
+
+    def test_unknown_field(self, title, guest_client):
+        response = guest_client.get('/api/v1/titles/?fields=name,secret')
+        assert response.status_code == 400
+        assert 'fields' in response.json()
+        response = guest_client.get('/api/v1/genres/?omit=id')
+        assert response.status_code == 400
+        assert 'omit' in response.json()
+
+    def test_query_is_pruned(
+        self, title, guest_client, django_assert_num_queries
+    ):
+        with django_assert_num_queries(3) as context:
+            guest_client.get('/api/v1/titles/?fields=id,name')
+        page_query = context.captured_queries[-1]['sql']
+        assert 'description' not in page_query
+        assert 'reviews_category' not in page_query
+
+        with django_assert_num_queries(3) as context:
+            guest_client.get(
+                f'/api/v1/titles/{title.id}/reviews/?fields=id,score')
+        page_query = context.captured_queries[-1]['sql']
+        assert '"text"' not in page_query
+        assert 'reviews_user' not in page_query
+
+    def test_ignored_on_write(self, title, admin_client):
+        response = admin_client.patch(
+            f'/api/v1/titles/{title.id}/?fields=name', {'year': 1980})
+        assert response.status_code == 200
+        assert 'year' in response.json()